@@ -0,0 +1,17 @@
+"""
+Benchmark: dispatch overhead of every protocol adapter.
+
+Thin wrapper around `pifunc bench`; see `pifunc.bench` for what is measured.
+
+Usage:
+    python benchmarks/adapters.py [--protocols http,grpc] [--iterations 500] [--concurrency 1]
+                                  [--output results.json] [--baseline before.json --threshold 10]
+"""
+
+import sys
+
+from pifunc.cli import main
+
+if __name__ == "__main__":
+    sys.argv = ["pifunc", "bench", *sys.argv[1:]]
+    sys.exit(main())
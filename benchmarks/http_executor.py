@@ -0,0 +1,100 @@
+"""
+Benchmark: latency of a fast HTTP endpoint while a slow blocking endpoint is busy.
+
+Runs the same mixed workload against HTTPAdapter with synchronous services
+executed inline on the event loop and offloaded to the thread pool.
+
+Usage:
+    python benchmarks/http_executor.py [--slow-calls 8] [--fast-calls 50] [--max-workers 32]
+"""
+
+import argparse
+import socket
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from pifunc.adapters.http_adapter import HTTPAdapter
+
+
+def slow_query(delay: float = 0.2) -> dict:
+    """Simulates a blocking database call."""
+    time.sleep(delay)
+    return {"rows": 1}
+
+
+def fast_ping() -> str:
+    return "pong"
+
+
+def get_free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("", 0))
+        return s.getsockname()[1]
+
+
+def run_scenario(executor: str, slow_calls: int, fast_calls: int, max_workers: int):
+    port = get_free_port()
+    adapter = HTTPAdapter()
+    adapter.setup({"host": "127.0.0.1", "port": port, "executor": executor,
+                   "max_workers": max_workers})
+    adapter.register_function(slow_query, {"http": {"path": "/api/slow", "method": "POST"}})
+    adapter.register_function(fast_ping, {"http": {"path": "/api/fast", "method": "POST"}})
+    adapter.start()
+
+    base_url = f"http://127.0.0.1:{port}"
+    latencies = []
+    stop = threading.Event()
+
+    def slow_worker():
+        with requests.Session() as session:
+            while not stop.is_set():
+                session.post(f"{base_url}/api/slow", json={"delay": 0.2})
+
+    def fast_call(session):
+        start = time.perf_counter()
+        session.post(f"{base_url}/api/fast", json={})
+        latencies.append(time.perf_counter() - start)
+
+    try:
+        with ThreadPoolExecutor(max_workers=slow_calls) as slow_pool:
+            for _ in range(slow_calls):
+                slow_pool.submit(slow_worker)
+            time.sleep(0.3)
+
+            with requests.Session() as session:
+                for _ in range(fast_calls):
+                    fast_call(session)
+
+            stop.set()
+    finally:
+        adapter.stop()
+
+    latencies.sort()
+    return {
+        "executor": executor,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+        "max_ms": latencies[-1] * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--slow-calls", type=int, default=8, help="Concurrent slow clients")
+    parser.add_argument("--fast-calls", type=int, default=50, help="Sequential fast calls measured")
+    parser.add_argument("--max-workers", type=int, default=32, help="HTTP thread pool size")
+    args = parser.parse_args()
+
+    print(f"{'executor':<10} {'p50 ms':>10} {'p99 ms':>10} {'max ms':>10}")
+    for executor in ("inline", "thread"):
+        result = run_scenario(executor, args.slow_calls, args.fast_calls, args.max_workers)
+        print(f"{result['executor']:<10} {result['p50_ms']:>10.1f} "
+              f"{result['p99_ms']:>10.1f} {result['max_ms']:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
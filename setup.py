@@ -29,7 +29,7 @@ setup(
         "fastapi>=0.110.0",
         "uvicorn>=0.27.0",
         "grpcio>=1.62.0",
-        "grpcio-tools>=1.62.0",
+        "protobuf>=4.21.0",
     ],
     extras_require={
         "full": [
@@ -40,6 +40,8 @@ setup(
             "pika>=1.2.0",
             "graphql-core>=3.2.0",
             "schedule>=1.1.0",
+            "orjson>=3.9.0",
+            "msgpack>=1.0.5",
         ],
         "dev": [
             "pytest>=6.2.5",
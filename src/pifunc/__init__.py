@@ -6,34 +6,59 @@ from functools import wraps
 import inspect
 import sys
 import os
-import signal
-import importlib
 from typing import Any, Callable, Dict, List, Optional, Set, Type
 import logging
 
-# Konfiguracja loggera
+from pifunc.metrics import REGISTRY as METRICS, invoker_collector
+
+# Import pakietu nie ma efektów ubocznych: moduły ciężkie (asyncio, requests,
+# adaptery) ładowane są dopiero przy użyciu, a handler logów dodaje run_services()
 logger = logging.getLogger("pifunc")
-handler = logging.StreamHandler()
-formatter = logging.Formatter('%(levelname)s: %(message)s')
-handler.setFormatter(formatter)
-logger.addHandler(handler)
-logger.setLevel(logging.INFO)
-
-# Importowanie klienta
-try:
-    from pifunc.pifunc_client import PiFuncClient
-except ImportError:
-    class PiFuncClient:
-        def __init__(self, base_url="", protocol=""):
-            self.base_url = base_url
-            self.protocol = protocol
-
-        def call(self, service_name, args=None, **kwargs):
-            logger.warning(f"PiFuncClient stub called for {service_name}")
-            return {}
+
+
+def _configure_logging():
+    """Dodaje handler konsoli do loggera pifunc, jeśli aplikacja nie skonfigurowała własnego."""
+    if logger.handlers or logging.getLogger().handlers:
+        return
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter('%(levelname)s: %(message)s'))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+
+
+def _client_class():
+    """Zwraca klasę PiFuncClient, importując klienta (i requests) dopiero przy użyciu."""
+    try:
+        from pifunc.pifunc_client import PiFuncClient
+    except ImportError:
+        class PiFuncClient:
+            def __init__(self, base_url="", protocol=""):
+                self.base_url = base_url
+                self.protocol = protocol
+
+            def call(self, service_name, args=None, **kwargs):
+                logger.warning(f"PiFuncClient stub called for {service_name}")
+                return {}
+
+    globals()["PiFuncClient"] = PiFuncClient
+    return PiFuncClient
+
+
+def __getattr__(name):
+    if name == "PiFuncClient":
+        return _client_class()
+    if name == "ServiceOverloaded":
+        # pifunc.limits importuje asyncio, więc ładujemy go dopiero przy użyciu
+        from pifunc.limits import ServiceOverloaded
+        return ServiceOverloaded
+    if name == "DeadlineExceeded":
+        from pifunc.deadlines import DeadlineExceeded
+        return DeadlineExceeded
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 __version__ = "0.1.18"
-__all__ = ["service", "client", "run_services", "load_module_from_file", "PiFuncClient",
+__all__ = ["service", "client", "run_services", "load_module_from_file", "PiFuncClient", "cache_invalidate",
+           "ServiceOverloaded", "DeadlineExceeded",
            "http", "websocket", "grpc", "mqtt", "zeromq", "redis", "amqp", "graphql", "cron"]
 
 # Rejestry usług i klientów
@@ -41,9 +66,20 @@ _SERVICE_REGISTRY = {}
 _CLIENT_REGISTRY = {}
 _ADAPTER_CLASSES = {}
 
+# Liczniki pamięci podręcznej i łączenia wywołań trafiają do /metrics
+METRICS.add_collector(invoker_collector(
+    lambda: [metadata.get("invoker") for metadata in _SERVICE_REGISTRY.values()]))
+
 # Dostępne protokoły
 _AVAILABLE_PROTOCOLS = ["http", "cron", "websocket", "grpc", "mqtt", "zeromq", "redis", "amqp", "graphql"]
 
+# Silniki HTTP wybierane przez run_services(http={"engine": ...}): nazwa -> (moduł, klasa adaptera)
+_HTTP_ENGINES = {
+    "fastapi": ("pifunc.adapters.http_adapter", "HTTPAdapter"),
+    "aiohttp": ("pifunc.adapters.rest_adapter", "RESTAdapter"),
+    "asgi": ("pifunc.adapters.asgi_adapter", "ASGIAdapter"),
+}
+
 # Włączone protokoły z zmiennej środowiskowej
 _env_protocols = os.environ.get("PIFUNC_PROTOCOLS", "")
 _ENABLED_PROTOCOLS = set(_env_protocols.lower().split(",")) if _env_protocols else None
@@ -58,23 +94,30 @@ def _get_protocol_class_name(protocol_name):
     return f"{protocol_name.capitalize()}Adapter"
 
 
-def _import_adapter(protocol_name):
-    """Importuje adapter protokołu tylko gdy jest potrzebny."""
-    if protocol_name in _ADAPTER_CLASSES:
-        return _ADAPTER_CLASSES[protocol_name]
+def _import_adapter(protocol_name, engine=None):
+    """Importuje adapter protokołu tylko gdy jest potrzebny; dla HTTP można wybrać silnik."""
+    key = f"{protocol_name}:{engine}" if engine else protocol_name
+    if key in _ADAPTER_CLASSES:
+        return _ADAPTER_CLASSES[key]
 
     # Pomijamy protokoły wyłączone przez zmienną środowiskową
     if _ENABLED_PROTOCOLS is not None and protocol_name not in _ENABLED_PROTOCOLS:
         logger.info(f"Protocol {protocol_name} is disabled by PIFUNC_PROTOCOLS environment variable")
         return None
 
-    adapter_module_name = f"pifunc.adapters.{protocol_name}_adapter"
-    adapter_class_name = _get_protocol_class_name(protocol_name)
+    if engine and protocol_name == "http":
+        if engine not in _HTTP_ENGINES:
+            raise ValueError(f"Invalid HTTP engine: {engine}. Valid engines are: {list(_HTTP_ENGINES)}")
+        adapter_module_name, adapter_class_name = _HTTP_ENGINES[engine]
+    else:
+        adapter_module_name = f"pifunc.adapters.{protocol_name}_adapter"
+        adapter_class_name = _get_protocol_class_name(protocol_name)
 
     try:
+        import importlib
         module = importlib.import_module(adapter_module_name)
         adapter_class = getattr(module, adapter_class_name)
-        _ADAPTER_CLASSES[protocol_name] = adapter_class
+        _ADAPTER_CLASSES[key] = adapter_class
         return adapter_class
     except (ImportError, AttributeError) as e:
         logger.warning(f"Could not import {adapter_module_name}: {e}")
@@ -100,12 +143,9 @@ def _create_protocol_decorator(protocol_name, **default_config):
             func = args[0]
             config = default_config.copy()
 
-            @wraps(func)
-            def wrapper(*wargs, **wkwargs):
-                return func(*wargs, **wkwargs)
-
-            setattr(wrapper, f"_pifunc_{protocol_name}", config)
-            return wrapper
+            # Zapisujemy konfigurację bezpośrednio na funkcji, bez warstwy wrappera
+            setattr(func, f"_pifunc_{protocol_name}", config)
+            return func
 
         # Obsługa przypadku gdy dekorator jest używany z argumentami
         config = default_config.copy()
@@ -114,12 +154,8 @@ def _create_protocol_decorator(protocol_name, **default_config):
             config["path"] = args[0]  # dla http, websocket itp.
 
         def inner_decorator(func):
-            @wraps(func)
-            def wrapper(*wargs, **wkwargs):
-                return func(*wargs, **wkwargs)
-
-            setattr(wrapper, f"_pifunc_{protocol_name}", config)
-            return wrapper
+            setattr(func, f"_pifunc_{protocol_name}", config)
+            return func
 
         return inner_decorator
 
@@ -184,7 +220,8 @@ def client(**protocol_configs):
     return decorator
 
 
-def service(name=None, description=None, **protocol_configs):
+def service(name=None, description=None, executor=None, codec=None, cache=None, coalesce=False,
+            max_concurrency=None, max_queue=None, timeout=None, **protocol_configs):
     """
     Dekorator służący do rejestracji funkcji jako usługi dostępnej przez protokoły.
 
@@ -194,8 +231,38 @@ def service(name=None, description=None, **protocol_configs):
     Args:
         name: Nazwa usługi (domyślnie nazwa funkcji).
         description: Opis usługi (domyślnie docstring funkcji).
+        executor: Gdzie adaptery asynchroniczne wykonują funkcję synchroniczną:
+                  "thread", "process" lub "inline" (domyślnie ustawienie adaptera).
+        codec: Kodek wiadomości usługi, np. "json" lub "msgpack"
+               (domyślnie ustawienie adaptera).
+        cache: Pamięć podręczna wyników wspólna dla wszystkich protokołów,
+               np. {"ttl": 30, "max_entries": 10000, "key": ["product_id"]}.
+        coalesce: Czy równoczesne wywołania z tymi samymi argumentami mają
+                  współdzielić jedno wykonanie funkcji i jego wynik.
+        max_concurrency: Maksymalna liczba równoczesnych wykonań funkcji
+                         (wspólna dla wszystkich protokołów).
+        max_queue: Liczba wywołań czekających na wolne miejsce; nadmiarowe
+                   wywołania są odrzucane wyjątkiem ServiceOverloaded.
+        timeout: Limit czasu wywołania w sekundach; po jego przekroczeniu
+                 wywołujący dostaje DeadlineExceeded (limit klienta może go skrócić).
         **protocol_configs: Konfiguracje dla poszczególnych protokołów.
     """
+    if executor is not None:
+        from pifunc.runtime import EXECUTOR_MODES
+        if executor not in EXECUTOR_MODES:
+            raise ValueError(f"Invalid executor: {executor}. Valid executors are: {EXECUTOR_MODES}")
+    if codec is not None:
+        from pifunc.adapters.codecs import get_codec
+        get_codec(codec)
+    if max_concurrency is not None and max_concurrency < 1:
+        raise ValueError(f"max_concurrency must be at least 1, got {max_concurrency}")
+    if max_queue is not None and (max_queue < 0 or max_concurrency is None):
+        raise ValueError("max_queue must be non-negative and requires max_concurrency")
+    if timeout is not None:
+        from pifunc.deadlines import MAX_TIMEOUT
+        if not 0 < timeout <= MAX_TIMEOUT:
+            raise ValueError(f"timeout must be between 0 and {MAX_TIMEOUT:g} seconds, got {timeout}")
+
     # Wykrywamy protokoły z konfiguracji
     protocols = [protocol for protocol in protocol_configs.keys()
                  if protocol in _AVAILABLE_PROTOCOLS]
@@ -206,10 +273,6 @@ def service(name=None, description=None, **protocol_configs):
         return service()(func)
 
     def decorator(func):
-        @wraps(func)
-        def wrapper(*args, **kwargs):
-            return func(*args, **kwargs)
-
         service_name = name or func.__name__
         service_description = description or func.__doc__ or ""
 
@@ -237,7 +300,14 @@ def service(name=None, description=None, **protocol_configs):
                 "parameters": {},
                 "return_annotation": None
             },
-            "protocols": enabled_protocols
+            "protocols": enabled_protocols,
+            "executor": executor,
+            "codec": codec,
+            "cache": cache,
+            "coalesce": coalesce,
+            "max_concurrency": max_concurrency,
+            "max_queue": max_queue,
+            "timeout": timeout
         }
 
         # Dodajemy informacje o parametrach
@@ -263,7 +333,7 @@ def service(name=None, description=None, **protocol_configs):
             if protocol in _AVAILABLE_PROTOCOLS:
                 # Validate protocol configuration
                 if protocol == "http":
-                    valid_keys = {"path", "method", "middleware"}
+                    valid_keys = {"path", "method", "middleware", "stream", "etag", "response_cache"}
                     invalid_keys = set(config.keys()) - valid_keys
                     if invalid_keys:
                         raise ValueError(f"Invalid HTTP configuration keys: {invalid_keys}. Valid keys are: {valid_keys}")
@@ -274,9 +344,13 @@ def service(name=None, description=None, **protocol_configs):
             metadata["client"] = func._pifunc_client
             metadata["_is_client_function"] = True
 
+        # Budujemy wywoływacz raz, przy rejestracji, a nie przy każdym żądaniu
+        from pifunc.invoker import ServiceInvoker
+        metadata["invoker"] = ServiceInvoker(func, metadata)
+
         _SERVICE_REGISTRY[service_name] = metadata
-        wrapper._pifunc_service = metadata
-        return wrapper
+        func._pifunc_service = metadata
+        return func
 
     return decorator
 
@@ -290,11 +364,30 @@ def run_services(**config):
 
     Args:
         **config: Konfiguracja dla poszczególnych protokołów i ogólne ustawienia.
-                 Np. http={"port": 8080}, watch=True
+                 Np. http={"port": 8080}, watch=True, workers=4
     """
-    adapters = {}
-    clients = {}
+    _configure_logging()
+    required_protocols = _get_required_protocols(config)
+    logger.info(f"Enabled protocols: {', '.join(required_protocols)}")
+
+    # Tryb prefork: nadzorca uruchamia wiele procesów roboczych
+    workers = int(config.get("workers", 1) or 1)
+    if workers > 1:
+        from pifunc.prefork import run_prefork
+        run_prefork(config, required_protocols, _run_worker)
+        return
+
+    adapters = _start_adapters(config, required_protocols)
 
+    # Włączamy monitoring plików, jeśli potrzeba
+    if config.get("watch", False):
+        _start_file_watcher(adapters)
+
+    _serve_forever(adapters)
+
+
+def _get_required_protocols(config):
+    """Ustala, które protokoły należy uruchomić."""
     # Ustawienie zmiennej środowiskowej ma priorytet
     env_protocols = os.environ.get("PIFUNC_PROTOCOLS", "")
     explicitly_enabled = set(env_protocols.lower().split(",")) if env_protocols else set()
@@ -305,19 +398,23 @@ def run_services(**config):
     # Protokoły używane przez zarejestrowane usługi
     service_protocols = _get_used_protocols()
 
-    # Ustalamy, które protokoły będą używane
     if explicitly_enabled:
         # Jeśli zmienna środowiskowa jest ustawiona, używamy tylko tych protokołów
-        required_protocols = explicitly_enabled.intersection(_AVAILABLE_PROTOCOLS)
-    else:
-        # W przeciwnym razie używamy protokołów z konfiguracji i zarejestrowanych usług
-        required_protocols = config_protocols.union(service_protocols)
+        return explicitly_enabled.intersection(_AVAILABLE_PROTOCOLS)
+
+    # W przeciwnym razie używamy protokołów z konfiguracji i zarejestrowanych usług
+    return config_protocols.union(service_protocols)
 
-    logger.info(f"Enabled protocols: {', '.join(required_protocols)}")
+
+def _start_adapters(config, required_protocols):
+    """Tworzy, konfiguruje i uruchamia adaptery dla podanych protokołów."""
+    adapters = {}
+    clients = {}
 
     # Dynamicznie importujemy potrzebne adaptery
     for protocol in required_protocols:
-        adapter_class = _import_adapter(protocol)
+        engine = config.get(protocol, {}).get("engine") if protocol == "http" else None
+        adapter_class = _import_adapter(protocol, engine)
         if adapter_class:
             adapters[protocol] = adapter_class()
             logger.info(f"Loaded adapter for protocol: {protocol}")
@@ -328,6 +425,7 @@ def run_services(**config):
         adapter.setup(adapter_config)
 
     # Tworzymy klientów dla protokołów
+    PiFuncClient = _client_class()
     for protocol, adapter in adapters.items():
         if protocol == "http":
             host = config.get("http", {}).get("host", "localhost")
@@ -385,15 +483,26 @@ def run_services(**config):
         except Exception as e:
             logger.error(f"Error starting {protocol} adapter: {e}")
 
-    # Włączamy monitoring plików, jeśli potrzeba
-    if config.get("watch", False):
-        _start_file_watcher(adapters)
+    return adapters
+
+
+def _run_worker(config, required_protocols):
+    """Uruchamia adaptery w procesie roboczym trybu prefork."""
+    adapters = _start_adapters(config, required_protocols)
+    _serve_forever(adapters)
+
+
+def _serve_forever(adapters):
+    """Blokuje główny wątek do czasu otrzymania sygnału zakończenia."""
+    import signal
+    from pifunc.runtime import shutdown_background_loop
 
     # Konfigurujemy obsługę sygnałów do graceful shutdown
     def handle_signal(signum, frame):
         logger.info("Zatrzymywanie serwerów...")
         for adapter in adapters.values():
             adapter.stop()
+        shutdown_background_loop()
         sys.exit(0)
 
     signal.signal(signal.SIGINT, handle_signal)
@@ -413,8 +522,13 @@ def run_services(**config):
         handle_signal(None, None)
 
 
-def _start_file_watcher(adapters):
-    """Uruchamia wątek monitorujący zmiany w plikach."""
+def _start_file_watcher(adapters, on_reload=None):
+    """
+    Uruchamia wątek monitorujący zmiany w plikach.
+
+    Przed ponownym uruchomieniem procesu zatrzymuje adaptery albo, jeśli
+    podano `on_reload`, wywołuje tę funkcję (np. nadzorca trybu prefork).
+    """
     import threading
     import time
 
@@ -441,6 +555,8 @@ def _start_file_watcher(adapters):
                     pass
 
             if changed:
+                if on_reload is not None:
+                    on_reload()
                 for adapter in adapters.values():
                     adapter.stop()
                 os.execv(sys.executable, [sys.executable] + sys.argv)
@@ -451,8 +567,31 @@ def _start_file_watcher(adapters):
     thread.start()
 
 
+def cache_invalidate(service_name, **args):
+    """
+    Usuwa zapamiętane wyniki usługi włączonej przez @service(cache=...).
+
+    Bez argumentów czyści całą pamięć podręczną usługi, a z argumentami
+    tylko wpisy dla tych wartości, np. cache_invalidate("get_product", product_id="1").
+    Czyści też zakodowane odpowiedzi HTTP z @service(http={"response_cache": ...}).
+    Zwraca liczbę usuniętych wpisów.
+    """
+    if service_name not in _SERVICE_REGISTRY:
+        raise KeyError(f"Unknown service: {service_name}")
+    metadata = _SERVICE_REGISTRY[service_name]
+    invoker = metadata["invoker"]
+    caches = [invoker.cache] if invoker.cache is not None else []
+    caches.extend(metadata.get("response_caches", []))
+    if not caches:
+        return 0
+    bound = invoker.bind(args)
+    return sum(cache.invalidate(bound) for cache in caches)
+
+
 def load_module_from_file(file_path):
     """Ładuje moduł z pliku."""
+    import importlib.util
+
     module_name = os.path.basename(file_path).replace('.py', '')
     spec = importlib.util.spec_from_file_location(module_name, file_path)
     module = importlib.util.module_from_spec(spec)
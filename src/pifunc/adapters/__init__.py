@@ -4,6 +4,14 @@ import inspect
 import json
 from typing import Any, Callable, Dict, List, Type
 
+from pifunc.adapters.codecs import (
+    Codec,
+    CodecError,
+    codec_for_content_type,
+    get_codec,
+    register_codec,
+)
+
 
 class ProtocolAdapter(ABC):
     """Bazowa klasa dla wszystkich adapterów protokołów."""
@@ -26,4 +34,9 @@ class ProtocolAdapter(ABC):
     @abstractmethod
     def stop(self) -> None:
         """Zatrzymuje serwer."""
-        pass
\ No newline at end of file
+        pass
+
+    def codec_for(self, metadata: Dict[str, Any]) -> Codec:
+        """Zwraca kodek usługi: z @service(codec=...) lub z konfiguracji adaptera."""
+        config = getattr(self, "config", None) or {}
+        return get_codec(metadata.get("codec") or config.get("codec"))
\ No newline at end of file
@@ -1,13 +1,13 @@
 # pifunc/adapters/amqp_adapter.py
-import json
-import asyncio
 import threading
 import time
-import inspect
 from typing import Any, Callable, Dict, List, Optional
 import pika
 from pika.exchange_type import ExchangeType
 from pifunc.adapters import ProtocolAdapter
+from pifunc.adapters.codecs import CodecError, codec_for_content_type
+from pifunc.invoker import get_invoker
+from pifunc.metrics import track
 import logging
 
 logger = logging.getLogger(__name__)
@@ -113,6 +113,8 @@ class AMQPAdapter(ProtocolAdapter):
         self.functions[service_name] = {
             "function": func,
             "metadata": metadata,
+            "invoker": get_invoker(func, metadata),
+            "codec": self.codec_for(metadata),
             "exchange": exchange,
             "exchange_type": exchange_type,
             "queue": queue,
@@ -179,84 +181,86 @@ class AMQPAdapter(ProtocolAdapter):
             ch.basic_ack(delivery_tag=method.delivery_tag)
             return
 
-        try:
-            # Parsujemy JSON
-            payload = body.decode('utf-8')
-            kwargs = json.loads(payload)
-
-            # Wywołujemy funkcję
-            result = target_function(**kwargs)
-
-            # Obsługujemy coroutines
-            if asyncio.iscoroutine(result):
-                # Tworzymy nową pętlę asyncio
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
-                result = loop.run_until_complete(result)
-                loop.close()
-
-            # Przygotowujemy odpowiedź
-            response = {
-                "result": result,
-                "routing_key": routing_key,
-                "timestamp": time.time()
-            }
-
-            # Publikujemy odpowiedź, jeśli klient oczekuje odpowiedzi (reply_to)
-            response_exchange = self.config.get("response_exchange", "pifunc.responses")
-
-            if properties.reply_to:
-                # Używamy reply_to podanego przez klienta
-                self.channel.basic_publish(
-                    exchange="",  # Bezpośrednio do kolejki
-                    routing_key=properties.reply_to,
-                    properties=pika.BasicProperties(
-                        correlation_id=properties.correlation_id,
-                        content_type="application/json"
-                    ),
-                    body=json.dumps(response)
-                )
-            else:
-                # Używamy domyślnego routing key dla odpowiedzi
+        # Kodek wybieramy na podstawie content_type wiadomości
+        content_type = properties.content_type if properties else None
+        codec = codec_for_content_type(content_type, function_info["codec"])
+
+        with track(function_info["invoker"].name, "amqp") as timer:
+            try:
+                # Dekodujemy wiadomość
+                kwargs = codec.decode(body)
+                timer.mark("decode")
+
+                # Wywołujemy funkcję
+                result = function_info["invoker"].call_sync(kwargs)
+                timer.mark("execute")
+
+                # Przygotowujemy odpowiedź
+                response = {
+                    "result": result,
+                    "routing_key": routing_key,
+                    "timestamp": time.time()
+                }
+                payload = codec.encode(response)
+                timer.mark("encode")
+
+                # Publikujemy odpowiedź, jeśli klient oczekuje odpowiedzi (reply_to)
+                response_exchange = self.config.get("response_exchange", "pifunc.responses")
+
+                if properties.reply_to:
+                    # Używamy reply_to podanego przez klienta
+                    self.channel.basic_publish(
+                        exchange="",  # Bezpośrednio do kolejki
+                        routing_key=properties.reply_to,
+                        properties=pika.BasicProperties(
+                            correlation_id=properties.correlation_id,
+                            content_type=codec.content_type
+                        ),
+                        body=payload
+                    )
+                else:
+                    # Używamy domyślnego routing key dla odpowiedzi
+                    self.channel.basic_publish(
+                        exchange=response_exchange,
+                        routing_key=function_info["response_routing_key"],
+                        properties=pika.BasicProperties(
+                            content_type=codec.content_type
+                        ),
+                        body=payload
+                    )
+
+                # Potwierdzamy przetworzenie wiadomości
+                ch.basic_ack(delivery_tag=method.delivery_tag)
+
+            except CodecError:
+                timer.fail()
+                logger.error(f"{codec.name} parsing error: {body!r}")
+                ch.basic_ack(delivery_tag=method.delivery_tag)
+            except Exception as e:
+                timer.fail()
+                # Publikujemy informację o błędzie
+                error_response = {
+                    "error": str(e),
+                    "routing_key": routing_key,
+                    "timestamp": time.time()
+                }
+
+                response_exchange = self.config.get("response_exchange", "pifunc.responses")
+                error_routing_key = f"error.{routing_key}"
+
                 self.channel.basic_publish(
                     exchange=response_exchange,
-                    routing_key=function_info["response_routing_key"],
+                    routing_key=error_routing_key,
                     properties=pika.BasicProperties(
-                        content_type="application/json"
+                        content_type=codec.content_type,
+                        correlation_id=properties.correlation_id if properties else None
                     ),
-                    body=json.dumps(response)
+                    body=codec.encode(error_response)
                 )
 
-            # Potwierdzamy przetworzenie wiadomości
-            ch.basic_ack(delivery_tag=method.delivery_tag)
-
-        except json.JSONDecodeError:
-            logger.error(f"JSON parsing error: {body}")
-            ch.basic_ack(delivery_tag=method.delivery_tag)
-        except Exception as e:
-            # Publikujemy informację o błędzie
-            error_response = {
-                "error": str(e),
-                "routing_key": routing_key,
-                "timestamp": time.time()
-            }
-
-            response_exchange = self.config.get("response_exchange", "pifunc.responses")
-            error_routing_key = f"error.{routing_key}"
-
-            self.channel.basic_publish(
-                exchange=response_exchange,
-                routing_key=error_routing_key,
-                properties=pika.BasicProperties(
-                    content_type="application/json",
-                    correlation_id=properties.correlation_id if properties else None
-                ),
-                body=json.dumps(error_response)
-            )
-
-            # Potwierdzamy przetworzenie wiadomości (z błędem)
-            ch.basic_ack(delivery_tag=method.delivery_tag)
-            logger.error(f"Error processing message: {e}")
+                # Potwierdzamy przetworzenie wiadomości (z błędem)
+                ch.basic_ack(delivery_tag=method.delivery_tag)
+                logger.error(f"Error processing message: {e}")
 
     def _consume_messages(self):
         """Funkcja wątku konsumującego wiadomości."""
@@ -0,0 +1,328 @@
+# pifunc/adapters/asgi_adapter.py
+"""
+Lekki silnik HTTP: własna aplikacja ASGI bez warstwy routingu FastAPI.
+
+Włączany przez `run_services(http={"engine": "asgi"})`. Żądanie trafia z
+drzewa tras (`RouteTrie`) prosto do wywoływacza usługi, bez rozwiązywania
+zależności i budowania obiektów Request/Response przy każdym wywołaniu.
+Przeznaczony dla wewnętrznych API, w których liczy się opóźnienie.
+
+Semantyka `@service(http=...)` jest taka sama jak w silniku FastAPI:
+ścieżki z parametrami, argumenty z query (GET) lub ciała (POST/PUT/PATCH),
+walidacja modelami pydantic, kodeki, strumienie NDJSON/SSE, endpoint
+wsadowy i metryki. Błędy zwracane są jako {"detail": ...} z tymi samymi
+kodami statusu. Nie ma dokumentacji OpenAPI ani obsługi CORS.
+"""
+
+import asyncio
+import logging
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Set, Tuple, Union
+from urllib.parse import parse_qsl
+
+from pifunc.adapters.codecs import CodecError, codec_for_content_type, get_codec
+from pifunc.adapters.http_adapter import HTTPAdapter
+from pifunc.adapters.http_encoding import ResponseEncoder
+from pifunc.adapters.http_models import ValidationFailed
+from pifunc.adapters.http_streaming import STREAM_FORMATS, encode_stream, is_stream, stream_format, stream_headers
+from pifunc.adapters.routing import RouteTrie
+from pifunc.deadlines import DEADLINE_HEADER, DeadlineExceeded, parse_timeout
+from pifunc.invoker import ArgumentError, get_invoker
+from pifunc.limits import ServiceOverloaded
+from pifunc.metrics import PROMETHEUS_CONTENT_TYPE, render_prometheus, track
+from pifunc.runtime import ServiceExecutors
+
+logger = logging.getLogger(__name__)
+
+_HTTP_METHODS = ("GET", "POST", "PUT", "DELETE", "PATCH")
+
+# Nazwy nagłówków ASGI są zapisane małymi literami
+_DEADLINE_HEADER = DEADLINE_HEADER.lower()
+
+# Odpowiedź handlera: (status, typ treści, ciało lub strumień fragmentów, dodatkowe nagłówki)
+_Response = Tuple[int, str, Union[bytes, AsyncIterator[bytes]], Optional[Dict[str, str]]]
+
+
+class _HTTPError(Exception):
+    """Błąd żądania zwracany klientowi jako {"detail": ...}."""
+
+    def __init__(self, status: int, detail: Any, headers: Optional[Dict[str, str]] = None):
+        super().__init__(detail)
+        self.status = status
+        self.detail = detail
+        self.headers = headers
+
+
+def _headers(scope: Dict[str, Any]) -> Dict[str, str]:
+    return {name.decode("latin-1"): value.decode("latin-1") for name, value in scope["headers"]}
+
+
+async def _read_body(receive: Callable) -> bytes:
+    chunks = []
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            raise ConnectionError("Client disconnected")
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body", False):
+            return b"".join(chunks)
+
+
+class ASGIAdapter(HTTPAdapter):
+    """Adapter HTTP z własnym, minimalnym routerem ASGI."""
+
+    def __init__(self):
+        super().__init__()
+        # Żądania obsługuje własny router zamiast aplikacji FastAPI
+        self.app = self._asgi
+        self.router = RouteTrie()
+
+    def setup(self, config: Dict[str, Any]) -> None:
+        """Konfiguruje adapter HTTP."""
+        self.config = config
+
+        # Pule wykonawców dla synchronicznych usług, aby nie blokowały pętli serwera
+        self.executors = ServiceExecutors(
+            default=config.get("executor", "thread"),
+            max_workers=config.get("max_workers"),
+            process_workers=config.get("process_workers"),
+            name="pifunc-http"
+        )
+
+        if config.get("batch", False):
+            self._mount_batch(config.get("batch_path", "/api/_batch"), config.get("batch_max_size", 100))
+
+        if config.get("cors", False):
+            logger.warning("CORS is not supported by the asgi HTTP engine; use the fastapi engine")
+
+    def register_function(self, func: Callable, metadata: Dict[str, Any]) -> None:
+        """Rejestruje funkcję jako endpoint HTTP."""
+        http_config = metadata.get("http", {})
+        path = http_config.get("path", f"/api/{func.__module__}/{func.__name__}")
+        method = http_config.get("method", "POST")
+        if method not in _HTTP_METHODS:
+            raise ValueError(f"Nieobsługiwana metoda HTTP: {method}")
+
+        # Wywoływacz i modele budowane są raz, przy rejestracji usługi
+        invoker = get_invoker(func, metadata)
+        models = self._build_models(invoker.name, func)
+        default_stream = http_config.get("stream", "ndjson")
+        if default_stream not in STREAM_FORMATS:
+            raise ValueError(f"Invalid stream format: {default_stream}. Valid formats are: {list(STREAM_FORMATS)}")
+        self._services[invoker.name] = (invoker, models)
+
+        encoder = ResponseEncoder(func, metadata, self.config, method)
+        handler = self._service_handler(invoker, models, self.codec_for(metadata),
+                                        method in ["POST", "PUT", "PATCH"], default_stream, encoder)
+        self.router.add(path, method, handler)
+
+    def _service_handler(self, invoker, models, service_codec, has_body: bool, default_stream: str,
+                         encoder: ResponseEncoder) -> Callable:
+        """Tworzy handler usługi; wszystko, co zależy tylko od usługi, liczone jest tutaj."""
+        list_params: Set[str] = models.sequence_params if models is not None else set()
+
+        async def handler(scope, receive, path_params) -> _Response:
+            headers = _headers(scope)
+            with track(invoker.name, "http") as timer:
+                # Kodek żądania wynika z Content-Type, kodek odpowiedzi z Accept
+                codec = codec_for_content_type(headers.get("content-type"), service_codec)
+                response_codec = codec_for_content_type(headers.get("accept"), codec)
+
+                try:
+                    if has_body:
+                        body = await _read_body(receive)
+                        if models is None:
+                            kwargs = codec.decode(body)
+                        elif codec.content_type == "application/json":
+                            # JSON parsowany i walidowany w jednym przebiegu walidatora pydantic
+                            kwargs = models.parse_json(body)
+                        else:
+                            kwargs = models.parse(codec.decode(body))
+                    else:
+                        kwargs = {}
+                        for name, value in parse_qsl(scope["query_string"].decode("latin-1"), keep_blank_values=True):
+                            if name in list_params:
+                                kwargs.setdefault(name, []).append(value)
+                            else:
+                                kwargs[name] = value
+                        kwargs.update(path_params)
+                        if models is not None:
+                            kwargs = models.parse(kwargs)
+                    timer.mark("decode")
+                except CodecError as e:
+                    logger.error(f"Request decode error: {e}")
+                    raise _HTTPError(400, str(e))
+                except ValidationFailed as e:
+                    raise _HTTPError(400, e.errors)
+
+                # Powtórzone zapytanie z tymi samymi argumentami obsługujemy z pamięci podręcznej
+                cache_key, representation = encoder.lookup(invoker, kwargs, response_codec.content_type)
+                if representation is not None:
+                    return self._represent(encoder, representation, headers)
+
+                try:
+                    timeout = parse_timeout(headers.get(_DEADLINE_HEADER))
+                    result = await invoker.call_async(kwargs, self.executors, timeout)
+                except ArgumentError as e:
+                    logger.error(f"Type conversion error for {e.param}: {e}")
+                    raise _HTTPError(400, str(e))
+                except TypeError as e:
+                    logger.error(f"Function call error: {e}")
+                    raise _HTTPError(400, f"Invalid parameters: {str(e)}")
+                except ServiceOverloaded as e:
+                    raise _HTTPError(503, str(e), {"retry-after": str(e.retry_after)})
+                except DeadlineExceeded as e:
+                    raise _HTTPError(504, str(e))
+                except Exception as e:
+                    logger.error(f"Function execution error: {e}")
+                    raise _HTTPError(500, f"Internal error: {str(e)}")
+                timer.mark("execute")
+
+                # Generatory wysyłamy jako strumień NDJSON lub SSE, element po elementie
+                if is_stream(result):
+                    format_name = stream_format(headers.get("accept"), default_stream)
+                    body = encode_stream(result, format_name, models, self._stream_executor(invoker), invoker.name)
+                    return 200, STREAM_FORMATS[format_name], body, stream_headers(format_name)
+
+                # Zwracamy wynik; JSON serializujemy według typu zwracanego
+                content = None
+                if models is not None and models.typed_result and response_codec.content_type == "application/json":
+                    content = models.dump_json(result)
+                if content is None:
+                    content = response_codec.encode({"result": result})
+                if encoder.enabled:
+                    representation = encoder.represent(content, response_codec.content_type, cache_key)
+                    response = self._represent(encoder, representation, headers)
+                else:
+                    response = 200, response_codec.content_type, content, None
+                timer.mark("encode")
+                return response
+
+        return handler
+
+    @staticmethod
+    def _represent(encoder: ResponseEncoder, representation, headers: Dict[str, str]) -> _Response:
+        """Odpowiedź z kompresją gzip i ETag (304, gdy klient ma aktualną wersję)."""
+        status, body, response_headers = encoder.respond(representation, headers.get("if-none-match"),
+                                                         headers.get("accept-encoding"))
+        return status, representation.content_type, body, response_headers
+
+    async def _asgi(self, scope, receive, send) -> None:
+        """Aplikacja ASGI: dopasowanie trasy i wywołanie jej handlera."""
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            return
+
+        handler, params, allowed = self.router.match(scope["method"], scope["path"])
+        if handler is None:
+            if allowed:
+                await self._send(send, 405, {"detail": "Method Not Allowed"}, {"allow": ", ".join(sorted(allowed))})
+            else:
+                await self._send(send, 404, {"detail": "Not Found"})
+            return
+
+        try:
+            status, content_type, body, headers = await handler(scope, receive, params)
+        except _HTTPError as e:
+            await self._send(send, e.status, {"detail": e.detail}, e.headers)
+            return
+        except ConnectionError:
+            # Klient rozłączył się w trakcie wysyłania ciała żądania
+            return
+        except Exception as e:
+            logger.error(f"Unexpected error: {e}")
+            await self._send(send, 500, {"detail": str(e)})
+            return
+
+        if isinstance(body, bytes):
+            await self._send_bytes(send, status, content_type, body, headers)
+        else:
+            await self._send_stream(receive, send, status, content_type, body, headers)
+
+    @staticmethod
+    async def _lifespan(receive, send) -> None:
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    @staticmethod
+    def _raw_headers(content_type: str, headers: Optional[Dict[str, str]]) -> List[Tuple[bytes, bytes]]:
+        raw = [(b"content-type", content_type.encode("latin-1"))]
+        for name, value in (headers or {}).items():
+            raw.append((name.lower().encode("latin-1"), value.encode("latin-1")))
+        return raw
+
+    async def _send(self, send, status: int, data: Any, headers: Optional[Dict[str, str]] = None) -> None:
+        """Wysyła odpowiedź JSON (błędy i odpowiedzi routera)."""
+        await self._send_bytes(send, status, "application/json", get_codec("json").encode(data), headers)
+
+    async def _send_bytes(self, send, status: int, content_type: str, body: bytes,
+                          headers: Optional[Dict[str, str]] = None) -> None:
+        raw = self._raw_headers(content_type, headers)
+        raw.append((b"content-length", str(len(body)).encode("latin-1")))
+        await send({"type": "http.response.start", "status": status, "headers": raw})
+        await send({"type": "http.response.body", "body": body})
+
+    async def _send_stream(self, receive, send, status: int, content_type: str, chunks: AsyncIterator[bytes],
+                           headers: Optional[Dict[str, str]] = None) -> None:
+        """Wysyła strumień fragmentów; rozłączenie klienta przerywa i zamyka strumień."""
+        async def pump():
+            await send({"type": "http.response.start", "status": status,
+                        "headers": self._raw_headers(content_type, headers)})
+            async for chunk in chunks:
+                await send({"type": "http.response.body", "body": chunk, "more_body": True})
+            await send({"type": "http.response.body", "body": b""})
+
+        async def watch_disconnect():
+            while (await receive())["type"] != "http.disconnect":
+                pass
+            task.cancel()
+
+        task = asyncio.ensure_future(pump())
+        watcher = asyncio.ensure_future(watch_disconnect())
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        finally:
+            watcher.cancel()
+            await chunks.aclose()
+
+    def _mount_batch(self, path: str, max_size: int) -> None:
+        """Udostępnia endpoint wsadowy, jak w silniku FastAPI."""
+        async def batch_handler(scope, receive, path_params) -> _Response:
+            headers = _headers(scope)
+            codec = codec_for_content_type(headers.get("content-type"), get_codec("json"))
+            try:
+                calls = codec.decode(await _read_body(receive))
+            except CodecError as e:
+                raise _HTTPError(400, str(e))
+            if not isinstance(calls, list):
+                raise _HTTPError(400, "Expected an array of calls")
+            if len(calls) > max_size:
+                raise _HTTPError(413, f"Batch exceeds the limit of {max_size} calls")
+
+            timeout = parse_timeout(headers.get(_DEADLINE_HEADER))
+            response_codec = codec_for_content_type(headers.get("accept"), codec)
+            if stream_format(headers.get("accept"), None) == "ndjson":
+                return 200, STREAM_FORMATS["ndjson"], self._batch_stream(calls, timeout, response_codec), None
+
+            results = await asyncio.gather(*(self._batch_call(call, timeout) for call in calls))
+            return 200, response_codec.content_type, response_codec.encode({"results": results}), None
+
+        self.router.add(path, "POST", batch_handler)
+
+    def _mount_metrics(self, path: str) -> None:
+        """Udostępnia metryki w formacie tekstowym Prometheusa."""
+        if self.router.match("GET", path)[0] is not None:
+            return
+
+        async def metrics_handler(scope, receive, path_params) -> _Response:
+            return 200, PROMETHEUS_CONTENT_TYPE, render_prometheus().encode("utf-8"), None
+
+        self.router.add(path, "GET", metrics_handler)
@@ -0,0 +1,195 @@
+# pifunc/adapters/codecs.py
+"""
+Rejestr kodeków używanych przez adaptery do kodowania i dekodowania wiadomości.
+
+Dostępne kodeki:
+    json-stdlib - moduł json z biblioteki standardowej (zawsze dostępny),
+    orjson      - szybka implementacja JSON, jeśli pakiet orjson jest zainstalowany,
+    json        - najszybszy dostępny kodek JSON (orjson lub json-stdlib),
+    msgpack     - binarny format MessagePack dla protokołów binarnych.
+
+Kodek wybierany jest per adapter (`run_services(mqtt={"codec": "msgpack"})`)
+lub per usługa (`@service(codec="msgpack", ...)`).
+"""
+
+import dataclasses
+import datetime
+import decimal
+import enum
+import json
+import pathlib
+import uuid
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Optional, Union
+
+try:
+    import orjson
+
+    _orjson_available = True
+except ImportError:
+    _orjson_available = False
+
+try:
+    import msgpack
+
+    _msgpack_available = True
+except ImportError:
+    _msgpack_available = False
+
+
+class CodecError(ValueError):
+    """Błąd dekodowania wiadomości."""
+
+
+def _default(obj: Any) -> Any:
+    """Serializuje typy nieobsługiwane natywnie przez kodeki (tak jak jsonable_encoder FastAPI)."""
+    if dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+        return dataclasses.asdict(obj)
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    if hasattr(obj, "model_dump"):
+        return obj.model_dump()
+    if isinstance(obj, (datetime.datetime, datetime.date, datetime.time)):
+        return obj.isoformat()
+    if isinstance(obj, datetime.timedelta):
+        return obj.total_seconds()
+    if isinstance(obj, enum.Enum):
+        return obj.value
+    if isinstance(obj, decimal.Decimal):
+        # Liczby całkowite zostają całkowite, pozostałe zamieniamy na float
+        return int(obj) if obj.as_tuple().exponent >= 0 else float(obj)
+    if isinstance(obj, (uuid.UUID, pathlib.PurePath)):
+        return str(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not serializable")
+
+
+class Codec(ABC):
+    """Bazowa klasa kodeka."""
+
+    name = ""
+    content_type = ""
+    binary = False
+
+    @abstractmethod
+    def encode(self, obj: Any) -> bytes:
+        """Koduje obiekt do bajtów."""
+        pass
+
+    @abstractmethod
+    def decode(self, data: Union[bytes, str]) -> Any:
+        """Dekoduje wiadomość; przy niepoprawnych danych zgłasza CodecError."""
+        pass
+
+
+class JSONCodec(Codec):
+    """Kodek JSON oparty na bibliotece standardowej."""
+
+    name = "json-stdlib"
+    content_type = "application/json"
+
+    def encode(self, obj: Any) -> bytes:
+        return json.dumps(obj, default=_default).encode("utf-8")
+
+    def decode(self, data: Union[bytes, str]) -> Any:
+        try:
+            return json.loads(data)
+        except (ValueError, UnicodeDecodeError) as e:
+            raise CodecError(f"Invalid JSON: {e}") from e
+
+
+class OrjsonCodec(Codec):
+    """Kodek JSON oparty na orjson."""
+
+    name = "orjson"
+    content_type = "application/json"
+
+    def encode(self, obj: Any) -> bytes:
+        try:
+            return orjson.dumps(obj, default=_default, option=orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            # np. liczby całkowite większe niż 64 bity
+            return json.dumps(obj, default=_default).encode("utf-8")
+
+    def decode(self, data: Union[bytes, str]) -> Any:
+        try:
+            return orjson.loads(data)
+        except ValueError as e:
+            raise CodecError(f"Invalid JSON: {e}") from e
+
+
+class MsgpackCodec(Codec):
+    """Binarny kodek MessagePack."""
+
+    name = "msgpack"
+    content_type = "application/msgpack"
+    binary = True
+
+    def encode(self, obj: Any) -> bytes:
+        return msgpack.packb(obj, default=_default, use_bin_type=True)
+
+    def decode(self, data: Union[bytes, str]) -> Any:
+        if isinstance(data, str):
+            data = data.encode("latin-1")
+        try:
+            return msgpack.unpackb(data, raw=False)
+        except (ValueError, msgpack.ExtraData, msgpack.FormatError, msgpack.StackError) as e:
+            raise CodecError(f"Invalid MessagePack: {e}") from e
+
+
+_CODECS: Dict[str, Codec] = {}
+_CONTENT_TYPES: Dict[str, Codec] = {}
+_UNAVAILABLE: Dict[str, str] = {}
+
+DEFAULT_CODEC = "json"
+
+
+def register_codec(codec: Codec, *aliases: str, content_types=None) -> None:
+    """
+    Rejestruje kodek pod jego nazwą i aliasami.
+
+    Kodek obsługuje też podane typy treści (domyślnie `codec.content_type`)
+    przy negocjacji nagłówków Content-Type/Accept.
+    """
+    for name in (codec.name,) + aliases:
+        _CODECS[name] = codec
+        _UNAVAILABLE.pop(name, None)
+    if content_types is None:
+        content_types = (codec.content_type,)
+    for content_type in content_types:
+        _CONTENT_TYPES[content_type] = codec
+
+
+def get_codec(name: Optional[str] = None) -> Codec:
+    """Zwraca kodek o podanej nazwie (domyślnie najszybszy JSON)."""
+    name = name or DEFAULT_CODEC
+    codec = _CODECS.get(name)
+    if codec is not None:
+        return codec
+    if name in _UNAVAILABLE:
+        raise ImportError(f"Codec {name} requires the '{_UNAVAILABLE[name]}' package")
+    raise ValueError(f"Unknown codec: {name}. Available codecs are: {sorted(_CODECS)}")
+
+
+def codec_for_content_type(content_type: Optional[str], default: Optional[Codec] = None) -> Optional[Codec]:
+    """Dobiera kodek na podstawie nagłówka Content-Type lub Accept."""
+    if not content_type:
+        return default
+    for media_type in content_type.split(","):
+        media_type = media_type.split(";", 1)[0].strip().lower()
+        if media_type in _CONTENT_TYPES:
+            return _CONTENT_TYPES[media_type]
+    return default
+
+
+register_codec(JSONCodec(), content_types=())
+
+if _orjson_available:
+    register_codec(OrjsonCodec(), "json", content_types=("application/json",))
+else:
+    _UNAVAILABLE["orjson"] = "orjson"
+    register_codec(_CODECS["json-stdlib"], "json", content_types=("application/json",))
+
+if _msgpack_available:
+    register_codec(MsgpackCodec(), content_types=("application/msgpack", "application/x-msgpack"))
+else:
+    _UNAVAILABLE["msgpack"] = "msgpack"
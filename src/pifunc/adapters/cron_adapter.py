@@ -6,6 +6,9 @@ import inspect
 import datetime
 from typing import Any, Callable, Dict, List, Optional
 from pifunc.adapters import ProtocolAdapter
+from pifunc.deadlines import deadline
+from pifunc.invoker import get_invoker
+from pifunc.metrics import track
 
 logger = logging.getLogger(__name__)
 
@@ -16,7 +19,6 @@ try:
     _schedule_available = True
 except ImportError:
     _schedule_available = False
-    print("Warning: Schedule library not available. CRON adapter will be disabled.")
 
 
 class CRONAdapter(ProtocolAdapter):
@@ -39,6 +41,7 @@ class CRONAdapter(ProtocolAdapter):
         if not _schedule_available:
             if self.force_connection:
                 raise ImportError("Schedule library is required but not available.")
+            logger.warning("Schedule library not available. CRON adapter will be disabled.")
             self._connected = False
             return
 
@@ -69,6 +72,7 @@ class CRONAdapter(ProtocolAdapter):
         job_config = {
             "function": func,
             "metadata": metadata,
+            "invoker": get_invoker(func, metadata),
             "schedule": self._parse_schedule(cron_config),
             "last_run": None,
             "next_run": None,
@@ -172,15 +176,19 @@ class CRONAdapter(ProtocolAdapter):
         # Wykonujemy zadanie z obsługą błędów i ponowień
         while retry_count <= job_config["max_retries"]:
             try:
-                # Sprawdzamy, czy to funkcja kliencka
-                if job_config["client_config"]:
-                    self._execute_client_function(func, job_config["client_config"])
-                else:
-                    # Standardowe wywołanie funkcji
-                    result = func()
+                with track(job_config["invoker"].name, "cron") as timer:
+                    # Sprawdzamy, czy to funkcja kliencka
+                    if job_config["client_config"]:
+                        # Wywołanie klienta dostaje czas pozostały do końca limitu zadania
+                        with deadline(job_config["timeout"]):
+                            self._execute_client_function(func, job_config["client_config"])
+                    else:
+                        # Standardowe wywołanie funkcji, przerywane po przekroczeniu limitu zadania
+                        result = job_config["invoker"].call_sync({}, job_config["timeout"])
 
-                    # Logujemy wynik
-                    logger.info(f"Zadanie {job_name} zakończone: {result}")
+                        # Logujemy wynik
+                        logger.info(f"Zadanie {job_name} zakończone: {result}")
+                    timer.mark("execute")
 
                 # Sukces, przerywamy pętle
                 break
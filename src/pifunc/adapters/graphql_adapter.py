@@ -6,8 +6,14 @@ import threading
 from typing import Any, Callable, Dict, List, Optional, Type, get_type_hints
 from pathlib import Path
 import dataclasses
+import logging
 from aiohttp import web
 from pifunc.adapters import ProtocolAdapter
+from pifunc.invoker import ServiceInvoker, get_invoker
+from pifunc.metrics import track
+from pifunc.runtime import ServiceExecutors
+
+logger = logging.getLogger(__name__)
 
 # Importy GraphQL
 try:
@@ -24,7 +30,6 @@ try:
 except ImportError:
     # Tworzymy mock dla GraphQL, jeśli biblioteka nie jest dostępna
     _graphql_available = False
-    print("Warning: GraphQL library not available. GraphQL adapter will be disabled.")
 
 
 class GraphQLAdapter(ProtocolAdapter):
@@ -39,7 +44,9 @@ class GraphQLAdapter(ProtocolAdapter):
         self.runner = None
         self.site = None
         self.server_thread = None
+        self.loop = None
         self._connected = _graphql_available
+        self.executors = ServiceExecutors(name="pifunc-graphql")
 
         if not _graphql_available:
             return
@@ -59,6 +66,15 @@ class GraphQLAdapter(ProtocolAdapter):
     def setup(self, config: Dict[str, Any]) -> None:
         """Konfiguruje adapter GraphQL."""
         self.config = config
+
+        # Pule wykonawców dla synchronicznych usług, aby nie blokowały pętli serwera
+        self.executors = ServiceExecutors(
+            default=config.get("executor", "thread"),
+            max_workers=config.get("max_workers"),
+            process_workers=config.get("process_workers"),
+            name="pifunc-graphql"
+        )
+
         # Dodajemy flagę wymuszania połączenia
         self.force_connection = config.get("force_connection", False)
 
@@ -66,13 +82,14 @@ class GraphQLAdapter(ProtocolAdapter):
             raise ImportError("GraphQL library is required but not available.")
 
         if not _graphql_available:
+            logger.warning("GraphQL library not available. GraphQL adapter will be disabled.")
             self._connected = False
             return
 
     def register_function(self, func: Callable, metadata: Dict[str, Any]) -> None:
         """Rejestruje funkcję jako pole GraphQL."""
         if not self._connected:
-            print(f"Not connected to GraphQL, skipping registration of {func.__name__}")
+            logger.warning(f"Not connected to GraphQL, skipping registration of {func.__name__}")
             return
 
         service_name = metadata.get("name", func.__name__)
@@ -83,6 +100,8 @@ class GraphQLAdapter(ProtocolAdapter):
         description = graphql_config.get("description", func.__doc__ or "")
         is_mutation = graphql_config.get("is_mutation", False)
 
+        invoker = get_invoker(func, metadata)
+
         # Analizujemy sygnaturę funkcji
         signature = inspect.signature(func)
 
@@ -116,12 +135,17 @@ class GraphQLAdapter(ProtocolAdapter):
         return_type = signature.return_annotation if signature.return_annotation != inspect.Parameter.empty else None
         return_graphql_type = self._get_graphql_type(return_type)
 
+        # Słowniki zwracane są jako tekst JSON w polu typu String
+        as_json = return_graphql_type is GraphQLString and (
+            return_type is dict or getattr(return_type, "__origin__", None) is dict
+        )
+
         # Tworzymy pole GraphQL
         try:
             field = GraphQLField(
                 type_=return_graphql_type,
                 args=args,
-                resolve=lambda obj, info, **kwargs: self._resolve_field(func, kwargs),
+                resolve=lambda obj, info, **kwargs: self._resolve_field(invoker, kwargs, as_json),
                 description=description
             )
         except TypeError:
@@ -129,7 +153,7 @@ class GraphQLAdapter(ProtocolAdapter):
             field = GraphQLField(
                 type=return_graphql_type,
                 args=args,
-                resolve=lambda obj, info, **kwargs: self._resolve_field(func, kwargs),
+                resolve=lambda obj, info, **kwargs: self._resolve_field(invoker, kwargs, as_json),
                 description=description
             )
 
@@ -153,6 +177,8 @@ class GraphQLAdapter(ProtocolAdapter):
             return GraphQLString
 
         # Obsługa list
+        if python_type is list:
+            return GraphQLList(GraphQLString)
         if hasattr(python_type, "__origin__") and python_type.__origin__ is list:
             item_type = python_type.__args__[0]
             return GraphQLList(self._get_graphql_type(item_type))
@@ -220,28 +246,26 @@ class GraphQLAdapter(ProtocolAdapter):
         # Domyślnie zwracamy string
         return GraphQLString
 
-    def _resolve_field(self, func: Callable, kwargs: Dict[str, Any]) -> Any:
+    async def _resolve_field(self, invoker: ServiceInvoker, kwargs: Dict[str, Any], as_json: bool = False) -> Any:
         """Wykonuje funkcję i zwraca wynik dla pola GraphQL."""
         if not self._connected:
             return None
 
+        # Zapytanie GraphQL dekodowane jest raz dla wszystkich pól, więc
+        # dla pojedynczej usługi mierzymy tylko wykonanie
+        timer = track(invoker.name, "graphql").start()
         try:
-            # Wywołujemy funkcję
-            result = func(**kwargs)
-
-            # Obsługujemy coroutines
-            if asyncio.iscoroutine(result):
-                # Tworzymy nową pętlę asyncio
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
-                result = loop.run_until_complete(result)
-                loop.close()
-
-            return result
-
+            # Resolver działa w pętli serwera, więc limity współbieżności, łączenie
+            # wywołań i limity czasu muszą czekać asynchronicznie; funkcje
+            # synchroniczne trafiają do puli wykonawców adaptera
+            result = await invoker.call_async(kwargs, self.executors)
         except Exception as e:
+            timer.finish(failed=True)
             # Przekazujemy wyjątek do GraphQL
             raise graphql.GraphQLError(str(e))
+        timer.mark("execute")
+        timer.finish()
+        return json.dumps(result, default=str) if as_json else result
 
     def _build_schema(self) -> GraphQLSchema:
         """Buduje schemat GraphQL na podstawie zarejestrowanych funkcji."""
@@ -377,7 +401,12 @@ class GraphQLAdapter(ProtocolAdapter):
         self.runner = web.AppRunner(self.app)
         await self.runner.setup()
 
-        self.site = web.TCPSite(self.runner, host, port)
+        # W trybie prefork gniazdo nasłuchujące jest tworzone przez nadzorcę
+        sock = self.config.get("socket")
+        if sock is not None:
+            self.site = web.SockSite(self.runner, sock)
+        else:
+            self.site = web.TCPSite(self.runner, host, port)
         await self.site.start()
 
         print(f"Serwer GraphQL uruchomiony na http://{host}:{port}/graphql")
@@ -391,19 +420,20 @@ class GraphQLAdapter(ProtocolAdapter):
 
         loop = asyncio.new_event_loop()
         asyncio.set_event_loop(loop)
+        self.loop = loop
 
         try:
             loop.run_until_complete(self._run_server())
             loop.run_forever()
         except Exception as e:
-            print(f"Błąd serwera GraphQL: {e}")
+            logger.error(f"GraphQL server error: {e}")
         finally:
             loop.close()
 
     def start(self) -> None:
         """Uruchamia serwer GraphQL."""
         if not self._connected:
-            print("GraphQL adapter not connected, skipping start")
+            logger.warning("GraphQL adapter not connected, skipping start")
             return
 
         # Budujemy schemat
@@ -419,15 +449,15 @@ class GraphQLAdapter(ProtocolAdapter):
         if not self._connected:
             return
 
-        # Zatrzymujemy serwer
-        if self.site and self.runner:
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-
+        # Zatrzymujemy serwer w pętli, w której działa
+        if self.runner and self.loop is not None and self.loop.is_running():
             try:
-                loop.run_until_complete(self.site.stop())
-                loop.run_until_complete(self.runner.cleanup())
+                asyncio.run_coroutine_threadsafe(self.runner.cleanup(), self.loop).result(timeout=5.0)
             finally:
-                loop.close()
+                self.loop.call_soon_threadsafe(self.loop.stop)
+                if self.server_thread:
+                    self.server_thread.join(timeout=1.0)
+
+            print("Serwer GraphQL zatrzymany")
 
-            print("Serwer GraphQL zatrzymany")
\ No newline at end of file
+        self.executors.shutdown()
\ No newline at end of file
@@ -1,20 +1,126 @@
 # pifunc/adapters/grpc_adapter.py
-import os
-import sys
-import time
-import signal
-import importlib
-import inspect
-import subprocess
+import asyncio
 import concurrent.futures
+import itertools
 import grpc
-import asyncio
-from pathlib import Path
-from typing import Any, Callable, Dict, List
-import tempfile
-from google.protobuf.json_format import MessageToDict, ParseDict
+from typing import Any, Callable, Dict, Optional
 from grpc_reflection.v1alpha import reflection
 from pifunc.adapters import ProtocolAdapter
+from pifunc.adapters.grpc_schema import SchemaBuilder, ServiceSchema
+from pifunc.deadlines import DeadlineExceeded, parse_timeout
+from pifunc.invoker import get_invoker
+from pifunc.limits import ServiceOverloaded
+from pifunc.metrics import track
+from pifunc.runtime import ServiceExecutors, get_background_loop
+
+# Znacznik końca iteratora pobieranego w puli wątków
+_END = object()
+
+
+def _status_code(error: Exception) -> grpc.StatusCode:
+    """Kod statusu gRPC dla błędu usługi; przeciążenie klient może ponowić później."""
+    if isinstance(error, ServiceOverloaded):
+        return grpc.StatusCode.RESOURCE_EXHAUSTED
+    if isinstance(error, DeadlineExceeded):
+        return grpc.StatusCode.DEADLINE_EXCEEDED
+    return grpc.StatusCode.INTERNAL
+
+
+def _time_remaining(context) -> Optional[float]:
+    """Deadline klienta gRPC; bez deadline'u serwer synchroniczny zwraca ogromną wartość, czyli brak limitu."""
+    return parse_timeout(context.time_remaining())
+
+
+def _rpc_method_handler(schema: ServiceSchema, unary: Callable, per_message: Callable,
+                        stream_response: Callable, stream_request: Callable) -> grpc.RpcMethodHandler:
+    """Wybiera rodzaj metody gRPC (unary, server, client, bidi) zgodnie ze schematem usługi."""
+    if schema.per_message:
+        create, behavior = grpc.stream_stream_rpc_method_handler, per_message
+    elif schema.server_streaming and schema.client_streaming:
+        create, behavior = grpc.stream_stream_rpc_method_handler, stream_response
+    elif schema.server_streaming:
+        create, behavior = grpc.unary_stream_rpc_method_handler, stream_response
+    elif schema.client_streaming:
+        create, behavior = grpc.stream_unary_rpc_method_handler, stream_request
+    else:
+        create, behavior = grpc.unary_unary_rpc_method_handler, unary
+    return create(
+        behavior,
+        request_deserializer=schema.request_class.FromString,
+        response_serializer=schema.response_class.SerializeToString
+    )
+
+
+def _stream_kwargs(schema: ServiceSchema, request_iterator) -> Dict[str, Any]:
+    """Argumenty z pierwszej wiadomości strumienia i iterator elementów parametru strumieniowego."""
+    first = next(request_iterator, None)
+    if first is None:
+        kwargs, messages = {}, iter(())
+    else:
+        kwargs, messages = schema.request_to_dict(first), itertools.chain((first,), request_iterator)
+    kwargs[schema.stream_param] = schema.stream_values(messages)
+    return kwargs
+
+
+async def _astream_kwargs(schema: ServiceSchema, request_iterator) -> Dict[str, Any]:
+    """Asynchroniczna wersja `_stream_kwargs` dla serwera grpc.aio."""
+    request_iterator = request_iterator.__aiter__()
+    try:
+        first = await request_iterator.__anext__()
+    except StopAsyncIteration:
+        kwargs, messages = {}, _async_iterator(iter(()))
+    else:
+        kwargs, messages = schema.request_to_dict(first), _prepend(first, request_iterator)
+    kwargs[schema.stream_param] = schema.astream_values(messages)
+    return kwargs
+
+
+async def _prepend(first, rest):
+    yield first
+    async for item in rest:
+        yield item
+
+
+async def _async_iterator(iterator, executor=None):
+    """Udostępnia blokujący iterator jako asynchroniczny, pobierając elementy w puli wątków."""
+    loop = asyncio.get_running_loop()
+    while True:
+        item = await loop.run_in_executor(executor, next, iterator, _END)
+        if item is _END:
+            return
+        yield item
+
+
+def _sync_iterator(async_iterator, loop: asyncio.AbstractEventLoop):
+    """Udostępnia asynchroniczny iterator usłudze działającej w wątku puli."""
+    async def next_item():
+        return await async_iterator.__anext__()
+
+    while True:
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            raise RuntimeError("Services awaited on the gRPC loop must take AsyncIterator parameters")
+        try:
+            yield asyncio.run_coroutine_threadsafe(next_item(), loop).result()
+        except StopAsyncIteration:
+            return
+
+
+def _iterate_async(async_iterator):
+    """Iteruje asynchroniczny wynik usługi z wątku serwera, przez współdzieloną pętlę."""
+    background = get_background_loop()
+
+    async def next_item():
+        return await async_iterator.__anext__()
+
+    while True:
+        try:
+            yield background.run(next_item())
+        except StopAsyncIteration:
+            return
 
 
 class GRPCAdapter(ProtocolAdapter):
@@ -24,14 +130,14 @@ class GRPCAdapter(ProtocolAdapter):
         self.server = None
         self.config = {}
         self.services = {}
-        self.temp_dir = Path(tempfile.mkdtemp())
-        self.proto_dir = self.temp_dir / 'proto'
-        self.generated_dir = self.temp_dir / 'generated'
-        self.proto_dir.mkdir(exist_ok=True)
-        self.generated_dir.mkdir(exist_ok=True)
+        self.max_workers = 10
+        self.reflection = True
+        self.aio = False
+        self.executors = ServiceExecutors(name="pifunc-grpc")
 
-        # Dodajemy katalog wygenerowanych plików do ścieżki Pythona
-        sys.path.append(str(self.generated_dir))
+        # Deskryptory usług trafiają do prywatnej puli adaptera, bez generowania kodu
+        self.schemas = SchemaBuilder()
+        self.pool = self.schemas.pool
 
     def setup(self, config: Dict[str, Any]) -> None:
         """Konfiguruje adapter gRPC."""
@@ -39,6 +145,16 @@ class GRPCAdapter(ProtocolAdapter):
         self.max_workers = config.get("max_workers", 10)
         self.reflection = config.get("reflection", True)
 
+        # W trybie aio serwer działa na współdzielonej pętli asyncio, a synchroniczne
+        # usługi trafiają do puli wykonawców zamiast do puli wątków serwera
+        self.aio = config.get("aio", False)
+        self.executors = ServiceExecutors(
+            default=config.get("executor", "thread"),
+            max_workers=self.max_workers,
+            process_workers=config.get("process_workers"),
+            name="pifunc-grpc"
+        )
+
     def register_function(self, func: Callable, metadata: Dict[str, Any]) -> None:
         """Rejestruje funkcję jako usługę gRPC."""
         service_name = metadata.get("name", func.__name__)
@@ -47,246 +163,216 @@ class GRPCAdapter(ProtocolAdapter):
         grpc_config = metadata.get("grpc", {})
         streaming = grpc_config.get("streaming", False)
 
-        # Generujemy plik .proto
-        self._generate_proto_file(func, service_name, streaming)
-
-        # Kompilujemy plik .proto
-        self._compile_proto_file(service_name)
+        # Budujemy deskryptory i klasy wiadomości z sygnatury funkcji; metoda trafia
+        # do usługi gRPC modułu funkcji albo do usługi wskazanej przez `service_name`
+        schema = self.schemas.build(func, service_name, streaming,
+                                    grpc_config.get("service_name"), grpc_config.get("method"))
 
         # Zapisujemy informacje o funkcji
         self.services[service_name] = {
             "function": func,
             "metadata": metadata,
-            "streaming": streaming
+            "invoker": get_invoker(func, metadata),
+            "streaming": streaming,
+            "schema": schema
         }
 
-    def _generate_proto_file(self, func: Callable, service_name: str, streaming: bool) -> None:
-        """Generuje plik .proto dla funkcji."""
-        # Analizujemy sygnaturę funkcji
-        signature = inspect.signature(func)
-
-        # Przygotowujemy zawartość pliku .proto
-        proto_content = f"""syntax = "proto3";
-
-package pifunc;
-
-service {service_name.capitalize()}Service {{
-  rpc {service_name.capitalize()}("""
-
-        # Dodajemy definicje wejścia/wyjścia z uwzględnieniem streamingu
-        if streaming:
-            proto_content += f"stream {service_name.capitalize()}Request) returns (stream {service_name.capitalize()}Response)"
-        else:
-            proto_content += f"{service_name.capitalize()}Request) returns ({service_name.capitalize()}Response)"
-
-        proto_content += " {}\n}\n\n"
-
-        # Dodajemy definicję wiadomości żądania
-        proto_content += f"message {service_name.capitalize()}Request {{\n"
-
-        for i, (param_name, param) in enumerate(signature.parameters.items(), 1):
-            # Pobieramy typ parametru
-            param_type = param.annotation if param.annotation != inspect.Parameter.empty else None
-            proto_type = self._get_proto_type(param_type)
-
-            # Dodajemy pole do wiadomości
-            proto_content += f"  {proto_type} {param_name} = {i};\n"
-
-        proto_content += "}\n\n"
-
-        # Dodajemy definicję wiadomości odpowiedzi
-        proto_content += f"message {service_name.capitalize()}Response {{\n"
-
-        # Pobieramy typ zwracany
-        return_type = signature.return_annotation if signature.return_annotation != inspect.Parameter.empty else None
-        proto_type = self._get_proto_type(return_type)
-
-        # Dodajemy pole do wiadomości
-        proto_content += f"  {proto_type} result = 1;\n"
-        proto_content += "}\n"
-
-        # Zapisujemy plik .proto
-        proto_file = self.proto_dir / f"{service_name}.proto"
-        with open(proto_file, 'w') as f:
-            f.write(proto_content)
-
-    def _get_proto_type(self, python_type) -> str:
-        """Konwertuje typ Pythona na typ protobuf."""
-        if python_type is None:
-            return "string"
-
-        type_map = {
-            int: "int32",
-            float: "double",
-            str: "string",
-            bool: "bool",
-            bytes: "bytes",
-            list: "repeated string",
-            dict: "map<string, string>"
-        }
-
-        return type_map.get(python_type, "string")
-
-    def _compile_proto_file(self, service_name: str) -> None:
-        """Kompiluje plik .proto do kodu Pythona."""
-        proto_file = self.proto_dir / f"{service_name}.proto"
-
-        try:
-            # Tworzymy komendę do kompilacji
-            cmd = [
-                'python', '-m', 'grpc_tools.protoc',
-                f'--proto_path={self.proto_dir}',
-                f'--python_out={self.generated_dir}',
-                f'--grpc_python_out={self.generated_dir}',
-                str(proto_file)
-            ]
-
-            # Uruchamiamy kompilację
-            subprocess.run(cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-
-            # Tworzymy plik __init__.py w katalogu z wygenerowanymi plikami
-            init_file = self.generated_dir / '__init__.py'
-            if not init_file.exists():
-                init_file.touch()
-
-        except subprocess.CalledProcessError as e:
-            print(f"Błąd kompilacji pliku .proto: {e.stderr.decode()}")
-
     def start(self) -> None:
         """Uruchamia serwer gRPC."""
         port = self.config.get("port", 50051)
         host = self.config.get("host", "[::]")
         address = f"{host}:{port}"
 
-        # Tworzymy serwer gRPC
-        self.server = grpc.server(
-            concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers)
-        )
-
-        # Rejestrujemy usługi
-        service_names = []
-        for service_name, service_info in self.services.items():
-            # Importujemy wygenerowane moduły
-            pb2_module = importlib.import_module(f"{service_name}_pb2")
-            pb2_grpc_module = importlib.import_module(f"{service_name}_pb2_grpc")
-
-            # Tworzymy serwis
-            service_class = self._create_service_class(
-                service_name,
-                service_info["function"],
-                service_info["streaming"],
-                pb2_module,
-                pb2_grpc_module
+        if self.aio:
+            # Serwer grpc.aio musi powstać w wątku pętli, na której będzie działał
+            get_background_loop().run(self._start_aio(address))
+        else:
+            # Tworzymy serwer gRPC; SO_REUSEPORT pozwala procesom prefork wiązać ten sam port
+            self.server = grpc.server(
+                concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers),
+                options=[("grpc.so_reuseport", 1)]
             )
+            self._add_services(self._create_method_handler)
+            self.server.add_insecure_port(address)
+            self.server.start()
 
-            # Rejestrujemy serwis
-            service_names.append(f"pifunc.{service_name.capitalize()}Service")
-            servicer_add_method = getattr(
-                pb2_grpc_module,
-                f"add_{service_name.capitalize()}ServiceServicer_to_server"
-            )
-            servicer_add_method(service_class(), self.server)
+        print(f"Serwer gRPC uruchomiony na {address}")
+
+    async def _start_aio(self, address: str) -> None:
+        """Tworzy i uruchamia serwer grpc.aio w bieżącej pętli."""
+        self.server = grpc.aio.server(options=[("grpc.so_reuseport", 1)])
+        self._add_services(self._create_aio_method_handler)
+        self.server.add_insecure_port(address)
+        await self.server.start()
+
+    def _add_services(self, create_handler: Callable) -> None:
+        """Rejestruje usługi jako generyczne handlery metod i włącza reflection."""
+        self.schemas.finalize()
+
+        # Jeden generyczny handler na usługę gRPC, ze słownikiem jej metod zbudowanym raz
+        methods = {}
+        for service_info in self.services.values():
+            schema = service_info["schema"]
+            methods.setdefault(schema.service_name, {})[schema.method_name] = create_handler(
+                service_info["invoker"], schema)
+        self.server.add_generic_rpc_handlers([
+            grpc.method_handlers_generic_handler(service_name, handlers)
+            for service_name, handlers in methods.items()
+        ])
+        service_names = list(methods)
 
         # Dodajemy serwis reflection
         if self.reflection:
             service_names.append(reflection.SERVICE_NAME)
-            reflection.enable_server_reflection(service_names, self.server)
+            reflection.enable_server_reflection(service_names, self.server, pool=self.pool)
+
+    def _create_method_handler(self, invoker, schema: ServiceSchema) -> grpc.RpcMethodHandler:
+        """Tworzy handler metody gRPC wywołujący usługę."""
+
+        def handle(request, context):
+            with track(invoker.name, "grpc") as timer:
+                # Konwertujemy request na słownik argumentów
+                kwargs = schema.request_to_dict(request)
+                timer.mark("decode")
+
+                # Wywołujemy funkcję
+                result = invoker.call_sync(kwargs, _time_remaining(context))
+                timer.mark("execute")
+
+                # Zwracamy wynik jako typowaną wiadomość
+                response = schema.encode_response(result)
+                timer.mark("encode")
+                return response
+
+        def open_stream(request, context, timer):
+            # Parametr strumieniowy dostaje elementy kolejnych wiadomości klienta, pobierane na żądanie
+            if schema.client_streaming:
+                kwargs = _stream_kwargs(schema, request)
+                if schema.stream_async:
+                    kwargs[schema.stream_param] = _async_iterator(kwargs[schema.stream_param])
+            else:
+                kwargs = schema.request_to_dict(request)
+            timer.mark("decode")
+            return invoker.call_sync(kwargs, _time_remaining(context))
+
+        def unary_method(request, context):
+            try:
+                return handle(request, context)
+            except Exception as e:
+                context.abort(_status_code(e), str(e))
 
-        # Uruchamiamy serwer
-        self.server.add_insecure_port(address)
-        self.server.start()
+        def per_message_method(request_iterator, context):
+            # Każda wiadomość wejściowa daje jedną wiadomość w strumieniu odpowiedzi
+            try:
+                for request in request_iterator:
+                    yield handle(request, context)
+            except Exception as e:
+                context.abort(_status_code(e), str(e))
 
-        print(f"Serwer gRPC uruchomiony na {address}")
+        def stream_response_method(request, context):
+            # Elementy są kodowane i wysyłane pojedynczo; gRPC pobiera kolejny dopiero po wysłaniu
+            try:
+                with track(invoker.name, "grpc") as timer:
+                    result = open_stream(request, context, timer)
+                    if hasattr(result, "__aiter__"):
+                        result = _iterate_async(result.__aiter__())
+                    for item in result:
+                        yield schema.encode_response(item)
+                    timer.mark("execute")
+            except Exception as e:
+                context.abort(_status_code(e), str(e))
+
+        def stream_request_method(request_iterator, context):
+            try:
+                with track(invoker.name, "grpc") as timer:
+                    result = open_stream(request_iterator, context, timer)
+                    timer.mark("execute")
+                    response = schema.encode_response(result)
+                    timer.mark("encode")
+                    return response
+            except Exception as e:
+                context.abort(_status_code(e), str(e))
+
+        return _rpc_method_handler(schema, unary_method, per_message_method,
+                                   stream_response_method, stream_request_method)
+
+    def _create_aio_method_handler(self, invoker, schema: ServiceSchema) -> grpc.RpcMethodHandler:
+        """Tworzy asynchroniczny handler metody dla serwera grpc.aio."""
+        executors = self.executors
+
+        async def handle(request, context):
+            with track(invoker.name, "grpc") as timer:
+                kwargs = schema.request_to_dict(request)
+                timer.mark("decode")
+
+                # Korutyny są oczekiwane w pętli serwera, funkcje synchroniczne idą do puli
+                result = await invoker.call_async(kwargs, executors, _time_remaining(context))
+                timer.mark("execute")
+
+                response = schema.encode_response(result)
+                timer.mark("encode")
+                return response
+
+        async def open_stream(request, context, timer):
+            if schema.client_streaming:
+                kwargs = await _astream_kwargs(schema, request)
+                if not schema.stream_async:
+                    kwargs[schema.stream_param] = _sync_iterator(kwargs[schema.stream_param],
+                                                                 asyncio.get_running_loop())
+            else:
+                kwargs = schema.request_to_dict(request)
+            timer.mark("decode")
+            return await invoker.call_async(kwargs, executors, _time_remaining(context))
+
+        async def unary_method(request, context):
+            try:
+                return await handle(request, context)
+            except Exception as e:
+                await context.abort(_status_code(e), str(e))
+
+        async def per_message_method(request_iterator, context):
+            try:
+                async for request in request_iterator:
+                    yield await handle(request, context)
+            except Exception as e:
+                await context.abort(_status_code(e), str(e))
 
-    def _create_service_class(self, service_name, func, streaming, pb2_module, pb2_grpc_module):
-        """Tworzy klasę implementującą usługę gRPC."""
-        servicer_class_name = f"{service_name.capitalize()}ServiceServicer"
-        base_servicer_class = getattr(pb2_grpc_module, servicer_class_name)
-        request_class = getattr(pb2_module, f"{service_name.capitalize()}Request")
-        response_class = getattr(pb2_module, f"{service_name.capitalize()}Response")
-
-        # Tworzymy klasę serwisu
-        class ServiceImplementation(base_servicer_class):
-
-            def __getattribute__(self, name):
-                # Jeśli metoda to nasza usługa RPC
-                if name == f"{service_name.capitalize()}":
-                    if streaming:
-                        # Implementacja streamingu
-                        async def streaming_method(request_iterator, context):
-                            try:
-                                # Przetwarzamy stream wejściowy
-                                async def process_input_stream():
-                                    for request in request_iterator:
-                                        # Konwertujemy request na słownik argumentów
-                                        kwargs = MessageToDict(
-                                            request,
-                                            preserving_proto_field_name=True
-                                        )
-                                        # Przekazujemy do funkcji
-                                        result = func(**kwargs)
-
-                                        # Jeśli funkcja zwraca coroutine, czekamy na wynik
-                                        if asyncio.iscoroutine(result):
-                                            result = await result
-
-                                        # Zwracamy wynik jako stream
-                                        yield response_class(result=str(result))
-
-                                # Zwracamy generator
-                                return process_input_stream()
-
-                            except Exception as e:
-                                context.set_code(grpc.StatusCode.INTERNAL)
-                                context.set_details(str(e))
-                                raise
-
-                        return streaming_method
-                    else:
-                        # Implementacja standardowej metody
-                        def unary_method(request, context):
-                            try:
-                                # Konwertujemy request na słownik argumentów
-                                kwargs = MessageToDict(
-                                    request,
-                                    preserving_proto_field_name=True
-                                )
-
-                                # Wywołujemy funkcję
-                                result = func(**kwargs)
-
-                                # Jeśli funkcja zwraca coroutine, czekamy na wynik
-                                if asyncio.iscoroutine(result):
-                                    # Tworzymy nową pętlę asyncio
-                                    loop = asyncio.new_event_loop()
-                                    asyncio.set_event_loop(loop)
-                                    result = loop.run_until_complete(result)
-                                    loop.close()
-
-                                # Zwracamy wynik
-                                return response_class(result=str(result))
-
-                            except Exception as e:
-                                context.set_code(grpc.StatusCode.INTERNAL)
-                                context.set_details(str(e))
-                                raise
-
-                        return unary_method
-
-                # W przeciwnym razie zwracamy oryginalny atrybut
-                return super().__getattribute__(name)
-
-        return ServiceImplementation
+        async def stream_response_method(request, context):
+            # `yield` czeka na kontrolę przepływu gRPC, więc wynik nie jest gromadzony w pamięci
+            try:
+                with track(invoker.name, "grpc") as timer:
+                    result = await open_stream(request, context, timer)
+                    if not hasattr(result, "__aiter__"):
+                        # Synchroniczne generatory mogą blokować, więc kolejne elementy pobieramy w puli
+                        result = _async_iterator(iter(result), executors.get("thread"))
+                    async for item in result:
+                        yield schema.encode_response(item)
+                    timer.mark("execute")
+            except Exception as e:
+                await context.abort(_status_code(e), str(e))
+
+        async def stream_request_method(request_iterator, context):
+            try:
+                with track(invoker.name, "grpc") as timer:
+                    result = await open_stream(request_iterator, context, timer)
+                    timer.mark("execute")
+                    response = schema.encode_response(result)
+                    timer.mark("encode")
+                    return response
+            except Exception as e:
+                await context.abort(_status_code(e), str(e))
+
+        return _rpc_method_handler(schema, unary_method, per_message_method,
+                                   stream_response_method, stream_request_method)
 
     def stop(self) -> None:
         """Zatrzymuje serwer gRPC."""
         if self.server:
-            self.server.stop(0)
+            if self.aio:
+                get_background_loop().run(self.server.stop(0))
+            else:
+                self.server.stop(0)
+            self.server = None
             print("Serwer gRPC zatrzymany")
 
-            # Czyścimy pliki tymczasowe
-            import shutil
-            try:
-                shutil.rmtree(self.temp_dir)
-            except:
-                pass
\ No newline at end of file
+        self.executors.shutdown()
@@ -0,0 +1,600 @@
+# pifunc/adapters/grpc_schema.py
+"""
+Budowanie deskryptorów protobuf bezpośrednio z sygnatur funkcji.
+
+Zamiast generować tekstowe pliki .proto i kompilować je przez protoc,
+adapter gRPC tworzy `FileDescriptorProto` dla każdej usługi, ładuje go do
+prywatnej puli deskryptorów i tworzy klasy wiadomości w pamięci:
+
+    schema = SchemaBuilder().build(add, "add")
+    schema.request_class(a=1, b=2)
+
+Typy Pythona odwzorowywane są na typy protobuf:
+
+    int, float, str, bool, bytes  -> int64, double, string, bool, bytes
+    List[T]                       -> repeated T
+    Dict[str, T]                  -> map<string, T>
+    Optional[T]                   -> optional T
+    dataclass                     -> wiadomość (definiowana raz na pulę)
+    pozostałe (Any, brak adnotacji, List[List[T]]) -> string z tekstem JSON
+
+Pola z tekstem JSON mają w deskryptorze `json_name` zakończone na `__json`,
+dzięki czemu klient (`pifunc.grpc_client`) wie, że ma je zakodować i odkodować.
+
+Strumienie wynikają z typów funkcji:
+
+    def f(...) -> Iterator[T] (lub generator)   -> strumień odpowiedzi (server streaming)
+    def f(items: Iterator[T], ...)              -> strumień żądań (client streaming)
+    oba naraz                                   -> strumień dwukierunkowy (bidi)
+
+W strumieniu żądań każda wiadomość niesie jeden element parametru
+strumieniowego; pozostałe argumenty odczytywane są z pierwszej wiadomości.
+
+Funkcje jednego modułu Pythona tworzą jedną usługę gRPC z wieloma metodami
+(np. moduł `math_ops` -> `pifunc.MathOpsService`), chyba że podano
+`grpc={"service_name": ...}`. Wiadomości każdej funkcji trafiają do jej
+pliku, a pliki z definicjami usług powstają w `SchemaBuilder.finalize()`,
+gdy znane są już wszystkie metody.
+
+Plik .proto dla klientów można nadal wyeksportować przez `render_proto`.
+"""
+
+import collections.abc
+import dataclasses
+import inspect
+import json
+import typing
+from typing import Any, AsyncIterable, AsyncIterator, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from google.protobuf import descriptor_pb2, descriptor_pool, message_factory
+
+FieldProto = descriptor_pb2.FieldDescriptorProto
+
+PROTO_PACKAGE = "pifunc"
+
+# Typy skalarne: typ Pythona -> typ pola protobuf
+_SCALAR_TYPES = {
+    int: FieldProto.TYPE_INT64,
+    float: FieldProto.TYPE_DOUBLE,
+    str: FieldProto.TYPE_STRING,
+    bool: FieldProto.TYPE_BOOL,
+    bytes: FieldProto.TYPE_BYTES,
+}
+
+# Typy dozwolone jako klucze map
+_MAP_KEY_TYPES = (str, int, bool)
+
+_TYPE_NAMES = {
+    FieldProto.TYPE_INT32: "int32",
+    FieldProto.TYPE_INT64: "int64",
+    FieldProto.TYPE_DOUBLE: "double",
+    FieldProto.TYPE_FLOAT: "float",
+    FieldProto.TYPE_STRING: "string",
+    FieldProto.TYPE_BOOL: "bool",
+    FieldProto.TYPE_BYTES: "bytes",
+}
+
+# Znacznik nieustawionego pola wiadomości
+_UNSET = object()
+
+# Sufiks `json_name` pól przesyłających wartość jako tekst JSON
+JSON_TEXT_SUFFIX = "__json"
+
+# Adnotacje oznaczające strumień elementów
+_SYNC_STREAM_TYPES = (collections.abc.Iterator, collections.abc.Iterable, collections.abc.Generator)
+_ASYNC_STREAM_TYPES = (collections.abc.AsyncIterator, collections.abc.AsyncIterable, collections.abc.AsyncGenerator)
+
+
+def _get_message_class(descriptor):
+    """Tworzy klasę wiadomości dla deskryptora (protobuf>=4.21 lub starsze API)."""
+    if hasattr(message_factory, "GetMessageClass"):
+        return message_factory.GetMessageClass(descriptor)
+    return message_factory.MessageFactory(descriptor.file.pool).GetPrototype(descriptor)
+
+
+def _type_hints(obj) -> Dict[str, Any]:
+    """Zwraca adnotacje typów, rozwiązując adnotacje zapisane jako tekst."""
+    try:
+        return typing.get_type_hints(obj)
+    except Exception:
+        return getattr(obj, "__annotations__", {})
+
+
+def _unwrap_optional(python_type) -> Tuple[Any, bool]:
+    """Zwraca (T, True) dla Optional[T], w przeciwnym razie (typ, False)."""
+    if typing.get_origin(python_type) is typing.Union or type(python_type).__name__ == "UnionType":
+        args = typing.get_args(python_type)
+        inner = [arg for arg in args if arg is not type(None)]
+        if len(inner) == 1 and len(args) == 2:
+            return inner[0], True
+    return python_type, False
+
+
+def _stream_element(python_type) -> Tuple[Any, Optional[str]]:
+    """Zwraca (T, "sync") dla Iterator[T], (T, "async") dla AsyncIterator[T], w przeciwnym razie (typ, None)."""
+    origin = typing.get_origin(python_type) or python_type
+    if origin in _SYNC_STREAM_TYPES or origin in _ASYNC_STREAM_TYPES:
+        args = typing.get_args(python_type)
+        kind = "async" if origin in _ASYNC_STREAM_TYPES else "sync"
+        return (args[0] if args else None), kind
+    return python_type, None
+
+
+def default_service_name(func: Callable) -> str:
+    """Nazwa usługi gRPC grupującej funkcje modułu, np. `app.math_ops` -> `MathOpsService`."""
+    module = (getattr(func, "__module__", None) or "").rsplit(".", 1)[-1]
+    name = "".join(part.capitalize() for part in module.split("_") if part)
+    return f"{name or 'Pifunc'}Service"
+
+
+def _to_json_text(value: Any) -> str:
+    return json.dumps(value, default=str)
+
+
+def _from_json_text(text: str) -> Any:
+    try:
+        return json.loads(text)
+    except ValueError:
+        # Klient bez obsługi znacznika pola wysłał zwykły tekst
+        return text
+
+
+def _identity(value: Any) -> Any:
+    return value
+
+
+class _Element:
+    """Typ pojedynczej wartości pola: skalar, wiadomość lub tekst JSON."""
+
+    __slots__ = ("type", "type_name", "to_python", "to_proto", "json_text")
+
+    def __init__(self, type, type_name="", to_python=_identity, to_proto=_identity, json_text=False):
+        self.type = type
+        self.type_name = type_name
+        self.to_python = to_python
+        self.to_proto = to_proto
+        self.json_text = json_text
+
+    @property
+    def is_message(self) -> bool:
+        return self.type == FieldProto.TYPE_MESSAGE
+
+
+class ServiceSchema:
+    """Deskryptory, klasy wiadomości i konwertery jednej usługi gRPC."""
+
+    def __init__(self, file_proto: descriptor_pb2.FileDescriptorProto, pool: descriptor_pool.DescriptorPool,
+                 service_name: str, method: descriptor_pb2.MethodDescriptorProto,
+                 request_decoder: Callable, result_encoder: Callable,
+                 stream_param: Optional[Tuple[str, Callable, bool]] = None):
+        self.file_proto = file_proto
+        self.pool = pool
+        self.file_descriptor = pool.FindFileByName(file_proto.name)
+
+        self.service_name = f"{PROTO_PACKAGE}.{service_name}"
+        self.method = method
+        self.method_name = method.name
+        self.client_streaming = method.client_streaming
+        self.server_streaming = method.server_streaming
+        # Parametr strumieniowy: (nazwa, odczyt elementu z wiadomości, czy AsyncIterator)
+        self.stream_param, self._stream_reader, self.stream_async = stream_param or (None, None, False)
+        # Usługa bez typów strumieniowych z `streaming=True`: jedno wywołanie na wiadomość
+        self.per_message = self.client_streaming and self.stream_param is None
+        self.streaming = self.client_streaming or self.server_streaming
+        self.request_class = _get_message_class(pool.FindMessageTypeByName(method.input_type.lstrip(".")))
+        self.response_class = _get_message_class(pool.FindMessageTypeByName(method.output_type.lstrip(".")))
+        self._request_decoder = request_decoder
+        self._result_encoder = result_encoder
+
+    @classmethod
+    def from_function(cls, func: Callable, service_name: str, streaming: bool = False,
+                      pool: Optional[descriptor_pool.DescriptorPool] = None) -> "ServiceSchema":
+        builder = SchemaBuilder(pool)
+        schema = builder.build(func, service_name, streaming)
+        builder.finalize()
+        return schema
+
+    @property
+    def service_descriptor(self):
+        """Deskryptor usługi gRPC; dostępny po `SchemaBuilder.finalize()`."""
+        return self.pool.FindServiceByName(self.service_name)
+
+    @property
+    def method_path(self) -> str:
+        """Pełna ścieżka metody używana przez kanał gRPC, np. /pifunc.MathOpsService/Add."""
+        return f"/{self.service_name}/{self.method_name}"
+
+    def request_to_dict(self, request) -> Dict[str, Any]:
+        """Zamienia wiadomość żądania na argumenty funkcji.
+
+        Zagnieżdżone wiadomości stają się instancjami dataclass, a pominięte
+        pola `optional` nie są przekazywane, więc działają wartości domyślne.
+        """
+        return self._request_decoder(request)
+
+    def stream_values(self, messages: Iterable) -> Iterator:
+        """Zamienia strumień wiadomości klienta na elementy parametru strumieniowego."""
+        read = self._stream_reader
+        for message in messages:
+            value = read(message)
+            if value is not _UNSET:
+                yield value
+
+    async def astream_values(self, messages: AsyncIterable) -> AsyncIterator:
+        """Asynchroniczna wersja `stream_values` dla serwera grpc.aio."""
+        read = self._stream_reader
+        async for message in messages:
+            value = read(message)
+            if value is not _UNSET:
+                yield value
+
+    def encode_response(self, result: Any):
+        """Tworzy wiadomość odpowiedzi z wyniku (lub elementu strumienia), bez pośredniego str()."""
+        value = self._result_encoder(result)
+        if value is _UNSET:
+            return self.response_class()
+        return self.response_class(result=value)
+
+    def serializers(self) -> Tuple[Callable, Callable]:
+        """Zwraca (serializer żądania, deserializer odpowiedzi) dla klienta."""
+        return self.request_class.SerializeToString, self.response_class.FromString
+
+
+class SchemaBuilder:
+    """
+    Buduje schematy usług w jednej puli deskryptorów.
+
+    Wiadomości dla dataclass definiowane są raz, w pliku pierwszej usługi,
+    która ich używa; kolejne usługi importują ten plik jako zależność.
+    Metody grupowane są w usługi gRPC, których deskryptory tworzy `finalize()`.
+    """
+
+    def __init__(self, pool: Optional[descriptor_pool.DescriptorPool] = None):
+        # Prywatna pula: usługi nie kolidują z deskryptorami aplikacji w puli domyślnej
+        self.pool = pool or descriptor_pool.DescriptorPool()
+        self.files: List[descriptor_pb2.FileDescriptorProto] = []
+        # dataclass -> (nazwa pliku z definicją wiadomości, konwertery)
+        self._messages: Dict[type, Tuple[Optional[str], _Element]] = {}
+        self._message_names = set()
+        # Usługa gRPC -> [(metoda, plik z jej wiadomościami)]
+        self._services: Dict[str, List[Tuple[descriptor_pb2.MethodDescriptorProto, str]]] = {}
+        self._finalized = set()
+
+    def build(self, func: Callable, service_name: str, streaming: bool = False,
+              grpc_service: Optional[str] = None, method_name: Optional[str] = None) -> ServiceSchema:
+        """
+        Buduje wiadomości funkcji, dodaje je do puli i zwraca schemat jej metody.
+
+        Metoda trafia do usługi `grpc_service` (domyślnie: usługi modułu funkcji).
+        """
+        grpc_service = grpc_service or default_service_name(func)
+        if grpc_service in self._finalized:
+            raise RuntimeError(f"gRPC service {grpc_service} is already finalized")
+        methods = self._services.setdefault(grpc_service, [])
+
+        method_name = method_name or service_name.capitalize()
+        if any(method.name == method_name for method, _ in methods):
+            raise ValueError(f"gRPC service {grpc_service} already has a method {method_name}")
+
+        file_proto, method, request_decoder, result_encoder, stream_param = self._build_file(
+            func, service_name, method_name, streaming)
+        self.pool.AddSerializedFile(file_proto.SerializeToString())
+        self.files.append(file_proto)
+        methods.append((method, file_proto.name))
+        return ServiceSchema(file_proto, self.pool, grpc_service, method, request_decoder, result_encoder,
+                             stream_param)
+
+    def finalize(self) -> List[descriptor_pb2.FileDescriptorProto]:
+        """Dodaje do puli pliki z definicjami nowych usług i zwraca je."""
+        service_files = []
+        for grpc_service, methods in self._services.items():
+            if grpc_service in self._finalized:
+                continue
+            file_proto = descriptor_pb2.FileDescriptorProto(
+                name=f"{grpc_service}.proto",
+                package=PROTO_PACKAGE,
+                syntax="proto3",
+            )
+            service = file_proto.service.add(name=grpc_service)
+            for method, file_name in methods:
+                service.method.add().CopyFrom(method)
+                if file_name not in file_proto.dependency:
+                    file_proto.dependency.append(file_name)
+            self.pool.AddSerializedFile(file_proto.SerializeToString())
+            self._finalized.add(grpc_service)
+            service_files.append(file_proto)
+
+        self.files.extend(service_files)
+        return service_files
+
+    def _build_file(self, func: Callable, service_name: str, method_name: str, streaming: bool):
+        signature = inspect.signature(func)
+        hints = _type_hints(func)
+        name = service_name.capitalize()
+
+        file_proto = descriptor_pb2.FileDescriptorProto(
+            name=f"{service_name}.proto",
+            package=PROTO_PACKAGE,
+            syntax="proto3",
+        )
+
+        # Wiadomość żądania: jedno pole na parametr funkcji
+        request = file_proto.message_type.add(name=f"{name}Request")
+        decoders = []
+        stream_param = None
+        number = 0
+        for param_name, param in signature.parameters.items():
+            if param.kind in (param.VAR_POSITIONAL, param.VAR_KEYWORD):
+                continue
+            number += 1
+            annotation = hints.get(param_name) if param.annotation is not inspect.Parameter.empty else None
+            annotation, stream_kind = _stream_element(annotation)
+            # Element strumienia jest `optional`, więc wiadomość bez niego nie dodaje wartości domyślnej
+            read, _ = self._add_field(file_proto, request, param_name, number, annotation,
+                                      optional=param.default is not inspect.Parameter.empty or stream_kind is not None)
+            if stream_kind is None:
+                decoders.append((param_name, read))
+            elif stream_param is None:
+                stream_param = (param_name, read, stream_kind == "async")
+            else:
+                raise ValueError(f"Service {service_name} has more than one streaming parameter")
+
+        # Wiadomość odpowiedzi: pole `result` z typem zwracanym (dla strumienia: typem elementu)
+        response = file_proto.message_type.add(name=f"{name}Response")
+        return_annotation = hints.get("return") if signature.return_annotation is not inspect.Signature.empty else None
+        return_annotation, return_kind = _stream_element(return_annotation)
+        unwrapped = inspect.unwrap(func)
+        server_streaming = (return_kind is not None or inspect.isgeneratorfunction(unwrapped)
+                            or inspect.isasyncgenfunction(unwrapped))
+        _, result_encoder = self._add_field(file_proto, response, "result", 1, return_annotation)
+
+        # Flaga `streaming` bez typów strumieniowych zachowuje tryb "jedno wywołanie na wiadomość"
+        client_streaming = stream_param is not None
+        if streaming and not (client_streaming or server_streaming):
+            client_streaming = server_streaming = True
+
+        method = descriptor_pb2.MethodDescriptorProto(
+            name=method_name,
+            input_type=f".{PROTO_PACKAGE}.{request.name}",
+            output_type=f".{PROTO_PACKAGE}.{response.name}",
+            client_streaming=client_streaming,
+            server_streaming=server_streaming,
+        )
+
+        # Wiadomości dataclass zdefiniowane w tym pliku są odtąd dostępne dla kolejnych usług
+        for cls, (file_name, element) in self._messages.items():
+            if file_name is None:
+                self._messages[cls] = (file_proto.name, element)
+
+        def request_decoder(message) -> Dict[str, Any]:
+            kwargs = {}
+            for param_name, read in decoders:
+                value = read(message)
+                if value is not _UNSET:
+                    kwargs[param_name] = value
+            return kwargs
+
+        return file_proto, method, request_decoder, result_encoder, stream_param
+
+    def _add_field(self, file_proto, message, name: str, number: int, python_type: Any,
+                   optional: bool = False) -> Tuple[Callable, Callable]:
+        """
+        Dodaje do wiadomości pole odpowiadające typowi Pythona.
+
+        Zwraca (odczyt pola z wiadomości, konwersja wartości Pythona na wartość pola).
+        """
+        python_type, is_optional = _unwrap_optional(python_type)
+        optional = optional or is_optional
+        origin = typing.get_origin(python_type)
+        args = typing.get_args(python_type)
+        field = message.field.add(name=name, number=number, label=FieldProto.LABEL_OPTIONAL)
+
+        # List[T] -> repeated T
+        if python_type is list or origin is list:
+            element = self._element(file_proto, args[0] if args else None)
+            self._set_type(field, element)
+            field.label = FieldProto.LABEL_REPEATED
+            element_to_python, element_to_proto = element.to_python, element.to_proto
+
+            def read_list(msg):
+                return [element_to_python(item) for item in getattr(msg, name)]
+
+            def write_list(value):
+                return _UNSET if value is None else [element_to_proto(item) for item in value]
+
+            return read_list, write_list
+
+        # Dict[K, T] -> map<K, T>
+        if python_type is dict or origin is dict:
+            key_type = args[0] if args and args[0] in _MAP_KEY_TYPES else str
+            element = self._element(file_proto, args[1] if len(args) == 2 else None)
+            entry_name = "".join(part.capitalize() for part in name.split("_")) + "Entry"
+            entry = message.nested_type.add(name=entry_name)
+            entry.options.map_entry = True
+            entry.field.add(name="key", number=1, type=_SCALAR_TYPES[key_type], label=FieldProto.LABEL_OPTIONAL)
+            self._set_type(entry.field.add(name="value", number=2, label=FieldProto.LABEL_OPTIONAL), element)
+            field.type = FieldProto.TYPE_MESSAGE
+            field.type_name = f".{PROTO_PACKAGE}.{message.name}.{entry_name}"
+            field.label = FieldProto.LABEL_REPEATED
+            element_to_python, element_to_proto = element.to_python, element.to_proto
+
+            def read_map(msg):
+                return {key: element_to_python(value) for key, value in getattr(msg, name).items()}
+
+            def write_map(value):
+                if value is None:
+                    return _UNSET
+                return {key_type(key): element_to_proto(item) for key, item in dict(value).items()}
+
+            return read_map, write_map
+
+        element = self._element(file_proto, python_type)
+        self._set_type(field, element)
+        element_to_python, element_to_proto = element.to_python, element.to_proto
+
+        # Wiadomości mają obecność zawsze; skalary tylko jako `optional`
+        if element.is_message or optional:
+            if not element.is_message:
+                field.proto3_optional = True
+                field.oneof_index = len(message.oneof_decl)
+                message.oneof_decl.add(name=f"_{name}")
+
+            def read_present(msg):
+                if not msg.HasField(name):
+                    return _UNSET
+                return element_to_python(getattr(msg, name))
+
+            def write_optional(value):
+                return _UNSET if value is None else element_to_proto(value)
+
+            return read_present, write_optional
+
+        def read_value(msg):
+            return element_to_python(getattr(msg, name))
+
+        return read_value, element_to_proto
+
+    @staticmethod
+    def _set_type(field, element: _Element) -> None:
+        field.type = element.type
+        if element.type_name:
+            field.type_name = element.type_name
+        if element.json_text:
+            field.json_name = field.name + JSON_TEXT_SUFFIX
+
+    def _element(self, file_proto, python_type: Any) -> _Element:
+        """Zwraca typ pojedynczej wartości: skalar, wiadomość dataclass lub tekst JSON."""
+        python_type, _ = _unwrap_optional(python_type)
+
+        if python_type in _SCALAR_TYPES:
+            return _Element(_SCALAR_TYPES[python_type])
+
+        if dataclasses.is_dataclass(python_type) and isinstance(python_type, type):
+            return self._dataclass_message(file_proto, python_type)
+
+        # Typy bez odpowiednika w protobuf przesyłamy jako tekst JSON
+        return _Element(FieldProto.TYPE_STRING, to_python=_from_json_text, to_proto=_to_json_text, json_text=True)
+
+    def _dataclass_message(self, file_proto, cls: type) -> _Element:
+        """Definiuje (lub importuje z pliku innej usługi) wiadomość dla dataclass."""
+        if cls in self._messages:
+            file_name, element = self._messages[cls]
+            if file_name and file_name != file_proto.name and file_name not in file_proto.dependency:
+                file_proto.dependency.append(file_name)
+            return element
+
+        # Nazwa wiadomości to nazwa klasy; przy konflikcie dodajemy numer
+        message_name = cls.__name__
+        suffix = 2
+        while message_name in self._message_names:
+            message_name = f"{cls.__name__}{suffix}"
+            suffix += 1
+        self._message_names.add(message_name)
+        message = file_proto.message_type.add(name=message_name)
+
+        readers, writers, required = [], [], set()
+
+        def to_python(msg):
+            kwargs = {}
+            for field_name, read in readers:
+                value = read(msg)
+                if value is not _UNSET:
+                    kwargs[field_name] = value
+                elif field_name in required:
+                    kwargs[field_name] = None
+            return cls(**kwargs)
+
+        def to_proto(value):
+            if isinstance(value, dict):
+                get = value.get
+            else:
+                get = lambda key: getattr(value, key, None)
+            fields = {}
+            for field_name, write in writers:
+                field_value = write(get(field_name))
+                if field_value is not _UNSET:
+                    fields[field_name] = field_value
+            return fields
+
+        # Rejestrujemy wiadomość przed polami, żeby obsłużyć typy rekurencyjne
+        element = _Element(FieldProto.TYPE_MESSAGE, f".{PROTO_PACKAGE}.{message_name}", to_python, to_proto)
+        self._messages[cls] = (None, element)
+
+        hints = _type_hints(cls)
+        for number, dc_field in enumerate(dataclasses.fields(cls), 1):
+            has_default = (dc_field.default is not dataclasses.MISSING
+                           or dc_field.default_factory is not dataclasses.MISSING)
+            read, write = self._add_field(file_proto, message, dc_field.name, number,
+                                          hints.get(dc_field.name, dc_field.type), optional=has_default)
+            readers.append((dc_field.name, read))
+            writers.append((dc_field.name, write))
+            if not has_default:
+                required.add(dc_field.name)
+
+        return element
+
+
+def build_file_descriptor(func: Callable, service_name: str, streaming: bool = False) -> descriptor_pb2.FileDescriptorProto:
+    """Buduje samodzielny FileDescriptorProto funkcji: jej wiadomości i usługę z jedną metodą."""
+    builder = SchemaBuilder()
+    file_proto = descriptor_pb2.FileDescriptorProto()
+    file_proto.CopyFrom(builder.build(func, service_name, streaming).file_proto)
+    for service_file in builder.finalize():
+        file_proto.service.extend(service_file.service)
+    return file_proto
+
+
+def _short_name(type_name: str) -> str:
+    return type_name.rsplit(".", 1)[-1]
+
+
+def _scalar_or_message_name(field: FieldProto) -> str:
+    if field.type == FieldProto.TYPE_MESSAGE:
+        return _short_name(field.type_name)
+    return _TYPE_NAMES.get(field.type, "string")
+
+
+def _field_type_name(field: FieldProto, message: descriptor_pb2.DescriptorProto) -> str:
+    if field.type == FieldProto.TYPE_MESSAGE:
+        entry_name = _short_name(field.type_name)
+        for nested in message.nested_type:
+            if nested.name == entry_name and nested.options.map_entry:
+                key, value = nested.field
+                return f"map<{_TYPE_NAMES[key.type]}, {_scalar_or_message_name(value)}>"
+    type_name = _scalar_or_message_name(field)
+    if field.label == FieldProto.LABEL_REPEATED:
+        return f"repeated {type_name}"
+    if field.proto3_optional:
+        return f"optional {type_name}"
+    return type_name
+
+
+def render_proto(file_proto: descriptor_pb2.FileDescriptorProto) -> str:
+    """Zwraca tekst pliku .proto odpowiadający deskryptorowi (np. dla klientów)."""
+    lines = [f'syntax = "{file_proto.syntax or "proto3"}";', "", f"package {file_proto.package};", ""]
+
+    if file_proto.dependency:
+        lines.extend(f'import "{dependency}";' for dependency in file_proto.dependency)
+        lines.append("")
+
+    for service in file_proto.service:
+        lines.append(f"service {service.name} {{")
+        for method in service.method:
+            request = _short_name(method.input_type)
+            response = _short_name(method.output_type)
+            if method.client_streaming:
+                request = f"stream {request}"
+            if method.server_streaming:
+                response = f"stream {response}"
+            lines.append(f"  rpc {method.name}({request}) returns ({response}) {{}}")
+        lines.append("}")
+        lines.append("")
+
+    for message in file_proto.message_type:
+        lines.append(f"message {message.name} {{")
+        for field in message.field:
+            lines.append(f"  {_field_type_name(field, message)} {field.name} = {field.number};")
+        lines.append("}")
+        lines.append("")
+
+    return "\n".join(lines)
@@ -1,12 +1,31 @@
 # pifunc/adapters/http_adapter.py
-from fastapi import FastAPI, Request, HTTPException
+from fastapi import FastAPI, Path, Query, Request, HTTPException, Response
+from fastapi.exceptions import RequestValidationError
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
-import inspect
-import json
-from typing import Any, Callable, Dict, List
+from typing import Any, Callable, Dict, List, Optional
 import asyncio
+import inspect
 from pifunc.adapters import ProtocolAdapter
+from pifunc.adapters.codecs import Codec, CodecError, codec_for_content_type, get_codec
+from pifunc.adapters.http_encoding import ResponseEncoder
+from pifunc.adapters.http_models import ServiceModels, ValidationFailed, build_models
+from pifunc.adapters.http_streaming import (
+    STREAM_FORMATS,
+    close_stream,
+    encode_stream,
+    is_stream,
+    stream_format,
+    stream_headers,
+)
+from pifunc.adapters.routing import PATH_PARAM
+from pifunc.deadlines import DEADLINE_HEADER, DeadlineExceeded, parse_timeout
+from pifunc.invoker import ArgumentError, get_invoker
+from pifunc.limits import ServiceOverloaded
+from pifunc.metrics import PROMETHEUS_CONTENT_TYPE, render_prometheus, track
+from pifunc.runtime import ServiceExecutors
 import threading
 import socket
 import time
@@ -31,11 +50,35 @@ class HTTPAdapter(ProtocolAdapter):
         self.config = {}
         self._started = False
         self._server_thread = None
+        self.executors = ServiceExecutors(name="pifunc-http")
+
+        # Usługi tego adaptera po nazwie: (wywoływacz, modele); używane przez endpoint wsadowy
+        self._services: Dict[str, Any] = {}
+
+        # Schematy modeli żądań dołączane do dokumentu OpenAPI
+        self._schemas: Dict[str, Any] = {}
+        self._openapi = self.app.openapi
+        self.app.openapi = self._openapi_with_models
+
+        # Błędne argumenty zwracają 400, także gdy walidacji query dokonuje FastAPI
+        self.app.add_exception_handler(RequestValidationError, self._validation_error)
 
     def setup(self, config: Dict[str, Any]) -> None:
         """Konfiguruje adapter HTTP."""
         self.config = config
 
+        # Pule wykonawców dla synchronicznych usług, aby nie blokowały pętli serwera
+        self.executors = ServiceExecutors(
+            default=config.get("executor", "thread"),
+            max_workers=config.get("max_workers"),
+            process_workers=config.get("process_workers"),
+            name="pifunc-http"
+        )
+
+        # Endpoint wsadowy dodajemy przed usługami, aby ich ścieżki go nie przesłoniły
+        if config.get("batch", False):
+            self._mount_batch(config.get("batch_path", "/api/_batch"), config.get("batch_max_size", 100))
+
         # Włączamy CORS, jeśli jest potrzebny
         if config.get("cors", False):
             self.app.add_middleware(
@@ -58,100 +101,195 @@ class HTTPAdapter(ProtocolAdapter):
             path = http_config.get("path", f"/api/{func.__module__}/{func.__name__}")
             method = http_config.get("method", "POST")
 
+        # Wywoływacz i modele budowane są raz, przy rejestracji usługi
+        invoker = get_invoker(func, metadata)
+        service_codec = self.codec_for(metadata)
+        models = self._build_models(invoker.name, func)
+        has_body = method in ["POST", "PUT", "PATCH"]
+        default_stream = http_config.get("stream", "ndjson")
+        if default_stream not in STREAM_FORMATS:
+            raise ValueError(f"Invalid stream format: {default_stream}. Valid formats are: {list(STREAM_FORMATS)}")
+        self._services[invoker.name] = (invoker, models)
+        encoder = ResponseEncoder(func, metadata, self.config, method)
+
         # Dynamicznie dodajemy endpoint
-        async def endpoint(request: Request):
-            try:
-                kwargs = {}
-                # Pobieramy argumenty z body dla POST/PUT/PATCH
-                if method in ["POST", "PUT", "PATCH"]:
-                    try:
-                        body = await request.json()
-                        logger.debug(f"Received request body: {body}")
-                        kwargs = body
-                    except json.JSONDecodeError as e:
-                        logger.error(f"JSON decode error: {e}")
-                        raise HTTPException(status_code=400, detail=f"Invalid JSON: {str(e)}")
-
-                # Dla GET, pobieramy argumenty z path params i query params
-                else:
-                    # Combine path params and query params
-                    kwargs.update(request.path_params)
-                    kwargs.update(request.query_params)
-
-                # Convert types if needed
-                sig = inspect.signature(func)
-                logger.debug(f"Function signature: {sig}")
-                logger.debug(f"Received kwargs: {kwargs}")
-
-                converted_kwargs = {}
-                for param_name, param in sig.parameters.items():
-                    if param_name in kwargs:
+        async def endpoint(request: Request, **params):
+            with track(invoker.name, "http") as timer:
+                try:
+                    kwargs = {}
+                    # Kodek żądania wynika z Content-Type, kodek odpowiedzi z Accept
+                    codec = codec_for_content_type(request.headers.get("content-type"), service_codec)
+                    response_codec = codec_for_content_type(request.headers.get("accept"), codec)
+
+                    # Pobieramy argumenty z body dla POST/PUT/PATCH
+                    if has_body:
                         try:
-                            if param.annotation == dict:
-                                # For dict type, just pass through
-                                converted_kwargs[param_name] = kwargs[param_name]
-                            elif param.annotation != inspect.Parameter.empty:
-                                converted_kwargs[param_name] = param.annotation(kwargs[param_name])
+                            body = await request.body()
+                            if models is None:
+                                kwargs = codec.decode(body)
+                            elif codec.content_type == "application/json":
+                                # JSON parsowany i walidowany w jednym przebiegu walidatora pydantic
+                                kwargs = models.parse_json(body)
                             else:
-                                converted_kwargs[param_name] = kwargs[param_name]
-                        except (ValueError, TypeError) as e:
-                            logger.error(f"Type conversion error for {param_name}: {e}")
-                            raise HTTPException(
-                                status_code=400,
-                                detail=f"Invalid type for parameter {param_name}: {str(e)}"
-                            )
-
-                # Wywołujemy funkcję
-                try:
-                    logger.debug(f"Calling function with kwargs: {converted_kwargs}")
-                    result = func(**converted_kwargs)
-                except TypeError as e:
-                    logger.error(f"Function call error: {e}")
-                    raise HTTPException(
-                        status_code=400,
-                        detail=f"Invalid parameters: {str(e)}"
-                    )
-                except Exception as e:
-                    logger.error(f"Function execution error: {e}")
-                    raise HTTPException(
-                        status_code=500,
-                        detail=f"Internal error: {str(e)}"
-                    )
-
-                # Jeśli funkcja zwraca coroutine, czekamy na wynik
-                if asyncio.iscoroutine(result):
+                                kwargs = models.parse(codec.decode(body))
+                            timer.mark("decode")
+                        except CodecError as e:
+                            logger.error(f"Request decode error: {e}")
+                            raise HTTPException(status_code=400, detail=str(e))
+                        except ValidationFailed as e:
+                            raise HTTPException(status_code=400, detail=e.errors)
+
+                    # Dla GET, pobieramy argumenty z path params i query params
+                    else:
+                        # Parametry typowane są już sparsowane przez FastAPI, pozostałe bierzemy surowe
+                        kwargs.update(request.path_params)
+                        kwargs.update(request.query_params)
+                        kwargs.update(params)
+                        timer.mark("decode")
+
+                    # Powtórzone zapytanie z tymi samymi argumentami obsługujemy z pamięci podręcznej
+                    cache_key, representation = encoder.lookup(invoker, kwargs, response_codec.content_type)
+                    if representation is not None:
+                        return self._encoded_response(encoder, representation, request)
+
+                    # Wywołujemy funkcję
                     try:
-                        result = await result
+                        timeout = parse_timeout(request.headers.get(DEADLINE_HEADER))
+                        result = await invoker.call_async(kwargs, self.executors, timeout)
+                    except ArgumentError as e:
+                        logger.error(f"Type conversion error for {e.param}: {e}")
+                        raise HTTPException(status_code=400, detail=str(e))
+                    except TypeError as e:
+                        logger.error(f"Function call error: {e}")
+                        raise HTTPException(
+                            status_code=400,
+                            detail=f"Invalid parameters: {str(e)}"
+                        )
+                    except ServiceOverloaded as e:
+                        raise HTTPException(status_code=503, detail=str(e),
+                                            headers={"Retry-After": str(e.retry_after)})
+                    except DeadlineExceeded as e:
+                        raise HTTPException(status_code=504, detail=str(e))
                     except Exception as e:
-                        logger.error(f"Async execution error: {e}")
+                        logger.error(f"Function execution error: {e}")
                         raise HTTPException(
                             status_code=500,
-                            detail=f"Async execution error: {str(e)}"
+                            detail=f"Internal error: {str(e)}"
                         )
 
-                # Zwracamy wynik
-                return {"result": result}
+                    timer.mark("execute")
 
-            except HTTPException:
-                raise
-            except Exception as e:
-                logger.error(f"Unexpected error: {e}")
-                raise HTTPException(status_code=500, detail=str(e))
+                    # Generatory wysyłamy jako strumień NDJSON lub SSE, element po elementie
+                    if is_stream(result):
+                        format_name = stream_format(request.headers.get("accept"), default_stream)
+                        return self._stream_response(result, format_name, models, invoker)
+
+                    # Zwracamy wynik; JSON serializujemy według typu zwracanego
+                    content = None
+                    if models is not None and models.typed_result and response_codec.content_type == "application/json":
+                        content = models.dump_json(result)
+                    if content is None:
+                        content = response_codec.encode({"result": result})
+                    if encoder.enabled:
+                        representation = encoder.represent(content, response_codec.content_type, cache_key)
+                        response = self._encoded_response(encoder, representation, request)
+                    else:
+                        response = Response(content=content, media_type=response_codec.content_type)
+                    timer.mark("encode")
+                    return response
+
+                except HTTPException:
+                    raise
+                except Exception as e:
+                    logger.error(f"Unexpected error: {e}")
+                    raise HTTPException(status_code=500, detail=str(e))
+
+        # FastAPI widzi typy parametrów: query/ścieżka dla GET, model ciała w OpenAPI dla POST
+        route_options = {}
+        parameters = [inspect.Parameter("request", inspect.Parameter.POSITIONAL_OR_KEYWORD, annotation=Request)]
+        if models is not None:
+            route_options["response_model"] = models.response_model
+            if models.streaming:
+                route_options["responses"] = {200: {
+                    "description": "Stream of results, one per line (NDJSON) or event (SSE)",
+                    "content": {content_type: {} for content_type in STREAM_FORMATS.values()}
+                }}
+            if has_body:
+                route_options["openapi_extra"] = self._request_body(models)
+            else:
+                parameters.extend(self._query_parameters(models, path))
+        endpoint.__signature__ = inspect.Signature(parameters)
 
         # Dodajemy endpoint do FastAPI
         if method == "GET":
-            self.app.get(path)(endpoint)
+            self.app.get(path, **route_options)(endpoint)
         elif method == "POST":
-            self.app.post(path)(endpoint)
+            self.app.post(path, **route_options)(endpoint)
         elif method == "PUT":
-            self.app.put(path)(endpoint)
+            self.app.put(path, **route_options)(endpoint)
         elif method == "DELETE":
-            self.app.delete(path)(endpoint)
+            self.app.delete(path, **route_options)(endpoint)
         elif method == "PATCH":
-            self.app.patch(path)(endpoint)
+            self.app.patch(path, **route_options)(endpoint)
         else:
             raise ValueError(f"Nieobsługiwana metoda HTTP: {method}")
 
+    @staticmethod
+    def _encoded_response(encoder: ResponseEncoder, representation, request: Request) -> Response:
+        """Odpowiedź z kompresją gzip i ETag (304, gdy klient ma aktualną wersję)."""
+        status, body, headers = encoder.respond(representation, request.headers.get("if-none-match"),
+                                                request.headers.get("accept-encoding"))
+        return Response(content=body, status_code=status, media_type=representation.content_type, headers=headers)
+
+    def _stream_response(self, result, format_name: str, models, invoker) -> StreamingResponse:
+        """Zwraca odpowiedź strumieniową; elementy są kodowane i wysyłane pojedynczo."""
+        body = encode_stream(result, format_name, models, self._stream_executor(invoker), invoker.name)
+        return StreamingResponse(body, media_type=STREAM_FORMATS[format_name], headers=stream_headers(format_name))
+
+    def _stream_executor(self, invoker):
+        """Pula, w której pobierane są elementy synchronicznych generatorów (None dla inline)."""
+        mode = invoker.executor or self.executors.default
+        return None if mode == "inline" else self.executors.get("thread")
+
+    def _build_models(self, name: str, func: Callable):
+        """Buduje modele pydantic usługi; dla nietypowych sygnatur zwraca None."""
+        return build_models(name, func)
+
+    @staticmethod
+    def _query_parameters(models: ServiceModels, path: str) -> List[inspect.Parameter]:
+        """Parametry query i ścieżki z typami, parsowane i walidowane przez FastAPI."""
+        parameters = []
+        path_names = {match.group(1) for match in PATH_PARAM.finditer(path)}
+        for name, annotation, default in models.query_params:
+            if name in path_names:
+                default = Path()
+            else:
+                default = Query() if default is ... else Query(default)
+            parameters.append(inspect.Parameter(name, inspect.Parameter.KEYWORD_ONLY,
+                                                annotation=annotation, default=default))
+        return parameters
+
+    def _request_body(self, models: ServiceModels) -> Dict[str, Any]:
+        """Opis ciała żądania w OpenAPI; schematy trafiają do components/schemas."""
+        schema, definitions = models.request_schema("#/components/schemas/{model}")
+        model_name = models.request_model.__name__
+        self._schemas.update(definitions)
+        self._schemas[model_name] = schema
+        return {"requestBody": {
+            "required": True,
+            "content": {"application/json": {"schema": {"$ref": f"#/components/schemas/{model_name}"}}}
+        }}
+
+    @staticmethod
+    async def _validation_error(request: Request, exc: RequestValidationError) -> JSONResponse:
+        return JSONResponse(status_code=400, content={"detail": jsonable_encoder(exc.errors())})
+
+    def _openapi_with_models(self) -> Dict[str, Any]:
+        if self.app.openapi_schema is None:
+            schema = self._openapi()
+            schema.setdefault("components", {}).setdefault("schemas", {}).update(self._schemas)
+        return self.app.openapi_schema
+
     def start(self) -> None:
         """Uruchamia serwer HTTP."""
         if self._started:
@@ -160,16 +298,26 @@ class HTTPAdapter(ProtocolAdapter):
         port = self.config.get("port", 8080)
         host = self.config.get("host", "0.0.0.0")
 
+        # Endpoint metryk (opcja `metrics`, domyślnie wyłączony) dodajemy po usługach,
+        # aby nie przesłaniał ich ścieżek
+        if self.config.get("metrics", False):
+            self._mount_metrics(self.config.get("metrics_path", "/metrics"))
+
         config = uvicorn.Config(
             app=self.app,
             host=host,
             port=port,
-            log_level="error"
+            log_level="error",
+            interface="asgi3"
         )
         self.server = UvicornServer(config=config)
 
+        # W trybie prefork gniazdo nasłuchujące jest tworzone przez nadzorcę
+        sock = self.config.get("socket")
+        sockets = [sock] if sock is not None else None
+
         def run_server():
-            asyncio.run(self.server.serve())
+            asyncio.run(self.server.serve(sockets=sockets))
 
         self._server_thread = threading.Thread(target=run_server, daemon=True)
         self._server_thread.start()
@@ -187,6 +335,113 @@ class HTTPAdapter(ProtocolAdapter):
         
         raise RuntimeError("Failed to start HTTP server")
 
+    def _mount_batch(self, path: str, max_size: int) -> None:
+        """
+        Udostępnia endpoint wykonujący wiele wywołań usług w jednym żądaniu.
+
+        Ciało to tablica `[{"service": "add", "args": {...}}, ...]`. Wywołania
+        wykonywane są współbieżnie; odpowiedź zawiera wyniki w kolejności wywołań
+        albo, przy `Accept: application/x-ndjson`, linie `{"index": i, ...}`
+        wysyłane w miarę kończenia kolejnych wywołań. Usługi strumieniowe nie są
+        obsługiwane w trybie wsadowym (błąd 400 dla danego wywołania).
+        """
+        async def batch_endpoint(request: Request):
+            codec = codec_for_content_type(request.headers.get("content-type"), get_codec("json"))
+            try:
+                calls = codec.decode(await request.body())
+            except CodecError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            if not isinstance(calls, list):
+                raise HTTPException(status_code=400, detail="Expected an array of calls")
+            if len(calls) > max_size:
+                raise HTTPException(status_code=413, detail=f"Batch exceeds the limit of {max_size} calls")
+
+            # Limit czasu z nagłówka dotyczy każdego wywołania z osobna
+            timeout = parse_timeout(request.headers.get(DEADLINE_HEADER))
+            response_codec = codec_for_content_type(request.headers.get("accept"), codec)
+            if stream_format(request.headers.get("accept"), None) == "ndjson":
+                return StreamingResponse(self._batch_stream(calls, timeout, response_codec),
+                                         media_type=STREAM_FORMATS["ndjson"])
+
+            results = await asyncio.gather(*(self._batch_call(call, timeout) for call in calls))
+            return Response(content=response_codec.encode({"results": results}),
+                            media_type=response_codec.content_type)
+
+        self.app.post(path, include_in_schema=False)(batch_endpoint)
+
+    async def _batch_stream(self, calls: List[Any], timeout: Optional[float] = None, codec: Optional[Codec] = None):
+        """
+        Wysyła wyniki wywołań wsadowych jako NDJSON w kolejności ich zakończenia.
+
+        Linie koduje wynegocjowany kodek odpowiedzi; NDJSON jest formatem
+        tekstowym, więc zamiast kodeków binarnych używany jest domyślny JSON.
+        """
+        if codec is None or codec.binary:
+            codec = get_codec("json")
+
+        async def indexed(index, call):
+            return index, await self._batch_call(call, timeout)
+
+        tasks = [asyncio.ensure_future(indexed(index, call)) for index, call in enumerate(calls)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                index, outcome = await next_done
+                yield codec.encode({"index": index, **outcome}) + b"\n"
+        finally:
+            # Po rozłączeniu klienta nie kontynuujemy pozostałych wywołań
+            for task in tasks:
+                task.cancel()
+
+    async def _batch_call(self, call: Any, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """Wykonuje jedno wywołanie wsadowe; błędy zwraca jako wynik wywołania."""
+        if not isinstance(call, dict) or not isinstance(call.get("service"), str):
+            return {"error": "Each call needs a service name", "status": 400}
+        entry = self._services.get(call["service"])
+        if entry is None:
+            return {"error": f"Unknown service: {call['service']}", "status": 404}
+
+        invoker, models = entry
+        args = call.get("args") or {}
+        with track(invoker.name, "http") as timer:
+            try:
+                kwargs = models.parse(args) if models is not None else args
+                timer.mark("decode")
+                result = await invoker.call_async(kwargs, self.executors, timeout)
+                timer.mark("execute")
+            except ValidationFailed as e:
+                timer.fail()
+                return {"error": e.errors, "status": 400}
+            except (ArgumentError, TypeError) as e:
+                timer.fail()
+                return {"error": str(e), "status": 400}
+            except ServiceOverloaded as e:
+                timer.fail()
+                return {"error": str(e), "status": 503, "retry_after": e.retry_after}
+            except DeadlineExceeded as e:
+                timer.fail()
+                return {"error": str(e), "status": 504}
+            except Exception as e:
+                logger.error(f"Function execution error in batch call to {invoker.name}: {e}")
+                timer.fail()
+                return {"error": str(e), "status": 500}
+
+            if is_stream(result):
+                # Zamknięcie strumienia zwalnia zajmowane przez niego miejsce w limicie współbieżności
+                await close_stream(result)
+                timer.fail()
+                return {"error": "Streaming services cannot be called in a batch", "status": 400}
+        return {"result": result}
+
+    def _mount_metrics(self, path: str) -> None:
+        """Udostępnia metryki w formacie tekstowym Prometheusa."""
+        if any(getattr(route, "path", None) == path for route in self.app.routes):
+            return
+
+        async def metrics_endpoint():
+            return Response(content=render_prometheus(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+        self.app.get(path, include_in_schema=False)(metrics_endpoint)
+
     def stop(self) -> None:
         """Zatrzymuje serwer HTTP."""
         if not self._started:
@@ -197,3 +452,5 @@ class HTTPAdapter(ProtocolAdapter):
             if self._server_thread:
                 self._server_thread.join(timeout=1.0)
             self._started = False
+
+        self.executors.shutdown()
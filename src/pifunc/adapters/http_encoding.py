@@ -0,0 +1,160 @@
+# pifunc/adapters/http_encoding.py
+"""
+Kompresja gzip, ETag i pamięć podręczna zakodowanych odpowiedzi HTTP.
+
+Konfiguracja adaptera (wszystkie silniki HTTP):
+
+    run_services(http={"gzip": True, "gzip_min_size": 1024, "gzip_level": 6, "etag": True})
+
+Konfiguracja usługi GET:
+
+    @service(http={"path": "/api/report", "method": "GET",
+                   "etag": True, "response_cache": {"ttl": 5, "max_entries": 1000}})
+
+- odpowiedzi większe niż `gzip_min_size` są kompresowane, gdy klient
+  wysyła `Accept-Encoding: gzip`,
+- usługi GET z włączonym ETag dostają silny ETag (skrót zakodowanego wyniku),
+  a żądanie z pasującym `If-None-Match` dostaje 304 bez ciała,
+- `response_cache` zapamiętuje zakodowane (i skompresowane) bajty dla
+  zestawu argumentów, więc powtarzane odpytywanie kosztuje jedno wyszukanie
+  w słowniku zamiast wywołania funkcji, serializacji i kompresji. Opcje
+  są takie same jak w `@service(cache=...)`, a `cache_invalidate` czyści
+  również te wpisy.
+
+Moduł nie zależy od żadnego frameworka.
+"""
+
+import gzip
+import hashlib
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from pifunc.cache import MISSING, ResultCache
+from pifunc.invoker import ArgumentError
+
+
+def make_etag(body: bytes) -> str:
+    """Silny ETag wyliczany ze skrótu zakodowanego wyniku."""
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Sprawdza nagłówek If-None-Match (lista znaczników lub "*")."""
+    if not if_none_match:
+        return False
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*":
+            return True
+        # If-None-Match używa słabego porównania, więc pomijamy prefiks W/
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag == etag:
+            return True
+    return False
+
+
+def accepts_gzip(accept_encoding: Optional[str]) -> bool:
+    """Sprawdza, czy klient przyjmuje odpowiedzi gzip (z pominięciem q=0)."""
+    if not accept_encoding:
+        return False
+    for coding in accept_encoding.split(","):
+        name, _, params = coding.partition(";")
+        if name.strip().lower() in ("gzip", "*"):
+            params = params.replace(" ", "")
+            return params not in ("q=0", "q=0.0", "q=0.00", "q=0.000")
+    return False
+
+
+class Representation:
+    """Zakodowana odpowiedź: ciało, typ treści, ETag i (leniwie) wersja gzip."""
+
+    __slots__ = ("body", "content_type", "etag", "_gzipped")
+
+    def __init__(self, body: bytes, content_type: str, etag: Optional[str] = None):
+        self.body = body
+        self.content_type = content_type
+        self.etag = etag
+        self._gzipped: Optional[bytes] = None
+
+    def gzipped(self, level: int) -> bytes:
+        # mtime=0 daje deterministyczny wynik, więc zapamiętane bajty są zawsze te same
+        if self._gzipped is None:
+            self._gzipped = gzip.compress(self.body, compresslevel=level, mtime=0)
+        return self._gzipped
+
+
+class ResponseEncoder:
+    """Kompresja, ETag i pamięć podręczna odpowiedzi jednej usługi HTTP."""
+
+    def __init__(self, func: Callable, metadata: Dict[str, Any], config: Dict[str, Any], method: str,
+                 service_config: Optional[Dict[str, Any]] = None):
+        if service_config is None:
+            service_config = metadata.get("http") or {}
+        self.gzip = bool(config.get("gzip", False))
+        self.gzip_min_size = int(config.get("gzip_min_size", 1024))
+        self.gzip_level = int(config.get("gzip_level", 6))
+
+        # ETag i 304 mają sens tylko dla żądań bez efektów ubocznych
+        self.etag = method == "GET" and bool(service_config.get("etag", config.get("etag", False)))
+
+        cache_config = service_config.get("response_cache")
+        if cache_config and method != "GET":
+            raise ValueError(f"response_cache requires method GET, got {method}")
+        self.cache = ResultCache.from_config(func, cache_config)
+        if self.cache is not None:
+            # cache_invalidate() czyści także zakodowane odpowiedzi usługi
+            metadata.setdefault("response_caches", []).append(self.cache)
+
+    @property
+    def enabled(self) -> bool:
+        """Czy odpowiedzi wymagają przetworzenia (w przeciwnym razie adapter wysyła je bez zmian)."""
+        return self.gzip or self.etag or self.cache is not None
+
+    def lookup(self, invoker, kwargs: Dict[str, Any],
+               content_type: str) -> Tuple[Optional[Tuple], Optional[Representation]]:
+        """
+        Szuka zapamiętanej odpowiedzi dla argumentów wywołania.
+
+        Zwraca (klucz, reprezentacja lub None). Kluczem są argumenty po konwersji
+        typów, jak w `@service(cache=...)`, oraz typ treści odpowiedzi.
+        """
+        if self.cache is None:
+            return None, None
+        try:
+            key = self.cache.make_key(invoker.bind(kwargs))
+        except ArgumentError:
+            # Błędne argumenty obsłuży wywołanie usługi
+            return None, None
+        if key is None:
+            return None, None
+        key += (("content-type", content_type),)
+        representation = self.cache.get(key)
+        return key, None if representation is MISSING else representation
+
+    def represent(self, body: bytes, content_type: str, key: Optional[Tuple] = None) -> Representation:
+        """Tworzy reprezentację odpowiedzi i zapamiętuje ją dla klucza."""
+        representation = Representation(body, content_type, make_etag(body) if self.etag else None)
+        if key is not None:
+            self.cache.set(key, representation)
+        return representation
+
+    def respond(self, representation: Representation, if_none_match: Optional[str],
+                accept_encoding: Optional[str]) -> Tuple[int, bytes, Dict[str, str]]:
+        """Zwraca (status, ciało, nagłówki) odpowiedzi dla nagłówków żądania."""
+        headers = {}
+        compress = False
+        if self.gzip:
+            headers["Vary"] = "Accept-Encoding"
+            compress = len(representation.body) >= self.gzip_min_size and accepts_gzip(accept_encoding)
+
+        if representation.etag is not None:
+            # Wersja skompresowana to inna reprezentacja, więc ma własny silny ETag
+            etag = representation.etag[:-1] + '-gzip"' if compress else representation.etag
+            headers["ETag"] = etag
+            if etag_matches(if_none_match, etag):
+                return 304, b"", headers
+
+        if compress:
+            headers["Content-Encoding"] = "gzip"
+            return 200, representation.gzipped(self.gzip_level), headers
+        return 200, representation.body, headers
@@ -0,0 +1,195 @@
+# pifunc/adapters/http_models.py
+"""
+Modele pydantic żądań i odpowiedzi usług HTTP, budowane z sygnatur funkcji.
+
+Adapter HTTP tworzy dla każdej usługi model żądania (jedno pole na parametr)
+i adapter typu zwracanego. Dzięki temu:
+
+    - ciało JSON jest parsowane i walidowane w jednym przebiegu przez
+      skompilowany walidator pydantic-core (`model_validate_json`),
+    - List[int], Dict[str, T], Optional[T] i dataclass działają bez ręcznej konwersji,
+    - wynik jest serializowany zgodnie z typem zwracanym,
+    - schemat OpenAPI opisuje prawdziwe typy parametrów i wyniku.
+
+Typy, dla których pydantic nie potrafi zbudować walidatora (np. zwykłe
+klasy), trafiają do modelu jako `Any`; konwersją zajmuje się wtedy
+`ServiceInvoker`, tak jak wcześniej.
+
+Generatory i funkcje zwracające `Iterator[T]`/`AsyncIterator[T]` są
+usługami strumieniowymi: serializowany jest pojedynczy element typu T.
+"""
+
+import collections.abc
+import enum
+import inspect
+import json
+import logging
+import typing
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from pydantic import ConfigDict, TypeAdapter, ValidationError, create_model
+from pydantic_core import PydanticSerializationError
+
+from pifunc.adapters.codecs import CodecError
+
+logger = logging.getLogger(__name__)
+
+# Typy, które mogą być parametrami zapytania (query) lub ścieżki
+_QUERY_SCALARS = (int, float, str, bool)
+
+# Adnotacje wyniku oznaczające strumień elementów
+_STREAM_TYPES = (collections.abc.Iterator, collections.abc.Iterable, collections.abc.Generator,
+                 collections.abc.AsyncIterator, collections.abc.AsyncIterable, collections.abc.AsyncGenerator)
+
+
+def _type_hints(func: Callable) -> Dict[str, Any]:
+    try:
+        return typing.get_type_hints(func)
+    except Exception:
+        return getattr(func, "__annotations__", {})
+
+
+def _validatable(annotation: Any) -> Any:
+    """Zwraca adnotację, jeśli pydantic potrafi ją walidować, w przeciwnym razie Any."""
+    if annotation is inspect.Parameter.empty or annotation is None:
+        return Any
+    try:
+        TypeAdapter(annotation)
+    except Exception:
+        return Any
+    return annotation
+
+
+def _is_query_type(annotation: Any) -> bool:
+    """Sprawdza, czy parametr można przekazać w query string (skalary i listy skalarów)."""
+    origin = typing.get_origin(annotation)
+    args = [arg for arg in typing.get_args(annotation) if arg is not type(None)]
+    if origin is typing.Union or type(annotation).__name__ == "UnionType":
+        return len(args) == 1 and _is_query_type(args[0])
+    if origin in (list, set, tuple, frozenset):
+        return len(args) == 1 and _is_query_type(args[0])
+    return annotation in _QUERY_SCALARS or (isinstance(annotation, type) and issubclass(annotation, enum.Enum))
+
+
+def _is_sequence(annotation: Any) -> bool:
+    """Sprawdza, czy parametr query przyjmuje wiele wartości (?tag=a&tag=b)."""
+    origin = typing.get_origin(annotation)
+    if origin is typing.Union or type(annotation).__name__ == "UnionType":
+        return any(_is_sequence(arg) for arg in typing.get_args(annotation) if arg is not type(None))
+    return origin in (list, set, tuple, frozenset)
+
+
+def build_models(name: str, func: Callable) -> Optional["ServiceModels"]:
+    """Buduje modele pydantic usługi; dla nietypowych sygnatur zwraca None."""
+    try:
+        return ServiceModels(name, func)
+    except Exception as e:
+        logger.debug(f"Could not build request models for {name}: {e}")
+        return None
+
+
+class ValidationFailed(ValueError):
+    """Błąd walidacji argumentów; `errors` ma format błędów FastAPI."""
+
+    def __init__(self, errors: List[Dict[str, Any]]):
+        super().__init__(f"{len(errors)} validation error(s)")
+        self.errors = errors
+
+
+class ServiceModels:
+    """Model żądania, adapter wyniku i parametry query jednej usługi HTTP."""
+
+    def __init__(self, name: str, func: Callable):
+        signature = inspect.signature(func)
+        hints = _type_hints(func)
+        model_name = "".join(part.capitalize() for part in name.split("_") if part) or "Service"
+
+        fields = {}
+        # (nazwa, adnotacja, wartość domyślna) parametrów, które mogą przyjść w query/ścieżce
+        self.query_params: List[Tuple[str, Any, Any]] = []
+        self.accepts_kwargs = False
+        for param_name, param in signature.parameters.items():
+            if param.kind == param.VAR_KEYWORD:
+                self.accepts_kwargs = True
+                continue
+            if param.kind == param.VAR_POSITIONAL:
+                continue
+            annotation = _validatable(hints.get(param_name, param.annotation))
+            default = ... if param.default is inspect.Parameter.empty else param.default
+            fields[param_name] = (annotation, default)
+            if _is_query_type(annotation):
+                self.query_params.append((param_name, annotation, default))
+
+        # Parametry query podawane wielokrotnie, zbierane w listę
+        self.sequence_params = {name for name, annotation, _ in self.query_params if _is_sequence(annotation)}
+
+        # Nieznane klucze są pomijane, chyba że funkcja przyjmuje **kwargs
+        config = ConfigDict(extra="allow" if self.accepts_kwargs else "ignore",
+                            arbitrary_types_allowed=True)
+        self.request_model = create_model(f"{model_name}Request", __config__=config, **fields)
+
+        return_annotation = hints.get("return", signature.return_annotation)
+        if return_annotation is type(None):
+            return_annotation = None
+
+        # Dla usług strumieniowych typem wyniku jest typ pojedynczego elementu
+        unwrapped = inspect.unwrap(func)
+        stream_origin = typing.get_origin(return_annotation) or return_annotation
+        self.streaming = (inspect.isgeneratorfunction(unwrapped) or inspect.isasyncgenfunction(unwrapped)
+                          or stream_origin in _STREAM_TYPES)
+        if self.streaming:
+            args = typing.get_args(return_annotation) if stream_origin in _STREAM_TYPES else ()
+            return_annotation = args[0] if args else None
+
+        self.result_type = _validatable(return_annotation)
+        self.typed_result = self.result_type is not Any
+        self.result_adapter = TypeAdapter(self.result_type)
+        self.response_model = None if self.streaming else create_model(
+            f"{model_name}Response", result=(self.result_type, None))
+
+    def parse_json(self, body: bytes) -> Dict[str, Any]:
+        """Parsuje i waliduje ciało JSON jednym wywołaniem walidatora."""
+        try:
+            return self._kwargs(self.request_model.model_validate_json(body))
+        except ValidationError as e:
+            errors = self._errors(e)
+            # Niepoprawny JSON to błąd dekodowania, jak w kodekach, a nie błąd walidacji
+            if errors and errors[0]["type"] == "json_invalid":
+                raise CodecError(errors[0]["msg"]) from e
+            raise ValidationFailed(errors) from e
+
+    def parse(self, data: Any) -> Dict[str, Any]:
+        """Waliduje ciało zdekodowane przez inny kodek (np. msgpack)."""
+        try:
+            return self._kwargs(self.request_model.model_validate(data))
+        except ValidationError as e:
+            raise ValidationFailed(self._errors(e)) from e
+
+    def _kwargs(self, model) -> Dict[str, Any]:
+        # Przekazujemy tylko podane pola, aby zadziałały domyślne wartości funkcji
+        kwargs = {name: getattr(model, name) for name in model.model_fields_set if name in model.__dict__}
+        if model.model_extra:
+            kwargs.update(model.model_extra)
+        return kwargs
+
+    @staticmethod
+    def _errors(error: ValidationError) -> List[Dict[str, Any]]:
+        return json.loads(error.json(include_url=False, include_context=False))
+
+    def dump_json(self, result: Any) -> Optional[bytes]:
+        """Serializuje odpowiedź {"result": ...} według typu zwracanego lub zwraca None."""
+        value = self.dump_item(result)
+        return None if value is None else b'{"result":' + value + b'}'
+
+    def dump_item(self, value: Any) -> Optional[bytes]:
+        """Serializuje wynik (lub element strumienia) według jego typu lub zwraca None."""
+        try:
+            return self.result_adapter.dump_json(value, warnings=False)
+        except PydanticSerializationError:
+            return None
+
+    def request_schema(self, ref_template: str) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """Zwraca (schemat modelu żądania, definicje zagnieżdżonych typów) dla OpenAPI."""
+        schema = self.request_model.model_json_schema(ref_template=ref_template)
+        definitions = schema.pop("$defs", {})
+        return schema, definitions
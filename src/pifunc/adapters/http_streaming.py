@@ -0,0 +1,118 @@
+# pifunc/adapters/http_streaming.py
+"""
+Strumieniowanie wyników usług przez HTTP jako NDJSON lub SSE.
+
+Wspólne dla wszystkich silników HTTP (FastAPI, aiohttp, asgi): silnik
+wybiera format (`stream_format`) i wysyła kolejne fragmenty zwracane
+przez `encode_stream`. Moduł nie zależy od żadnego frameworka.
+"""
+
+import asyncio
+import collections.abc
+import logging
+from typing import Any, AsyncIterator, Dict, Optional
+
+from pifunc.adapters.codecs import get_codec
+
+logger = logging.getLogger(__name__)
+
+# Formaty odpowiedzi strumieniowych: nazwa -> typ treści
+STREAM_FORMATS = {"ndjson": "application/x-ndjson", "sse": "text/event-stream"}
+
+# Nagłówki wyłączające buforowanie strumieni SSE po drodze (proxy, przeglądarka)
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+# Znacznik końca generatora pobieranego w puli wątków
+_END = object()
+
+
+def stream_format(accept: Optional[str], default: Optional[str]) -> Optional[str]:
+    """Wybiera format strumienia z nagłówka Accept, a gdy go nie ma, z konfiguracji usługi."""
+    if accept:
+        for media_type in accept.split(","):
+            media_type = media_type.split(";", 1)[0].strip().lower()
+            for name, content_type in STREAM_FORMATS.items():
+                if media_type == content_type:
+                    return name
+    return default
+
+
+def stream_headers(format_name: str) -> Optional[Dict[str, str]]:
+    """Dodatkowe nagłówki odpowiedzi strumieniowej w danym formacie."""
+    return SSE_HEADERS if format_name == "sse" else None
+
+
+def is_stream(result: Any) -> bool:
+    """Sprawdza, czy wynik usługi jest strumieniem (iterator lub iterator asynchroniczny)."""
+    return isinstance(result, collections.abc.Iterator) or hasattr(result, "__aiter__")
+
+
+async def close_stream(result) -> None:
+    """Zamyka nieużyty strumień, aby zwolnić zajmowane przez niego zasoby (np. miejsce w limicie)."""
+    if hasattr(result, "aclose"):
+        await result.aclose()
+    elif hasattr(result, "close"):
+        result.close()
+
+
+async def stream_items(result, executor):
+    """
+    Iteruje wynik strumieniowy usługi.
+
+    Kolejne elementy synchronicznych generatorów pobierane są w puli wątków, aby
+    nie blokować pętli serwera. Przy rozłączeniu klienta (anulowaniu) generator jest zamykany.
+    """
+    if hasattr(result, "__aiter__"):
+        iterator = result.__aiter__()
+        try:
+            async for item in iterator:
+                yield item
+        finally:
+            if hasattr(iterator, "aclose"):
+                await iterator.aclose()
+        return
+
+    pending = None
+    try:
+        while True:
+            if executor is None:
+                item = next(result, _END)
+            else:
+                pending = executor.submit(next, result, _END)
+                item = await asyncio.wrap_future(pending)
+            if item is _END:
+                return
+            yield item
+    finally:
+        close = getattr(result, "close", None)
+        if close is not None:
+            if pending is not None and not pending.done():
+                # Generator wciąż działa w wątku puli; zamykamy go, gdy zwróci element
+                pending.add_done_callback(lambda _: close())
+            else:
+                close()
+
+
+async def encode_stream(result, format_name: str, models, executor, name: str) -> AsyncIterator[bytes]:
+    """
+    Koduje elementy strumienia jako linie NDJSON albo zdarzenia SSE.
+
+    Kolejny element jest pobierany dopiero po wysłaniu poprzedniego, więc wolny
+    klient spowalnia generator, a pamięć nie rośnie z rozmiarem wyniku.
+    """
+    codec = get_codec("json")
+    sse = format_name == "sse"
+
+    def encode(item) -> bytes:
+        data = models.dump_item(item) if models is not None and models.typed_result else None
+        return data if data is not None else codec.encode(item)
+
+    try:
+        async for item in stream_items(result, executor):
+            data = encode(item)
+            yield b"data: " + data + b"\n\n" if sse else data + b"\n"
+    except Exception as e:
+        # Status 200 został już wysłany, więc błąd trafia do strumienia
+        logger.error(f"Stream error in {name}: {e}")
+        error = codec.encode({"error": str(e)})
+        yield b"event: error\ndata: " + error + b"\n\n" if sse else error + b"\n"
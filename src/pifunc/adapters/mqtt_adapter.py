@@ -1,11 +1,12 @@
 # pifunc/adapters/mqtt_adapter.py
 import paho.mqtt.client as mqtt
-import json
-import inspect
 from typing import Any, Callable, Dict
-import asyncio
 import threading
 from pifunc.adapters import ProtocolAdapter
+from pifunc.adapters.codecs import CodecError, codec_for_content_type, get_codec
+from pifunc.invoker import ArgumentError, get_invoker
+from pifunc.limits import ServiceOverloaded
+from pifunc.metrics import track
 import logging
 
 logger = logging.getLogger(__name__)
@@ -18,6 +19,7 @@ class MQTTAdapter(ProtocolAdapter):
         self.client = mqtt.Client()
         self.functions = {}
         self.config = {}
+        self.shared_group = None
         self._started = False
         self._connected = False
 
@@ -32,6 +34,8 @@ class MQTTAdapter(ProtocolAdapter):
         password = config.get("password", None)
         # Dodajemy flagę wymuszania połączenia
         self.force_connection = config.get("force_connection", False)
+        # Grupa współdzielonych subskrypcji ($share/<grupa>/<temat>), np. w trybie prefork
+        self.shared_group = config.get("shared_group")
 
         if username and password:
             self.client.username_pw_set(username, password)
@@ -86,7 +90,8 @@ class MQTTAdapter(ProtocolAdapter):
         self.functions[topic] = {
             "function": func,
             "qos": qos,
-            "signature": inspect.signature(func)
+            "invoker": get_invoker(func, metadata),
+            "codec": self.codec_for(metadata)
         }
 
     def _on_connect(self, client, userdata, flags, rc):
@@ -97,7 +102,11 @@ class MQTTAdapter(ProtocolAdapter):
             # Subskrybujemy wszystkie zarejestrowane tematy
             for topic, config in self.functions.items():
                 try:
-                    result, mid = client.subscribe(topic, config["qos"])
+                    if self.shared_group:
+                        subscription = f"$share/{self.shared_group}/{topic}"
+                    else:
+                        subscription = topic
+                    result, mid = client.subscribe(subscription, config["qos"])
                     if result != mqtt.MQTT_ERR_SUCCESS:
                         logger.error(f"Failed to subscribe to topic {topic}: {result}")
                 except Exception as e:
@@ -113,84 +122,85 @@ class MQTTAdapter(ProtocolAdapter):
 
         # Sprawdzamy, czy mamy zarejestrowaną funkcję dla tego tematu
         if topic in self.functions:
-            func_config = self.functions[topic]
-            func = func_config["function"]
-            signature = func_config["signature"]
+            invoker = self.functions[topic]["invoker"]
+            codec = self._message_codec(msg, self.functions[topic]["codec"])
 
-            try:
-                # Dekodujemy wiadomość jako JSON
+            with track(invoker.name, "mqtt") as timer:
                 try:
-                    payload = json.loads(msg.payload.decode())
-                    logger.debug(f"Decoded payload: {payload}")
-                except json.JSONDecodeError as e:
-                    logger.error(f"Failed to decode JSON payload: {e}")
-                    self._publish_error(topic, f"Invalid JSON payload: {str(e)}")
-                    return
-
-                # Sprawdzamy i konwertujemy typy argumentów
-                converted_kwargs = {}
-                for param_name, param in signature.parameters.items():
-                    if param_name in payload:
-                        try:
-                            if param.annotation == dict:
-                                # For dict type, just pass through
-                                converted_kwargs[param_name] = payload[param_name]
-                            elif param.annotation != inspect.Parameter.empty:
-                                converted_kwargs[param_name] = param.annotation(payload[param_name])
-                            else:
-                                converted_kwargs[param_name] = payload[param_name]
-                        except (ValueError, TypeError) as e:
-                            logger.error(f"Type conversion error for {param_name}: {e}")
-                            self._publish_error(topic, f"Invalid type for parameter {param_name}: {str(e)}")
-                            return
-
-                # Wywołujemy funkcję
-                try:
-                    logger.debug(f"Calling function with kwargs: {converted_kwargs}")
-                    result = func(**converted_kwargs)
-                except TypeError as e:
-                    logger.error(f"Function call error: {e}")
-                    self._publish_error(topic, f"Invalid parameters: {str(e)}")
-                    return
-                except Exception as e:
-                    logger.error(f"Function execution error: {e}")
-                    self._publish_error(topic, f"Internal error: {str(e)}")
-                    return
+                    # Dekodujemy wiadomość kodekiem usługi
+                    try:
+                        payload = codec.decode(msg.payload)
+                        logger.debug(f"Decoded payload: {payload}")
+                        timer.mark("decode")
+                    except CodecError as e:
+                        logger.error(f"Failed to decode payload: {e}")
+                        timer.fail()
+                        self._publish_error(topic, f"Invalid payload: {str(e)}", codec)
+                        return
 
-                # Jeśli funkcja zwraca coroutine, uruchamiamy je w pętli asyncio
-                if asyncio.iscoroutine(result):
+                    # Wywołujemy funkcję
                     try:
-                        loop = asyncio.new_event_loop()
-                        asyncio.set_event_loop(loop)
-                        result = loop.run_until_complete(result)
-                        loop.close()
+                        result = invoker.call_sync(payload)
+                    except ArgumentError as e:
+                        logger.error(f"Type conversion error for {e.param}: {e}")
+                        timer.fail()
+                        self._publish_error(topic, str(e), codec)
+                        return
+                    except TypeError as e:
+                        logger.error(f"Function call error: {e}")
+                        timer.fail()
+                        self._publish_error(topic, f"Invalid parameters: {str(e)}", codec)
+                        return
+                    except ServiceOverloaded as e:
+                        logger.warning(str(e))
+                        timer.fail()
+                        self._publish_error(topic, str(e), codec, retry_after=e.retry_after)
+                        return
                     except Exception as e:
-                        logger.error(f"Async execution error: {e}")
-                        self._publish_error(topic, f"Async execution error: {str(e)}")
+                        logger.error(f"Function execution error: {e}")
+                        timer.fail()
+                        self._publish_error(topic, f"Internal error: {str(e)}", codec)
                         return
 
-                # Publikujemy wynik
-                response_topic = f"{topic}/response"
-                try:
-                    response_payload = json.dumps({"result": result})
-                    logger.debug(f"Publishing response to {response_topic}: {response_payload}")
-                    self.client.publish(response_topic, response_payload)
-                except Exception as e:
-                    logger.error(f"Failed to publish response: {e}")
+                    timer.mark("execute")
 
-            except Exception as e:
-                logger.error(f"Unexpected error processing message: {e}")
-                self._publish_error(topic, f"Unexpected error: {str(e)}")
+                    # Publikujemy wynik
+                    response_topic = f"{topic}/response"
+                    try:
+                        response_payload = codec.encode({"result": result})
+                        timer.mark("encode")
+                        logger.debug(f"Publishing response to {response_topic}: {response_payload}")
+                        self.client.publish(response_topic, response_payload)
+                    except Exception as e:
+                        timer.fail()
+                        logger.error(f"Failed to publish response: {e}")
 
-    def _publish_error(self, topic: str, error_message: str) -> None:
-        """Publikuje komunikat o błędzie."""
+                except Exception as e:
+                    logger.error(f"Unexpected error processing message: {e}")
+                    timer.fail()
+                    self._publish_error(topic, f"Unexpected error: {str(e)}", codec)
+
+    @staticmethod
+    def _message_codec(msg, default):
+        """Dobiera kodek na podstawie właściwości Content-Type (MQTT 5)."""
+        content_type = getattr(getattr(msg, "properties", None), "ContentType", None)
+        if isinstance(content_type, str):
+            return codec_for_content_type(content_type, default)
+        return default
+
+    def _publish_error(self, topic: str, error_message: str, codec=None, retry_after: int = None) -> None:
+        """Publikuje komunikat o błędzie (przy przeciążeniu usługi także `retry_after` w sekundach)."""
         if not self._connected:
             logger.warning(f"Not connected to MQTT broker, cannot publish error: {error_message}")
             return
 
         error_topic = f"{topic}/error"
         try:
-            error_payload = json.dumps({"error": error_message})
+            codec = codec or get_codec(self.config.get("codec"))
+            error = {"error": error_message}
+            if retry_after is not None:
+                error["retry_after"] = retry_after
+            error_payload = codec.encode(error)
             logger.debug(f"Publishing error to {error_topic}: {error_message}")
             self.client.publish(error_topic, error_payload)
         except Exception as e:
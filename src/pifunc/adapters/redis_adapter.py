@@ -1,13 +1,13 @@
 # pifunc/adapters/redis_adapter.py
-import json
-import asyncio
 import threading
 import time
-import inspect
 from typing import Any, Callable, Dict, List, Optional
 import redis
 from redis.client import PubSub
 from pifunc.adapters import ProtocolAdapter
+from pifunc.adapters.codecs import CodecError
+from pifunc.invoker import get_invoker
+from pifunc.metrics import track
 import logging
 
 logger = logging.getLogger(__name__)
@@ -47,7 +47,7 @@ class RedisAdapter(ProtocolAdapter):
                     db=db,
                     password=password,
                     socket_timeout=socket_timeout,
-                    decode_responses=True  # Automatyczne dekodowanie odpowiedzi
+                    decode_responses=False  # Treść wiadomości dekoduje kodek usługi
                 )
                 # Test połączenia
                 self.client.ping()
@@ -61,7 +61,7 @@ class RedisAdapter(ProtocolAdapter):
                         db=db,
                         password=password,
                         socket_timeout=socket_timeout,
-                        decode_responses=True
+                        decode_responses=False
                     )
                     # Test połączenia
                     self.client.ping()
@@ -111,6 +111,8 @@ class RedisAdapter(ProtocolAdapter):
         self.functions[channel] = {
             "function": func,
             "metadata": metadata,
+            "invoker": get_invoker(func, metadata),
+            "codec": self.codec_for(metadata),
             "channel": channel,
             "pattern": pattern,
             "response_channel": f"{channel}:response"
@@ -124,11 +126,11 @@ class RedisAdapter(ProtocolAdapter):
         if message["type"] not in ["message", "pmessage"]:
             return
 
-        # Pobieramy kanał
-        channel = message["channel"]
+        # Pobieramy kanał (klient nie dekoduje odpowiedzi, więc nazwy są bajtami)
+        channel = self._to_str(message["channel"])
         if message["type"] == "pmessage":
             # Dla wzorców używamy oryginalnego wzorca
-            pattern = message["pattern"]
+            pattern = self._to_str(message["pattern"])
             function_info = self.functions.get(pattern)
         else:
             # Dla zwykłych kanałów używamy dokładnego dopasowania
@@ -140,46 +142,48 @@ class RedisAdapter(ProtocolAdapter):
 
         # Pobieramy dane wiadomości
         data = message["data"]
+        codec = function_info["codec"]
 
-        try:
-            # Parsujemy JSON
-            kwargs = json.loads(data)
-
-            # Wywołujemy funkcję
-            func = function_info["function"]
-            result = func(**kwargs)
-
-            # Obsługujemy coroutines
-            if asyncio.iscoroutine(result):
-                # Tworzymy nową pętlę asyncio
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
-                result = loop.run_until_complete(result)
-                loop.close()
-
-            # Serializujemy wynik
-            response = json.dumps({
-                "result": result,
-                "channel": channel,
-                "timestamp": time.time()
-            })
-
-            # Publikujemy odpowiedź
-            response_channel = function_info["response_channel"]
-            self.client.publish(response_channel, response)
-
-        except json.JSONDecodeError:
-            logger.error(f"JSON parsing error: {data}")
-        except Exception as e:
-            # Publikujemy błąd
-            error_response = json.dumps({
-                "error": str(e),
-                "channel": channel,
-                "timestamp": time.time()
-            })
-            error_channel = f"{channel}:error"
-            self.client.publish(error_channel, error_response)
-            logger.error(f"Error processing message: {e}")
+        with track(function_info["invoker"].name, "redis") as timer:
+            try:
+                # Dekodujemy wiadomość kodekiem usługi
+                kwargs = codec.decode(data)
+                timer.mark("decode")
+
+                # Wywołujemy funkcję
+                result = function_info["invoker"].call_sync(kwargs)
+                timer.mark("execute")
+
+                # Serializujemy wynik
+                response = codec.encode({
+                    "result": result,
+                    "channel": channel,
+                    "timestamp": time.time()
+                })
+                timer.mark("encode")
+
+                # Publikujemy odpowiedź
+                response_channel = function_info["response_channel"]
+                self.client.publish(response_channel, response)
+
+            except CodecError:
+                timer.fail()
+                logger.error(f"{codec.name} parsing error: {data!r}")
+            except Exception as e:
+                timer.fail()
+                # Publikujemy błąd
+                error_response = codec.encode({
+                    "error": str(e),
+                    "channel": channel,
+                    "timestamp": time.time()
+                })
+                error_channel = f"{channel}:error"
+                self.client.publish(error_channel, error_response)
+                logger.error(f"Error processing message: {e}")
+
+    @staticmethod
+    def _to_str(value):
+        return value.decode("utf-8") if isinstance(value, bytes) else value
 
     def _listen_for_messages(self):
         """Nasłuchuje wiadomości z Redis w osobnym wątku."""
@@ -254,7 +258,7 @@ class RedisAdapter(ProtocolAdapter):
             status_channel = self.config.get("status_channel", "pifunc:status")
             self.client.publish(
                 status_channel,
-                json.dumps({
+                self.codec_for({}).encode({
                     "status": "online",
                     "timestamp": time.time(),
                     "channels": list(self.functions.keys())
@@ -280,7 +284,7 @@ class RedisAdapter(ProtocolAdapter):
             status_channel = self.config.get("status_channel", "pifunc:status")
             self.client.publish(
                 status_channel,
-                json.dumps({
+                self.codec_for({}).encode({
                     "status": "offline",
                     "timestamp": time.time()
                 })
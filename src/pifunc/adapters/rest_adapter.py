@@ -1,17 +1,31 @@
 # pifunc/adapters/rest_adapter.py
-import json
-import inspect
 import asyncio
+import logging
 import threading
-import re
 from typing import Any, Callable, Dict, List, Optional, Type, Tuple
 import aiohttp
 from aiohttp import web
 from pifunc.adapters import ProtocolAdapter
-
+from pifunc.adapters.codecs import Codec, CodecError, codec_for_content_type
+from pifunc.adapters.http_encoding import ResponseEncoder
+from pifunc.adapters.http_models import ValidationFailed, build_models
+from pifunc.adapters.http_streaming import STREAM_FORMATS, encode_stream, is_stream, stream_format, stream_headers
+from pifunc.adapters.routing import PATH_PARAM, compile_path, route_order
+from pifunc.deadlines import DEADLINE_HEADER, DeadlineExceeded, parse_timeout
+from pifunc.invoker import ArgumentError, get_invoker
+from pifunc.limits import ServiceOverloaded
+from pifunc.metrics import PROMETHEUS_CONTENT_TYPE, render_prometheus, track
+from pifunc.runtime import ServiceExecutors
+
+logger = logging.getLogger(__name__)
 
 class RESTAdapter(ProtocolAdapter):
-    """Adapter protokołu REST (oparty na HTTP, ale z konwencjami RESTful)."""
+    """
+    Adapter protokołu REST (oparty na HTTP, ale z konwencjami RESTful).
+
+    Służy też jako silnik HTTP `run_services(http={"engine": "aiohttp"})`:
+    usługi bez konfiguracji `rest` są wtedy wystawiane według `@service(http=...)`.
+    """
 
     def __init__(self):
         self.config = {}
@@ -20,11 +34,23 @@ class RESTAdapter(ProtocolAdapter):
         self.runner = None
         self.site = None
         self.server_thread = None
+        self.loop = None
+        self._ready = threading.Event()
+        self._serves_http = False
+        self.executors = ServiceExecutors(name="pifunc-rest")
 
     def setup(self, config: Dict[str, Any]) -> None:
         """Konfiguruje adapter REST."""
         self.config = config
 
+        # Pule wykonawców dla synchronicznych usług, aby nie blokowały pętli serwera
+        self.executors = ServiceExecutors(
+            default=config.get("executor", "thread"),
+            max_workers=config.get("max_workers"),
+            process_workers=config.get("process_workers"),
+            name="pifunc-rest"
+        )
+
         # Tworzymy aplikację aiohttp
         self.app = web.Application()
 
@@ -51,121 +77,252 @@ class RESTAdapter(ProtocolAdapter):
         """Rejestruje funkcję jako endpoint REST."""
         service_name = metadata.get("name", func.__name__)
 
-        # Pobieramy konfigurację REST
-        rest_config = metadata.get("rest", {})
+        # Pobieramy konfigurację REST; bez niej obowiązuje konfiguracja @service(http=...)
+        rest_config = metadata.get("rest")
+        http_mode = rest_config is None and "http" in metadata
+        if http_mode:
+            http_config = metadata["http"] or {}
+            rest_config = {**http_config, "methods": [http_config.get("method", "POST")]}
+            self._serves_http = True
+        rest_config = rest_config or {}
 
         # Konfiguracja endpointu
         path = rest_config.get("path", f"/api/{func.__module__}/{service_name}")
         methods = rest_config.get("methods", ["GET", "POST"])
+        default_stream = rest_config.get("stream", "ndjson")
+        if default_stream not in STREAM_FORMATS:
+            raise ValueError(f"Invalid stream format: {default_stream}. Valid formats are: {list(STREAM_FORMATS)}")
 
         # Konwersja pojedyńczej metody na listę
         if isinstance(methods, str):
             methods = [methods]
 
-        # Sprawdzamy, czy ścieżka zawiera parametry (np. "/users/{id}")
-        path_params = re.findall(r'{([^}]+)}', path)
+        # Parametry ścieżki (np. "/users/{id:int}") kompilujemy raz, przy rejestracji
+        router_path, converters = compile_path(path)
+        path_params = [match.group(1) for match in PATH_PARAM.finditer(path)]
 
         # Zapisujemy informacje o funkcji
+        invoker = get_invoker(func, metadata)
         self.routes[path] = {
             "function": func,
             "metadata": metadata,
+            "invoker": invoker,
+            "models": self._build_models(invoker.name, func),
+            "stream": default_stream,
+            # ETag i pamięć podręczna odpowiedzi tylko dla tras obsługujących wyłącznie GET
+            "encoder": ResponseEncoder(func, metadata, self.config, "GET" if methods == ["GET"] else "POST",
+                                       rest_config),
+            "codec": self.codec_for(metadata),
             "path": path,
+            "router_path": router_path,
+            "converters": converters,
             "methods": methods,
-            "path_params": path_params
+            "path_params": path_params,
+            "http": http_mode
         }
 
-    async def _handle_request(self, request):
-        """Obsługuje żądanie HTTP."""
-        # Pobieramy ścieżkę
-        path = request.path
-        method = request.method
+    def _create_handler(self, route_info: Dict[str, Any]) -> Callable:
+        """Tworzy handler związany z trasą; dopasowanie ścieżki wykonuje router aiohttp."""
+        async def handler(request):
+            return await self._handle_request(request, route_info)
 
-        # Szukamy dopasowania ścieżki
-        matched_route = None
-        matched_params = {}
+        return handler
 
-        # Najpierw próbujemy dokładne dopasowanie
-        if path in self.routes:
-            matched_route = self.routes[path]
-        else:
-            # Jeśli nie ma dokładnego dopasowania, próbujemy dopasować wzorzec
-            for route_path, route_info in self.routes.items():
-                # Jeśli ścieżka nie zawiera parametrów, pomijamy
-                if not route_info["path_params"]:
-                    continue
-
-                # Konwertujemy ścieżkę na wyrażenie regularne
-                pattern = route_path
-                for param in route_info["path_params"]:
-                    pattern = pattern.replace(f"{{{param}}}", f"(?P<{param}>[^/]+)")
-
-                # Dodajemy ograniczniki na początek i koniec
-                pattern = f"^{pattern}$"
-
-                # Próbujemy dopasować
-                match = re.match(pattern, path)
-                if match:
-                    matched_route = route_info
-                    matched_params = match.groupdict()
-                    break
-
-        if not matched_route:
-            return web.json_response(
-                {"error": f"Endpoint not found: {path}"},
-                status=404
-            )
-
-        # Sprawdzamy, czy metoda jest dopuszczalna
-        if method not in matched_route["methods"]:
-            return web.json_response(
-                {"error": f"Method not allowed: {method}"},
-                status=405
-            )
-
-        # Pobieramy funkcję
-        func = matched_route["function"]
+    async def _handle_request(self, request, matched_route: Dict[str, Any]):
+        """Obsługuje żądanie HTTP dopasowane przez router do trasy `matched_route`."""
+        # Parametry ścieżki z dopasowania routera, przekonwertowane zgodnie z typem w ścieżce
+        converters = matched_route["converters"]
+        matched_params = {name: converters[name](value) if name in converters else value
+                          for name, value in request.match_info.items()}
 
-        try:
-            # Pobieramy parametry
-            kwargs = {}
-
-            # Dodajemy parametry ze ścieżki
-            kwargs.update(matched_params)
+        # Pobieramy wywoływacz funkcji i modele argumentów
+        invoker = matched_route["invoker"]
+        encoder = matched_route["encoder"]
+        http_mode = matched_route["http"]
 
-            # Pobieramy parametry z query string
-            for name, value in request.query.items():
-                kwargs[name] = value
+        # Kodek żądania wynika z Content-Type, kodek odpowiedzi z Accept
+        if http_mode:
+            body_codec = codec_for_content_type(request.headers.get("Content-Type"), matched_route["codec"])
+        else:
+            body_codec = codec_for_content_type(request.content_type)
+        codec = codec_for_content_type(request.headers.get("Accept"), body_codec or matched_route["codec"])
 
-            # Pobieramy parametry z body (JSON)
-            if method in ["POST", "PUT", "PATCH"] and request.content_type == 'application/json':
+        with track(invoker.name, "rest") as timer:
+            try:
                 try:
-                    body = await request.json()
-                    if isinstance(body, dict):
-                        kwargs.update(body)
+                    if http_mode:
+                        kwargs = await self._http_arguments(request, matched_route, body_codec, matched_params)
                     else:
-                        kwargs["body"] = body
-                except json.JSONDecodeError:
-                    return web.json_response(
-                        {"error": "Invalid JSON body"},
-                        status=400
-                    )
-
-            # Wykonujemy funkcję
-            result = func(**kwargs)
-
-            # Obsługujemy coroutines
-            if asyncio.iscoroutine(result):
-                result = await result
-
-            # Zwracamy wynik
-            return web.json_response({"result": result})
-
-        except Exception as e:
-            # Zwracamy informację o błędzie
-            return web.json_response(
-                {"error": str(e)},
-                status=500
-            )
+                        kwargs = await self._rest_arguments(request, matched_route, body_codec, matched_params)
+                except CodecError as e:
+                    timer.fail()
+                    message = str(e) if http_mode else f"Invalid {body_codec.name} body"
+                    return self._error_response(matched_route, codec, 400, message)
+                except ValidationFailed as e:
+                    timer.fail()
+                    return self._error_response(matched_route, codec, 400, e.errors)
+
+                timer.mark("decode")
+
+                # Powtórzone zapytanie z tymi samymi argumentami obsługujemy z pamięci podręcznej
+                cache_key, representation = encoder.lookup(invoker, kwargs, codec.content_type)
+                if representation is not None:
+                    return self._represented_response(encoder, representation, request)
+
+                # Wykonujemy funkcję; błędne argumenty to błąd klienta
+                try:
+                    timeout = parse_timeout(request.headers.get(DEADLINE_HEADER))
+                    result = await invoker.call_async(kwargs, self.executors, timeout)
+                except ArgumentError as e:
+                    timer.fail()
+                    return self._error_response(matched_route, codec, 400, str(e))
+                except TypeError as e:
+                    timer.fail()
+                    message = f"Invalid parameters: {str(e)}" if http_mode else str(e)
+                    return self._error_response(matched_route, codec, 400, message)
+                except ServiceOverloaded as e:
+                    timer.fail()
+                    return self._error_response(matched_route, codec, 503, str(e),
+                                                {"Retry-After": str(e.retry_after)})
+                except DeadlineExceeded as e:
+                    timer.fail()
+                    return self._error_response(matched_route, codec, 504, str(e))
+                timer.mark("execute")
+
+                # Generatory wysyłamy jako strumień NDJSON lub SSE, poza pomiarem żądania
+                if is_stream(result):
+                    format_name = stream_format(request.headers.get("Accept"), matched_route["stream"])
+                else:
+                    # Zwracamy wynik; JSON serializujemy według typu zwracanego
+                    models = matched_route["models"]
+                    content = None
+                    if models is not None and models.typed_result and codec.content_type == "application/json":
+                        content = models.dump_json(result)
+                    if content is None:
+                        content = codec.encode({"result": result})
+                    if encoder.enabled:
+                        representation = encoder.represent(content, codec.content_type, cache_key)
+                        response = self._represented_response(encoder, representation, request)
+                    else:
+                        response = web.Response(body=content, content_type=codec.content_type)
+                    timer.mark("encode")
+                    return response
+
+            except Exception as e:
+                timer.fail()
+                # Zwracamy informację o błędzie
+                logger.error(f"Function execution error: {e}")
+                message = f"Internal error: {str(e)}" if http_mode else str(e)
+                return self._error_response(matched_route, codec, 500, message)
+
+        return await self._stream_response(request, result, format_name, matched_route["models"], invoker)
+
+    @staticmethod
+    async def _http_arguments(request, route: Dict[str, Any], codec: Codec,
+                              path_params: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Argumenty według kontraktu `@service(http=...)`, wspólnego z pozostałymi silnikami HTTP.
+
+        Dla POST/PUT/PATCH argumenty pochodzą wyłącznie z ciała, dla pozostałych
+        metod z parametrów ścieżki i query string.
+        """
+        models = route["models"]
+        if request.method in ("POST", "PUT", "PATCH"):
+            body = await request.read()
+            if models is None:
+                return codec.decode(body)
+            if codec.content_type == "application/json":
+                # JSON parsowany i walidowany w jednym przebiegu walidatora pydantic
+                return models.parse_json(body)
+            return models.parse(codec.decode(body))
+
+        kwargs = {}
+        sequence_params = models.sequence_params if models is not None else ()
+        for name in request.query.keys():
+            kwargs[name] = request.query.getall(name) if name in sequence_params else request.query[name]
+        kwargs.update(path_params)
+        return models.parse(kwargs) if models is not None else kwargs
+
+    @staticmethod
+    async def _rest_arguments(request, route: Dict[str, Any], body_codec: Optional[Codec],
+                              path_params: Dict[str, Any]) -> Dict[str, Any]:
+        """Argumenty trasy REST: ścieżka, query string i ciało łącznie."""
+        models = route["models"]
+        kwargs = dict(path_params)
+
+        # Pobieramy parametry z query string; parametry typu lista mogą się powtarzać
+        sequence_params = models.sequence_params if models is not None else ()
+        for name in request.query.keys():
+            kwargs[name] = request.query.getall(name) if name in sequence_params else request.query[name]
+
+        # Pobieramy parametry z body (JSON, MessagePack, ...)
+        if request.method in ["POST", "PUT", "PATCH"] and body_codec is not None:
+            body = body_codec.decode(await request.read())
+            if isinstance(body, dict):
+                kwargs.update(body)
+            else:
+                kwargs["body"] = body
+
+        # Walidujemy argumenty modelem pydantic zbudowanym z sygnatury
+        return models.parse(kwargs) if models is not None else kwargs
+
+    def _error_response(self, route: Dict[str, Any], codec: Codec, status: int, message: Any,
+                        headers: Optional[Dict[str, str]] = None) -> web.Response:
+        """Błąd jako {"detail": ...} dla usług @service(http=...), jak w pozostałych silnikach, a {"error": ...} dla REST."""
+        response = self._encoded_response(codec, {"detail" if route["http"] else "error": message}, status)
+        if headers:
+            response.headers.update(headers)
+        return response
+
+    async def _stream_response(self, request, result, format_name: str, models, invoker) -> web.StreamResponse:
+        """Wysyła wynik strumieniowy; elementy są kodowane i wysyłane pojedynczo."""
+        mode = invoker.executor or self.executors.default
+        executor = None if mode == "inline" else self.executors.get("thread")
+        response = web.StreamResponse(headers=stream_headers(format_name))
+        response.content_type = STREAM_FORMATS[format_name]
+        await response.prepare(request)
+
+        chunks = encode_stream(result, format_name, models, executor, invoker.name)
+        try:
+            async for chunk in chunks:
+                await response.write(chunk)
+            await response.write_eof()
+        except ConnectionResetError:
+            # Klient rozłączył się; zamykamy generator usługi
+            pass
+        finally:
+            await chunks.aclose()
+        return response
+
+    @staticmethod
+    def _represented_response(encoder: ResponseEncoder, representation, request) -> web.Response:
+        """Odpowiedź z kompresją gzip i ETag (304, gdy klient ma aktualną wersję)."""
+        status, body, headers = encoder.respond(representation, request.headers.get("If-None-Match"),
+                                                request.headers.get("Accept-Encoding"))
+        headers["Content-Type"] = representation.content_type
+        return web.Response(body=body or None, status=status, headers=headers)
+
+    @staticmethod
+    def _build_models(name: str, func: Callable):
+        """Buduje modele pydantic usługi; dla nietypowych sygnatur zwraca None."""
+        return build_models(name, func)
+
+    @staticmethod
+    def _encoded_response(codec: Codec, data: Any, status: int = 200) -> web.Response:
+        """Tworzy odpowiedź zakodowaną wybranym kodekiem."""
+        return web.Response(body=codec.encode(data), content_type=codec.content_type, status=status)
+
+    @staticmethod
+    @web.middleware
+    async def _json_http_errors(request, handler):
+        """Zamienia błędy routera aiohttp (404, 405) na odpowiedzi {"detail": ...}."""
+        try:
+            return await handler(request)
+        except web.HTTPException as e:
+            if e.status < 400:
+                raise
+            headers = {"Allow": e.headers["Allow"]} if "Allow" in e.headers else None
+            return web.json_response({"detail": e.reason}, status=e.status, headers=headers)
 
     def _register_routes(self):
         """Rejestruje wszystkie trasy w aplikacji."""
@@ -177,13 +334,16 @@ class RESTAdapter(ProtocolAdapter):
         health_path = self.config.get("health_path", "/health")
         self.app.router.add_get(health_path, health_handler)
 
-        # Dodajemy obsługę wszystkich tras
-        for path, route_info in self.routes.items():
+        # Dodajemy obsługę wszystkich tras; stałe segmenty mają pierwszeństwo przed parametrami,
+        # więc "/users/me" nie zostanie przesłonięte przez "/users/{id}"
+        for path in sorted(self.routes, key=route_order):
+            route_info = self.routes[path]
+
             # Tworzymy handler dla trasy
-            handler = self._handle_request
+            handler = self._create_handler(route_info)
 
             # Dodajemy trasę do aplikacji
-            resource = self.app.router.add_resource(path)
+            resource = self.app.router.add_resource(route_info["router_path"])
 
             for method in route_info["methods"]:
                 resource.add_route(method, handler)
@@ -192,34 +352,51 @@ class RESTAdapter(ProtocolAdapter):
             if self.cors:
                 self.cors.add(resource)
 
+        # Endpoint metryk (opcja `metrics`, domyślnie wyłączony) dodajemy po usługach,
+        # aby nie przesłaniał ich ścieżek
+        metrics_path = self.config.get("metrics_path", "/metrics")
+        if self.config.get("metrics", False) and metrics_path not in self.routes:
+            async def metrics_handler(request):
+                return web.Response(body=render_prometheus().encode("utf-8"),
+                                    headers={"Content-Type": PROMETHEUS_CONTENT_TYPE})
+
+            self.app.router.add_get(metrics_path, metrics_handler)
+
     async def _run_server(self):
         """Uruchamia serwer REST."""
         host = self.config.get("host", "0.0.0.0")
-        port = self.config.get("port", 8000)
+        port = self.config.get("port", 8080)
 
         # Rejestrujemy trasy
         self._register_routes()
 
+        # Silnik HTTP odpowiada na nieznane trasy JSON-em, jak FastAPI i asgi
+        if self._serves_http:
+            self.app.middlewares.append(self._json_http_errors)
+
         # Uruchamiamy serwer
         self.runner = web.AppRunner(self.app)
         await self.runner.setup()
 
-        self.site = web.TCPSite(self.runner, host, port)
+        # W trybie prefork gniazdo nasłuchujące jest tworzone przez nadzorcę
+        sock = self.config.get("socket")
+        if sock is not None:
+            self.site = web.SockSite(self.runner, sock)
+        else:
+            self.site = web.TCPSite(self.runner, host, port)
         await self.site.start()
 
         print(f"Serwer REST uruchomiony na http://{host}:{port}")
 
-        # Czekamy na zatrzymanie
-        while True:
-            await asyncio.sleep(3600)  # 1 godzina
-
     def _server_thread_func(self):
         """Funkcja wątku serwera."""
         loop = asyncio.new_event_loop()
         asyncio.set_event_loop(loop)
+        self.loop = loop
 
         try:
             loop.run_until_complete(self._run_server())
+            self._ready.set()
             loop.run_forever()
         except Exception as e:
             print(f"Błąd serwera REST: {e}")
@@ -228,22 +405,24 @@ class RESTAdapter(ProtocolAdapter):
 
     def start(self) -> None:
         """Uruchamia adapter REST."""
-        # Uruchamiamy serwer w osobnym wątku
+        # Uruchamiamy serwer w osobnym wątku i czekamy, aż zacznie nasłuchiwać
+        self._ready = threading.Event()
         self.server_thread = threading.Thread(target=self._server_thread_func)
         self.server_thread.daemon = True
         self.server_thread.start()
+        if not self._ready.wait(timeout=5.0):
+            raise RuntimeError("Failed to start REST server")
 
     def stop(self) -> None:
         """Zatrzymuje adapter REST."""
-        # Zatrzymujemy serwer
-        if self.site and self.runner:
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-
+        # Zatrzymujemy serwer w pętli, w której działa
+        if self.runner and self.loop is not None and self.loop.is_running():
             try:
-                loop.run_until_complete(self.site.stop())
-                loop.run_until_complete(self.runner.cleanup())
+                asyncio.run_coroutine_threadsafe(self.runner.cleanup(), self.loop).result(timeout=5.0)
             finally:
-                loop.close()
+                self.loop.call_soon_threadsafe(self.loop.stop)
+                if self.server_thread:
+                    self.server_thread.join(timeout=1.0)
 
-        print("Serwer REST zatrzymany")
\ No newline at end of file
+        self.executors.shutdown()
+        print("Serwer REST zatrzymany")
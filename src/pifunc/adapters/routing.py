@@ -0,0 +1,171 @@
+# pifunc/adapters/routing.py
+"""
+Wspólne narzędzia routingu ścieżek HTTP.
+
+Ścieżki usług mogą deklarować typowane parametry, np. "/users/{id:int}"
+albo "/files/{rest:path}". Ten sam zapis obsługują wszystkie silniki HTTP:
+
+    - aiohttp (RESTAdapter) - `compile_path` zamienia go na wzorzec routera aiohttp,
+    - asgi (ASGIAdapter) - `RouteTrie` dopasowuje ścieżkę segment po segmencie.
+
+Moduł nie zależy od żadnego frameworka.
+"""
+
+import re
+import uuid
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+# Typowane parametry ścieżki: nazwa -> (wyrażenie regularne segmentu, konwersja)
+PATH_CONVERTERS = {
+    "str": (r"[^/]+", str),
+    "int": (r"-?\d+", int),
+    "float": (r"-?\d+(?:\.\d+)?", float),
+    "uuid": (r"[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}", uuid.UUID),
+    "path": (r".+", str),
+}
+
+PATH_PARAM = re.compile(r"{([^}:]+)(?::([^}]+))?}")
+
+
+def compile_path(path: str) -> Tuple[str, Dict[str, Callable]]:
+    """
+    Zamienia ścieżkę z typowanymi parametrami na wzorzec routera aiohttp.
+
+    Zwraca (wzorzec, konwersje parametrów), np. "/users/{id:int}" ->
+    ("/users/{id:-?\\d+}", {"id": int}). Nieznane konwertery traktowane są jak
+    wyrażenia regularne aiohttp, a parametry bez typu pozostają tekstem.
+    """
+    converters = {}
+
+    def replace(match):
+        name, converter = match.group(1), match.group(2)
+        if converter is None:
+            return match.group(0)
+        if converter in PATH_CONVERTERS:
+            pattern, convert = PATH_CONVERTERS[converter]
+            if convert is not str:
+                converters[name] = convert
+            return f"{{{name}:{pattern}}}"
+        return match.group(0)
+
+    return PATH_PARAM.sub(replace, path), converters
+
+
+def route_order(path: str) -> Tuple[int, ...]:
+    """Klucz sortowania tras: segmenty stałe przed parametrami na każdej pozycji."""
+    return tuple(1 if "{" in segment else 0 for segment in path.strip("/").split("/"))
+
+
+def path_segments(path: str) -> List[str]:
+    """Dzieli ścieżkę na segmenty; ukośniki na początku i końcu są pomijane."""
+    path = path.strip("/")
+    return path.split("/") if path else []
+
+
+class _Node:
+    """Węzeł drzewa tras: dzieci stałe, dzieci parametryczne i handlery metod."""
+
+    __slots__ = ("static", "params", "catch_all", "handlers")
+
+    def __init__(self):
+        self.static: Dict[str, "_Node"] = {}
+        # (nazwa, walidator segmentu, konwersja, węzeł); typowane przed tekstowymi
+        self.params: List[Tuple[str, Optional[Callable], Callable, "_Node"]] = []
+        # Parametr {name:path} pochłania resztę ścieżki
+        self.catch_all: Optional[Tuple[str, "_Node"]] = None
+        self.handlers: Dict[str, Any] = {}
+
+
+class RouteTrie:
+    """
+    Drzewo tras dopasowywane segment po segmencie.
+
+    Na każdej pozycji segmenty stałe mają pierwszeństwo przed parametrami,
+    więc "/users/me" wygrywa z "/users/{id}" niezależnie od kolejności
+    rejestracji. Koszt dopasowania zależy od długości ścieżki, a nie od liczby tras.
+    """
+
+    def __init__(self):
+        self.root = _Node()
+
+    def add(self, path: str, method: str, handler: Any) -> None:
+        """Dodaje handler metody HTTP dla ścieżki."""
+        node = self.root
+        for segment in path_segments(path):
+            match = PATH_PARAM.fullmatch(segment)
+            if match is None:
+                node = node.static.setdefault(segment, _Node())
+                continue
+
+            name, converter = match.group(1), match.group(2) or "str"
+            if converter not in PATH_CONVERTERS:
+                raise ValueError(f"Unknown path converter '{converter}' in {path}. "
+                                 f"Valid converters are: {list(PATH_CONVERTERS)}")
+            if converter == "path":
+                if node.catch_all is None:
+                    node.catch_all = (name, _Node())
+                node = node.catch_all[1]
+                continue
+
+            pattern, convert = PATH_CONVERTERS[converter]
+            validate = None if converter == "str" else re.compile(pattern).fullmatch
+            for param_name, param_validate, _, child in node.params:
+                if param_name == name and param_validate == validate:
+                    node = child
+                    break
+            else:
+                child = _Node()
+                node.params.append((name, validate, convert, child))
+                # Parametry typowane sprawdzamy przed tekstowymi
+                node.params.sort(key=lambda param: param[1] is None)
+                node = child
+
+        if method in node.handlers:
+            raise ValueError(f"Route {method} {path} is already registered")
+        node.handlers[method] = handler
+
+    def match(self, method: str, path: str) -> Tuple[Optional[Any], Dict[str, Any], Set[str]]:
+        """
+        Dopasowuje żądanie.
+
+        Zwraca (handler, parametry ścieżki, metody dozwolone dla ścieżki).
+        Gdy handler jest None, a zbiór metod jest niepusty, ścieżka istnieje,
+        ale nie obsługuje metody (405); pusty zbiór oznacza brak trasy (404).
+        """
+        allowed: Set[str] = set()
+        params: Dict[str, Any] = {}
+        handler = self._match(self.root, path_segments(path), 0, method, params, allowed)
+        return handler, params, allowed
+
+    def _match(self, node: _Node, segments: List[str], index: int, method: str,
+               params: Dict[str, Any], allowed: Set[str]) -> Optional[Any]:
+        if index == len(segments):
+            handler = node.handlers.get(method)
+            if handler is None:
+                allowed.update(node.handlers)
+            return handler
+
+        segment = segments[index]
+        child = node.static.get(segment)
+        if child is not None:
+            handler = self._match(child, segments, index + 1, method, params, allowed)
+            if handler is not None:
+                return handler
+
+        for name, validate, convert, child in node.params:
+            if validate is not None and validate(segment) is None:
+                continue
+            params[name] = convert(segment)
+            handler = self._match(child, segments, index + 1, method, params, allowed)
+            if handler is not None:
+                return handler
+            del params[name]
+
+        if node.catch_all is not None:
+            name, child = node.catch_all
+            handler = child.handlers.get(method)
+            if handler is not None:
+                params[name] = "/".join(segments[index:])
+                return handler
+            allowed.update(child.handlers)
+        return None
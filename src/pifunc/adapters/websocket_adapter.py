@@ -1,12 +1,15 @@
 # pifunc/adapters/websocket_adapter.py
-import json
 import asyncio
 import threading
-import inspect
+import time
 from typing import Any, Callable, Dict, List, Set
 import websockets
 from websockets.server import WebSocketServerProtocol
 from pifunc.adapters import ProtocolAdapter
+from pifunc.adapters.codecs import Codec, CodecError, get_codec
+from pifunc.deadlines import parse_timeout
+from pifunc.invoker import get_invoker
+from pifunc.metrics import track
 
 
 class WebSocketAdapter(ProtocolAdapter):
@@ -17,12 +20,32 @@ class WebSocketAdapter(ProtocolAdapter):
         self.config = {}
         self.server = None
         self.server_task = None
+        self.loop = None
         self.clients: Set[WebSocketServerProtocol] = set()
         self.namespaces = {}
+        self.codec = get_codec()
 
     def setup(self, config: Dict[str, Any]) -> None:
         """Konfiguruje adapter WebSocket."""
         self.config = config
+        self.codec = get_codec(config.get("codec"))
+
+    def _frame_codec(self, message) -> Codec:
+        """Dobiera kodek do ramki: tekstowe to JSON, binarne to MessagePack."""
+        if isinstance(message, str):
+            return get_codec("json") if self.codec.binary else self.codec
+        if self.codec.binary:
+            return self.codec
+        try:
+            return get_codec("msgpack")
+        except ImportError:
+            return self.codec
+
+    @staticmethod
+    async def _send(websocket, codec: Codec, data: Any) -> None:
+        """Wysyła wiadomość ramką odpowiadającą kodekowi."""
+        payload = codec.encode(data)
+        await websocket.send(payload if codec.binary else payload.decode("utf-8"))
 
     def register_function(self, func: Callable, metadata: Dict[str, Any]) -> None:
         """Rejestruje funkcję jako handler dla wydarzenia WebSocket."""
@@ -41,17 +64,26 @@ class WebSocketAdapter(ProtocolAdapter):
         self.namespaces[namespace][event] = {
             "function": func,
             "metadata": metadata,
+            "invoker": get_invoker(func, metadata),
             "event": event
         }
 
-    async def _handle_client(self, websocket: WebSocketServerProtocol, path: str):
+    @staticmethod
+    def _client_path(websocket) -> str:
+        """Zwraca ścieżkę połączenia niezależnie od wersji biblioteki websockets."""
+        request = getattr(websocket, "request", None)
+        if request is not None:
+            return request.path
+        return getattr(websocket, "path", "/")
+
+    async def _handle_client(self, websocket: WebSocketServerProtocol, path: str = None):
         """Obsługuje połączenie klienta WebSocket."""
         # Dodajemy klienta do listy
         self.clients.add(websocket)
 
         try:
-            # Pobieramy namespace dla ścieżki
-            namespace = path
+            # Pobieramy namespace dla ścieżki; websockets>=13 nie przekazuje już ścieżki do handlera
+            namespace = path or self._client_path(websocket)
             if namespace not in self.namespaces:
                 namespace = "/"
 
@@ -59,70 +91,73 @@ class WebSocketAdapter(ProtocolAdapter):
             namespace_functions = self.namespaces.get(namespace, {})
 
             if not namespace_functions:
-                await websocket.send(json.dumps({
+                await self._send(websocket, self._frame_codec(""), {
                     "error": f"Nieznany namespace: {namespace}"
-                }))
+                })
                 return
 
             # Informujemy klienta o dostępnych zdarzeniach
             available_events = list(namespace_functions.keys())
-            await websocket.send(json.dumps({
+            await self._send(websocket, self._frame_codec(""), {
                 "type": "connection_established",
                 "namespace": namespace,
                 "available_events": available_events
-            }))
+            })
 
             # Pętla obsługi wiadomości
             async for message in websocket:
+                # Odpowiadamy tym samym formatem, w którym przyszła wiadomość
+                codec = self._frame_codec(message)
+                received = time.perf_counter()
                 try:
-                    # Parsujemy wiadomość JSON
-                    data = json.loads(message)
+                    # Dekodujemy wiadomość
+                    data = codec.decode(message)
 
                     # Pobieramy nazwę zdarzenia
                     event = data.get("event")
                     if not event:
-                        await websocket.send(json.dumps({
+                        await self._send(websocket, codec, {
                             "error": "Brak nazwy zdarzenia w wiadomości"
-                        }))
+                        })
                         continue
 
                     # Sprawdzamy, czy mamy zarejestrowaną funkcję dla tego zdarzenia
                     if event not in namespace_functions:
-                        await websocket.send(json.dumps({
+                        await self._send(websocket, codec, {
                             "error": f"Nieznane zdarzenie: {event}"
-                        }))
+                        })
                         continue
 
                     # Pobieramy funkcję
                     function_info = namespace_functions[event]
-                    func = function_info["function"]
-
-                    # Pobieramy dane wejściowe
-                    kwargs = data.get("data", {})
-
-                    # Wywołujemy funkcję
-                    result = func(**kwargs)
-
-                    # Obsługujemy coroutines
-                    if asyncio.iscoroutine(result):
-                        result = await result
-
-                    # Wysyłamy odpowiedź
-                    response = {
-                        "event": f"{event}_response",
-                        "result": result
-                    }
-
-                    await websocket.send(json.dumps(response))
-
-                except json.JSONDecodeError:
-                    await websocket.send(json.dumps({
-                        "error": "Nieprawidłowy format JSON"
-                    }))
+                    invoker = function_info["invoker"]
+
+                    with track(invoker.name, "websocket", started=received) as timer:
+                        # Pobieramy dane wejściowe
+                        kwargs = data.get("data", {})
+                        timer.mark("decode")
+
+                        # Wywołujemy funkcję; pole "timeout" koperty to limit czasu klienta
+                        result = await invoker.call_async(kwargs, timeout=parse_timeout(data.get("timeout")))
+                        timer.mark("execute")
+
+                        # Wysyłamy odpowiedź
+                        response = codec.encode({
+                            "event": f"{event}_response",
+                            "result": result
+                        })
+                        timer.mark("encode")
+
+                    await websocket.send(response if codec.binary else response.decode("utf-8"))
+
+                except CodecError:
+                    await self._send(websocket, codec, {
+                        "error": f"Nieprawidłowy format {codec.name}"
+                    })
                 except Exception as e:
-                    await websocket.send(json.dumps({
+                    await self._send(websocket, codec, {
                         "error": str(e)
-                    }))
+                    })
         except websockets.exceptions.ConnectionClosed:
             pass
         finally:
@@ -134,8 +169,15 @@ class WebSocketAdapter(ProtocolAdapter):
         host = self.config.get("host", "0.0.0.0")
         port = self.config.get("port", 8081)
 
+        # W trybie prefork gniazdo nasłuchujące jest tworzone przez nadzorcę
+        sock = self.config.get("socket")
+        if sock is not None:
+            server = websockets.serve(self._handle_client, sock=sock)
+        else:
+            server = websockets.serve(self._handle_client, host, port)
+
         # Tworzymy serwer
-        async with websockets.serve(self._handle_client, host, port):
+        async with server:
             print(f"Serwer WebSocket uruchomiony na ws://{host}:{port}")
 
             # Czekamy na zakończenie
@@ -146,6 +188,7 @@ class WebSocketAdapter(ProtocolAdapter):
         """Uruchamia pętlę zdarzeń asyncio w osobnym wątku."""
         loop = asyncio.new_event_loop()
         asyncio.set_event_loop(loop)
+        self.loop = loop
 
         # Tworzymy i uruchamiamy zadanie serwera
         self.server_task = loop.create_task(self._serve_forever())
@@ -167,28 +210,30 @@ class WebSocketAdapter(ProtocolAdapter):
     def stop(self) -> None:
         """Zatrzymuje serwer WebSocket."""
         # Zamykamy wszystkie połączenia klientów
-        if self.clients:
+        if self.clients and self.loop is not None:
             for client in self.clients.copy():
                 asyncio.run_coroutine_threadsafe(
                     client.close(),
-                    client.loop
+                    self.loop
                 )
 
-        # Anulujemy zadanie serwera
+        # Anulujemy zadanie serwera w jego własnej pętli
         if self.server_task and not self.server_task.done():
-            self.server_task.cancel()
+            self.loop.call_soon_threadsafe(self.server_task.cancel)
 
         print("Serwer WebSocket zatrzymany")
 
     async def broadcast(self, namespace: str, event: str, data: Any):
         """Wysyła wiadomość do wszystkich klientów w danym namespace."""
-        message = json.dumps({
+        message = self.codec.encode({
             "event": event,
             "data": data
         })
+        if not self.codec.binary:
+            message = message.decode("utf-8")
 
         for client in self.clients:
-            if client.path == namespace:
+            if self._client_path(client) == namespace:
                 try:
                     await client.send(message)
                 except:
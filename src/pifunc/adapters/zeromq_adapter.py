@@ -1,12 +1,13 @@
 # pifunc/adapters/zeromq_adapter.py
-import json
-import asyncio
 import threading
 import time
-import inspect
 import os
 from typing import Any, Callable, Dict, List, Optional
 from pifunc.adapters import ProtocolAdapter
+from pifunc.adapters.codecs import CodecError
+from pifunc.deadlines import parse_timeout
+from pifunc.invoker import get_invoker
+from pifunc.metrics import track
 import logging
 
 logger = logging.getLogger(__name__)
@@ -18,7 +19,6 @@ try:
     _zeromq_available = True
 except ImportError:
     _zeromq_available = False
-    print("Warning: ZeroMQ library not available. ZeroMQ adapter will be disabled.")
 
 
 class ZeroMQAdapter(ProtocolAdapter):
@@ -42,6 +42,7 @@ class ZeroMQAdapter(ProtocolAdapter):
         if not _zeromq_available:
             if self.force_connection:
                 raise ImportError("ZeroMQ library is required but not available.")
+            logger.warning("ZeroMQ library not available. ZeroMQ adapter will be disabled.")
             self._connected = False
             return
 
@@ -84,6 +85,8 @@ class ZeroMQAdapter(ProtocolAdapter):
         self.functions[service_name] = {
             "function": func,
             "metadata": metadata,
+            "invoker": get_invoker(func, metadata),
+            "codec": self.codec_for(metadata),
             "pattern": pattern,
             "port": port,
             "bind_address": bind_address,
@@ -152,7 +155,8 @@ class ZeroMQAdapter(ProtocolAdapter):
         poller = zmq.Poller()
         poller.register(socket, zmq.POLLIN)
 
-        func = function_info["function"]
+        invoker = function_info["invoker"]
+        codec = function_info["codec"]
 
         while self.running:
             try:
@@ -163,48 +167,49 @@ class ZeroMQAdapter(ProtocolAdapter):
                     # Receive message
                     message = socket.recv()
 
-                    try:
-                        # Parse JSON
-                        kwargs = json.loads(message.decode('utf-8'))
-
-                        # Call the function
-                        result = func(**kwargs)
-
-                        # Handle coroutines
-                        if asyncio.iscoroutine(result):
-                            # Create a new asyncio loop
-                            loop = asyncio.new_event_loop()
-                            asyncio.set_event_loop(loop)
-                            result = loop.run_until_complete(result)
-                            loop.close()
-
-                        # Serialize the result
-                        response = json.dumps({
-                            "result": result,
-                            "service": service_name,
-                            "timestamp": time.time()
-                        })
-
-                        # Send response
-                        socket.send(response.encode('utf-8'))
-
-                    except json.JSONDecodeError:
-                        # Send error information
-                        error_response = json.dumps({
-                            "error": "Invalid JSON format",
-                            "service": service_name,
-                            "timestamp": time.time()
-                        })
-                        socket.send(error_response.encode('utf-8'))
-                    except Exception as e:
-                        # Send error information
-                        error_response = json.dumps({
-                            "error": str(e),
-                            "service": service_name,
-                            "timestamp": time.time()
-                        })
-                        socket.send(error_response.encode('utf-8'))
-                        logger.error(f"Error processing message: {e}")
+                    with track(invoker.name, "zeromq") as timer:
+                        try:
+                            # Decode the request
+                            kwargs = codec.decode(message)
+                            timer.mark("decode")
+
+                            # Call the function; the reserved "_timeout" field is the client's deadline
+                            timeout = None
+                            if isinstance(kwargs, dict):
+                                timeout = parse_timeout(kwargs.pop("_timeout", None))
+                            result = invoker.call_sync(kwargs, timeout)
+                            timer.mark("execute")
+
+                            # Serialize the result
+                            response = codec.encode({
+                                "result": result,
+                                "service": service_name,
+                                "timestamp": time.time()
+                            })
+                            timer.mark("encode")
+
+                            # Send response
+                            socket.send(response)
+
+                        except CodecError:
+                            timer.fail()
+                            # Send error information
+                            error_response = codec.encode({
+                                "error": f"Invalid {codec.name} format",
+                                "service": service_name,
+                                "timestamp": time.time()
+                            })
+                            socket.send(error_response)
+                        except Exception as e:
+                            timer.fail()
+                            # Send error information
+                            error_response = codec.encode({
+                                "error": str(e),
+                                "service": service_name,
+                                "timestamp": time.time()
+                            })
+                            socket.send(error_response)
+                            logger.error(f"Error processing message: {e}")
 
             except zmq.ZMQError as e:
                 logger.error(f"ZeroMQ error: {e}")
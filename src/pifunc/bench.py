@@ -0,0 +1,551 @@
+# pifunc/bench.py
+"""
+Benchmarks of protocol adapter dispatch overhead (`pifunc bench`).
+
+Each adapter (HTTP on the fastapi, aiohttp and asgi engines, WebSocket,
+gRPC, ZeroMQ, GraphQL) is started on a local port with the example services
+(`example/basic_calculator.py`, `example/math_service`) and the throughput
+and p50/p99 latency of trivial and payload-heavy calls are measured. In-process microbenchmarks cover
+argument conversion (`ServiceInvoker.bind`) and codec encode/decode.
+
+Results are stored as JSON so two runs can be compared with a regression
+threshold:
+
+    pifunc bench --output before.json
+    pifunc bench --output after.json --baseline before.json --threshold 10
+"""
+
+import contextlib
+import io
+import json
+import os
+import platform
+import socket
+import statistics
+import sys
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+BENCH_PROTOCOLS = ("http", "http-aiohttp", "http-asgi", "websocket", "grpc", "zeromq", "graphql")
+
+# Number of items sent by the payload-heavy case
+PAYLOAD_ITEMS = 1000
+
+_EXAMPLE_DIR = Path(__file__).parent / "example"
+
+
+def _free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    index = min(len(values) - 1, max(0, int(round(fraction * len(values))) - 1))
+    return values[index]
+
+
+def summarize(latencies: List[float], elapsed: float) -> Dict[str, float]:
+    """Summarize a series of latencies (in seconds)."""
+    latencies = sorted(latencies)
+    return {
+        "calls": len(latencies),
+        "throughput": len(latencies) / elapsed if elapsed > 0 else 0.0,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": _percentile(latencies, 0.99) * 1000,
+        "mean_ms": statistics.fmean(latencies) * 1000,
+    }
+
+
+# Services
+
+def echo(items: list) -> int:
+    """Accept a large payload and return its size."""
+    return len(items)
+
+
+def _example_function(path: Path, name: str) -> Optional[Callable]:
+    """Load a function from an example file, if it is available."""
+    if not path.exists():
+        return None
+    from pifunc import load_module_from_file
+    with contextlib.redirect_stdout(io.StringIO()):
+        module = load_module_from_file(str(path))
+    return getattr(module, name, None)
+
+
+def load_cases() -> Dict[str, Tuple[Callable, Dict[str, Any]]]:
+    """Return the benchmark cases: name -> (function, arguments)."""
+    add = _example_function(_EXAMPLE_DIR / "basic_calculator.py", "add")
+    if add is None:
+        def add(a: int, b: int) -> dict:
+            return {"result": a + b}
+
+    cases = {"trivial": (add, {"a": 2, "b": 3})}
+
+    fibonacci = _example_function(_EXAMPLE_DIR / "math_service" / "service.py", "fibonacci")
+    if fibonacci is not None:
+        cases["math"] = (fibonacci, {"n": 30})
+
+    cases["payload"] = (echo, {"items": [f"item-{i:06d}" for i in range(PAYLOAD_ITEMS)]})
+    return cases
+
+
+# Adapters and clients
+
+class _AdapterBench(ABC):
+    """Runs an adapter with the benchmark services and creates clients for it."""
+
+    protocol = ""
+
+    def __init__(self, cases: Dict[str, Tuple[Callable, Dict[str, Any]]]):
+        self.cases = cases
+        self.port = _free_port()
+        self.adapter = None
+
+    @abstractmethod
+    def metadata(self, name: str, func: Callable) -> Dict[str, Any]:
+        """Return the adapter-specific service metadata for case `name`."""
+
+    @abstractmethod
+    def create_adapter(self):
+        """Return a new, not yet configured adapter instance."""
+
+    def config(self) -> Dict[str, Any]:
+        return {"host": "127.0.0.1", "port": self.port}
+
+    def start(self) -> None:
+        from pifunc.invoker import ServiceInvoker
+
+        self.adapter = self.create_adapter()
+        self.adapter.setup(self.config())
+        for name, (func, _) in self.cases.items():
+            metadata = {"name": f"bench_{name}", **self.metadata(name, func)}
+            metadata["invoker"] = ServiceInvoker(func, metadata)
+            self.adapter.register_function(func, metadata)
+        self.adapter.start()
+        self.wait_ready()
+
+    def wait_ready(self, timeout: float = 10.0) -> None:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            try:
+                with socket.create_connection(("127.0.0.1", self.port), timeout=0.2):
+                    return
+            except OSError:
+                time.sleep(0.05)
+        raise RuntimeError(f"{self.protocol} server did not start on port {self.port}")
+
+    @abstractmethod
+    def client(self) -> Callable[[str, Dict[str, Any]], Any]:
+        """Return a callable invoking case `name` with arguments."""
+
+    def stop(self) -> None:
+        if self.adapter is not None:
+            self.adapter.stop()
+
+
+class _HTTPBench(_AdapterBench):
+    protocol = "http"
+    engine = "fastapi"
+
+    def create_adapter(self):
+        from pifunc import _import_adapter
+        return _import_adapter("http", self.engine)()
+
+    def config(self):
+        return {**super().config(), "engine": self.engine}
+
+    def metadata(self, name, func):
+        return {"http": {"path": f"/bench/{name}", "method": "POST"}}
+
+    def client(self):
+        import requests
+
+        session = requests.Session()
+        base_url = f"http://127.0.0.1:{self.port}/bench"
+
+        def call(name, args):
+            response = session.post(f"{base_url}/{name}", json=args)
+            response.raise_for_status()
+            return response.json()["result"]
+
+        return call
+
+
+class _AIOHTTPBench(_HTTPBench):
+    protocol = "http-aiohttp"
+    engine = "aiohttp"
+
+
+class _ASGIBench(_HTTPBench):
+    protocol = "http-asgi"
+    engine = "asgi"
+
+
+class _WebSocketBench(_AdapterBench):
+    protocol = "websocket"
+
+    def create_adapter(self):
+        from pifunc.adapters.websocket_adapter import WebSocketAdapter
+        return WebSocketAdapter()
+
+    def metadata(self, name, func):
+        return {"websocket": {"event": f"bench.{name}"}}
+
+    def client(self):
+        from websockets.sync.client import connect
+
+        connection = connect(f"ws://127.0.0.1:{self.port}/")
+        connection.recv()  # connection_established
+
+        def call(name, args):
+            connection.send(json.dumps({"event": f"bench.{name}", "data": args}))
+            response = json.loads(connection.recv())
+            if "error" in response:
+                raise RuntimeError(response["error"])
+            return response["result"]
+
+        return call
+
+
+class _GRPCBench(_AdapterBench):
+    protocol = "grpc"
+
+    def create_adapter(self):
+        from pifunc.adapters.grpc_adapter import GRPCAdapter
+        return GRPCAdapter()
+
+    def config(self):
+        return {"host": "127.0.0.1", "port": self.port, "reflection": False}
+
+    def metadata(self, name, func):
+        return {"grpc": {}}
+
+    def client(self):
+        import grpc
+
+        channel = grpc.insecure_channel(f"127.0.0.1:{self.port}")
+        stubs = {}
+        for name in self.cases:
+            schema = self.adapter.services[f"bench_{name}"]["schema"]
+            serializer, deserializer = schema.serializers()
+            method = channel.unary_unary(schema.method_path, request_serializer=serializer,
+                                         response_deserializer=deserializer)
+            stubs[name] = (method, schema.request_class)
+
+        def call(name, args):
+            method, request_class = stubs[name]
+            return method(request_class(**args)).result
+
+        return call
+
+
+class _ZeroMQBench(_AdapterBench):
+    protocol = "zeromq"
+
+    def create_adapter(self):
+        from pifunc.adapters.zeromq_adapter import ZeroMQAdapter
+        return ZeroMQAdapter()
+
+    def start(self):
+        # Every ZeroMQ service listens on its own port
+        self.ports = {name: _free_port() for name in self.cases}
+        super().start()
+
+    def wait_ready(self, timeout: float = 10.0) -> None:
+        for self.port in self.ports.values():
+            super().wait_ready(timeout)
+
+    def metadata(self, name, func):
+        return {"zeromq": {"port": self.ports[name], "bind_address": "tcp://127.0.0.1"}}
+
+    def client(self):
+        import zmq
+
+        context = zmq.Context.instance()
+        sockets = {}
+        for name, port in self.ports.items():
+            sock = context.socket(zmq.REQ)
+            sock.connect(f"tcp://127.0.0.1:{port}")
+            sockets[name] = sock
+
+        def call(name, args):
+            sock = sockets[name]
+            sock.send(json.dumps(args).encode("utf-8"))
+            response = json.loads(sock.recv())
+            if "error" in response:
+                raise RuntimeError(response["error"])
+            return response["result"]
+
+        return call
+
+
+class _GraphQLBench(_AdapterBench):
+    protocol = "graphql"
+
+    def create_adapter(self):
+        from pifunc.adapters.graphql_adapter import GraphQLAdapter
+        return GraphQLAdapter()
+
+    def metadata(self, name, func):
+        return {"graphql": {"field_name": f"bench_{name}"}}
+
+    def client(self):
+        import requests
+
+        session = requests.Session()
+        url = f"http://127.0.0.1:{self.port}/graphql"
+
+        def call(name, args):
+            arguments = ", ".join(f"{key}: {json.dumps(value)}" for key, value in args.items())
+            query = f"query {{ bench_{name}({arguments}) }}"
+            response = session.post(url, json={"query": query}).json()
+            if response.get("errors"):
+                raise RuntimeError(response["errors"][0]["message"])
+            return response["data"][f"bench_{name}"]
+
+        return call
+
+
+_ADAPTER_BENCHES = {
+    "http": _HTTPBench,
+    "http-aiohttp": _AIOHTTPBench,
+    "http-asgi": _ASGIBench,
+    "websocket": _WebSocketBench,
+    "grpc": _GRPCBench,
+    "zeromq": _ZeroMQBench,
+    "graphql": _GraphQLBench,
+}
+
+
+def _measure(call: Callable, name: str, args: Dict[str, Any], iterations: int) -> List[float]:
+    latencies = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        call(name, args)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def bench_adapter(protocol: str, cases, iterations: int = 500, warmup: int = 50,
+                  concurrency: int = 1) -> Dict[str, Any]:
+    """Measure all cases through a single adapter."""
+    bench = _ADAPTER_BENCHES[protocol](cases)
+    results: Dict[str, Any] = {}
+
+    # Adapters print start-up messages; keep them out of the results
+    with contextlib.redirect_stdout(io.StringIO()):
+        try:
+            bench.start()
+        except Exception as e:
+            with contextlib.suppress(Exception):
+                bench.stop()
+            return {"skipped": f"{type(e).__name__}: {e}"}
+
+    try:
+        clients = [bench.client() for _ in range(concurrency)]
+        for name, (_, args) in cases.items():
+            try:
+                _measure(clients[0], name, args, warmup)
+                per_client = max(1, iterations // concurrency)
+                start = time.perf_counter()
+                if concurrency == 1:
+                    latencies = _measure(clients[0], name, args, per_client)
+                else:
+                    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                        futures = [pool.submit(_measure, client, name, args, per_client)
+                                   for client in clients]
+                        latencies = [value for future in futures for value in future.result()]
+                elapsed = time.perf_counter() - start
+                results[name] = summarize(latencies, elapsed)
+            except Exception as e:
+                results[name] = {"error": f"{type(e).__name__}: {e}"}
+    except Exception as e:
+        results = {"skipped": f"{type(e).__name__}: {e}"}
+    finally:
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.suppress(Exception):
+            bench.stop()
+
+    return results
+
+
+# Microbenchmarks
+
+def _time_loop(func: Callable[[], Any], min_time: float = 0.2) -> Dict[str, float]:
+    """Call `func` in a loop for at least `min_time` seconds."""
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+        loops *= 2
+    return {"ops_per_sec": loops / elapsed, "ns_per_op": elapsed / loops * 1e9}
+
+
+def bench_micro(min_time: float = 0.2) -> Dict[str, Dict[str, float]]:
+    """Measure argument conversion and serialization in-process."""
+    from dataclasses import dataclass
+
+    from pifunc.adapters.codecs import get_codec
+    from pifunc.invoker import ServiceInvoker
+
+    @dataclass
+    class Item:
+        id: int
+        name: str
+        price: float
+
+    def scalars(a: int, b: float, name: str, flag: bool = False) -> None:
+        pass
+
+    def nested(item: Item, tags: list) -> None:
+        pass
+
+    results = {}
+    invoker = ServiceInvoker(scalars)
+    raw = {"a": "1", "b": "2.5", "name": "x", "flag": True, "ignored": 1}
+    results["bind.scalars"] = _time_loop(lambda: invoker.bind(raw), min_time)
+
+    invoker = ServiceInvoker(nested)
+    raw = {"item": {"id": 1, "name": "x", "price": 9.99}, "tags": ["a", "b"]}
+    results["bind.dataclass"] = _time_loop(lambda: invoker.bind(raw), min_time)
+
+    small = {"result": {"id": 1, "name": "Test Product", "price": 99.99, "in_stock": True}}
+    large = {"result": [{"id": i, "name": f"item-{i}", "price": i * 1.5, "tags": ["a", "b"]}
+                        for i in range(PAYLOAD_ITEMS)]}
+    for codec_name in ("json-stdlib", "json", "msgpack"):
+        try:
+            codec = get_codec(codec_name)
+        except ImportError:
+            continue
+        for size, payload in (("small", small), ("large", large)):
+            encoded = codec.encode(payload)
+            results[f"codec.{codec.name}.encode.{size}"] = _time_loop(lambda: codec.encode(payload), min_time)
+            results[f"codec.{codec.name}.decode.{size}"] = _time_loop(lambda: codec.decode(encoded), min_time)
+
+    return results
+
+
+# Running and comparing
+
+def run_benchmarks(protocols: Iterable[str] = BENCH_PROTOCOLS, iterations: int = 500,
+                   warmup: int = 50, concurrency: int = 1, micro: bool = True) -> Dict[str, Any]:
+    """Run the adapter benchmarks and microbenchmarks."""
+    from pifunc import __version__
+
+    cases = load_cases()
+    results = {
+        "meta": {
+            "timestamp": time.time(),
+            "pifunc_version": __version__,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "iterations": iterations,
+            "concurrency": concurrency,
+        },
+        "adapters": {},
+        "micro": {},
+    }
+    for protocol in protocols:
+        results["adapters"][protocol] = bench_adapter(protocol, cases, iterations, warmup, concurrency)
+    if micro:
+        results["micro"] = bench_micro()
+    return results
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float = 10.0) -> List[str]:
+    """
+    Compare two runs and return the regressions larger than `threshold` percent.
+
+    A regression is a drop in throughput (throughput, ops_per_sec) or a rise
+    in latency (p50_ms, p99_ms).
+    """
+    regressions = []
+
+    def check(label: str, old: Dict[str, float], new: Dict[str, float]) -> None:
+        for key in ("throughput", "ops_per_sec"):
+            if old.get(key) and key in new:
+                change = (old[key] - new[key]) / old[key] * 100
+                if change > threshold:
+                    regressions.append(f"{label} {key}: {old[key]:.1f} -> {new[key]:.1f} (-{change:.1f}%)")
+        for key in ("p50_ms", "p99_ms"):
+            if old.get(key) and key in new:
+                change = (new[key] - old[key]) / old[key] * 100
+                if change > threshold:
+                    regressions.append(f"{label} {key}: {old[key]:.3f} -> {new[key]:.3f} (+{change:.1f}%)")
+
+    for protocol, cases in current.get("adapters", {}).items():
+        for name, stats in cases.items():
+            old = baseline.get("adapters", {}).get(protocol, {}).get(name)
+            if isinstance(old, dict) and isinstance(stats, dict):
+                check(f"{protocol}.{name}", old, stats)
+    for name, stats in current.get("micro", {}).items():
+        old = baseline.get("micro", {}).get(name)
+        if old:
+            check(name, old, stats)
+    return regressions
+
+
+def format_results(results: Dict[str, Any]) -> str:
+    """Format the results as a text table."""
+    lines = [f"{'adapter':<13} {'case':<10} {'calls/s':>10} {'p50 ms':>9} {'p99 ms':>9}"]
+    for protocol, cases in results["adapters"].items():
+        if "skipped" in cases:
+            lines.append(f"{protocol:<13} skipped: {cases['skipped']}")
+            continue
+        for name, stats in cases.items():
+            if "error" in stats:
+                lines.append(f"{protocol:<13} {name:<10} error: {stats['error']}")
+            else:
+                lines.append(f"{protocol:<13} {name:<10} {stats['throughput']:>10.0f} "
+                             f"{stats['p50_ms']:>9.3f} {stats['p99_ms']:>9.3f}")
+    if results.get("micro"):
+        lines.append("")
+        lines.append(f"{'microbenchmark':<34} {'ops/s':>12} {'ns/op':>12}")
+        for name, stats in results["micro"].items():
+            lines.append(f"{name:<34} {stats['ops_per_sec']:>12.0f} {stats['ns_per_op']:>12.0f}")
+    return "\n".join(lines)
+
+
+def main(args) -> int:
+    """Entry point for `pifunc bench`."""
+    protocols = [p.strip() for p in args.protocols.split(",") if p.strip()] if args.protocols else list(BENCH_PROTOCOLS)
+    unknown = set(protocols) - set(BENCH_PROTOCOLS)
+    if unknown:
+        print(f"Unknown protocols: {', '.join(sorted(unknown))}. Available: {', '.join(BENCH_PROTOCOLS)}",
+              file=sys.stderr)
+        return 1
+
+    results = run_benchmarks(protocols, iterations=args.iterations, warmup=args.warmup,
+                             concurrency=args.concurrency, micro=not args.no_micro)
+    print(format_results(results))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults saved to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        for key in ("iterations", "concurrency"):
+            if baseline.get("meta", {}).get(key) != results["meta"][key]:
+                print(f"Warning: baseline was recorded with {key}={baseline.get('meta', {}).get(key)}, "
+                      f"this run uses {key}={results['meta'][key]}", file=sys.stderr)
+        regressions = compare(baseline, results, args.threshold)
+        if regressions:
+            print(f"\nRegressions over {args.threshold}% against {args.baseline}:")
+            for regression in regressions:
+                print(f"  {regression}")
+            return 1
+        print(f"\nNo regressions over {args.threshold}% against {args.baseline}")
+
+    return 0
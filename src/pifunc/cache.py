@@ -0,0 +1,171 @@
+# pifunc/cache.py
+"""
+Pamięć podręczna wyników usług, wspólna dla wszystkich protokołów.
+
+Włączana przez `@service(cache={...})`:
+
+    @service(cache={"ttl": 30, "max_entries": 10000, "key": ["product_id"]}, http={...})
+    def get_product(product_id: str) -> dict: ...
+
+Wyniki są zapamiętywane w `ServiceInvoker`, więc trafienie pomija wywołanie
+funkcji niezależnie od tego, czy żądanie przyszło przez HTTP, MQTT, gRPC
+czy WebSocket. Kluczem są argumenty po konwersji typów, uzupełnione
+wartościami domyślnymi, więc `get_product("1")` i `get_product(product_id=1)`
+trafiają w ten sam wpis.
+"""
+
+import dataclasses
+import inspect
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable, Optional, Tuple
+
+_CACHE_KEYS = {"ttl", "max_entries", "key"}
+
+# Znacznik braku wpisu (wynikiem usługi może być None)
+MISSING = object()
+
+
+def _freeze(value: Any) -> Hashable:
+    """Zamienia wartość argumentu na postać, której można użyć jako klucza."""
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, (set, frozenset)):
+        return frozenset(_freeze(v) for v in value)
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return (type(value).__name__, _freeze(dataclasses.asdict(value)))
+    hash(value)
+    return value
+
+
+def signature_defaults(func: Callable) -> Dict[str, Any]:
+    """Zwraca wartości domyślne parametrów funkcji."""
+    return {
+        name: param.default
+        for name, param in inspect.signature(func).parameters.items()
+        if param.default is not inspect.Parameter.empty
+    }
+
+
+def arguments_key(defaults: Dict[str, Any], bound: Dict[str, Any],
+                  fields: Optional[Tuple[str, ...]] = None) -> Optional[Tuple]:
+    """
+    Buduje klucz z argumentów wywołania uzupełnionych wartościami domyślnymi.
+
+    Zwraca None, jeśli argumentów nie da się haszować.
+    """
+    arguments = {**defaults, **bound}
+    if fields is not None:
+        arguments = {name: arguments.get(name) for name in fields}
+    try:
+        return tuple(sorted((name, _freeze(value)) for name, value in arguments.items()))
+    except TypeError:
+        return None
+
+
+class ResultCache:
+    """Ograniczona pamięć podręczna LRU z czasem życia wpisów."""
+
+    def __init__(self, func: Callable, ttl: Optional[float] = None, max_entries: int = 1024,
+                 key: Optional[Iterable[str]] = None):
+        if ttl is not None and ttl <= 0:
+            raise ValueError(f"Cache ttl must be positive, got {ttl}")
+        if max_entries <= 0:
+            raise ValueError(f"Cache max_entries must be positive, got {max_entries}")
+
+        signature = inspect.signature(func)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.key_fields = tuple(key) if key is not None else None
+        if self.key_fields is not None:
+            unknown = set(self.key_fields) - set(signature.parameters)
+            if unknown:
+                raise ValueError(f"Unknown cache key parameters: {sorted(unknown)}")
+        self.defaults = signature_defaults(func)
+
+        self._entries: "OrderedDict[Tuple, Tuple[Any, Optional[float]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @classmethod
+    def from_config(cls, func: Callable, config: Any) -> Optional["ResultCache"]:
+        """Tworzy pamięć podręczną z opcji `cache` dekoratora @service."""
+        if not config:
+            return None
+        if config is True:
+            config = {}
+        if not isinstance(config, dict):
+            raise ValueError(f"Invalid cache configuration: {config!r}")
+        invalid_keys = set(config) - _CACHE_KEYS
+        if invalid_keys:
+            raise ValueError(f"Invalid cache configuration keys: {invalid_keys}. Valid keys are: {_CACHE_KEYS}")
+        return cls(func, ttl=config.get("ttl"), max_entries=config.get("max_entries", 1024),
+                   key=config.get("key"))
+
+    def make_key(self, bound: Dict[str, Any]) -> Optional[Tuple]:
+        """Buduje klucz z argumentów; zwraca None, jeśli nie da się ich haszować."""
+        return arguments_key(self.defaults, bound, self.key_fields)
+
+    def get(self, key: Tuple) -> Any:
+        """Zwraca zapamiętany wynik lub MISSING."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at is None or expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+                self.evictions += 1
+            self.misses += 1
+            return MISSING
+
+    def set(self, key: Tuple, value: Any) -> None:
+        """Zapamiętuje wynik, usuwając najdawniej używane wpisy."""
+        expires_at = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, bound: Optional[Dict[str, Any]] = None) -> int:
+        """
+        Usuwa wpisy pasujące do podanych argumentów (bez argumentów: wszystkie).
+
+        Zwraca liczbę usuniętych wpisów.
+        """
+        with self._lock:
+            if not bound:
+                removed = len(self._entries)
+                self._entries.clear()
+                return removed
+
+            try:
+                expected = {name: _freeze(value) for name, value in bound.items()}
+            except TypeError:
+                return 0
+            removed = 0
+            for key in list(self._entries):
+                fields = dict(key)
+                if all(name in fields and fields[name] == value for name, value in expected.items()):
+                    del self._entries[key]
+                    removed += 1
+            return removed
+
+    def stats(self) -> Dict[str, int]:
+        """Zwraca liczniki trafień, chybień i usunięć."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+            }
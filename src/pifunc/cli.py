@@ -10,10 +10,7 @@ import argparse
 import json
 import os
 import sys
-import requests
 import importlib
-import inspect
-import pkg_resources
 import logging
 from typing import Dict, Any, Optional
 
@@ -47,14 +44,15 @@ def parse_args():
 
     # Generate command
     gen_parser = subparsers.add_parser("generate", help="Generate client code")
-    gen_parser.add_argument("type", choices=["client"], help="Type of code to generate")
+    gen_parser.add_argument("type", choices=["client", "proto"],
+                            help="Type of code to generate (proto: .proto files of gRPC services)")
     gen_parser.add_argument("--language", choices=["python", "javascript", "typescript"],
                             help="Programming language", default="python")
-    gen_parser.add_argument("--output", help="Output file path")
+    gen_parser.add_argument("--output", help="Output file path (proto: output directory)")
     gen_parser.add_argument("--host", help="Host for client connection", default="localhost")
     gen_parser.add_argument("--port", help="Port for client connection", type=int)
     gen_parser.add_argument("--protocol", help="Protocol for client (default: http)", default="http")
-    gen_parser.add_argument("--module", help="Python module with service definitions")
+    gen_parser.add_argument("--module", help="Python module or file with service definitions")
 
     # Docs command
     docs_parser = subparsers.add_parser("docs", help="View service documentation")
@@ -66,6 +64,18 @@ def parse_args():
     docs_parser.add_argument("--port", help="Port to serve docs on", type=int, default=8000)
     docs_parser.add_argument("--module", help="Python module with service definitions")
 
+    # Bench command
+    bench_parser = subparsers.add_parser("bench", help="Benchmark adapter dispatch overhead")
+    bench_parser.add_argument("--protocols", help="Comma-separated adapters to benchmark "
+                              "(default: http,http-aiohttp,http-asgi,websocket,grpc,zeromq,graphql)")
+    bench_parser.add_argument("--iterations", help="Measured calls per case", type=int, default=500)
+    bench_parser.add_argument("--warmup", help="Warm-up calls per case", type=int, default=50)
+    bench_parser.add_argument("--concurrency", help="Concurrent clients per adapter", type=int, default=1)
+    bench_parser.add_argument("--no-micro", help="Skip in-process microbenchmarks", action="store_true")
+    bench_parser.add_argument("--output", help="Save results as JSON")
+    bench_parser.add_argument("--baseline", help="JSON results of a previous run to compare against")
+    bench_parser.add_argument("--threshold", help="Regression threshold in percent", type=float, default=10.0)
+
     # Version command
     version_parser = subparsers.add_parser("version", help="Show version information")
 
@@ -77,9 +87,11 @@ def parse_args():
 
 def get_version():
     """Get the current version of PIfunc."""
+    from importlib.metadata import PackageNotFoundError, version
+
     try:
-        return pkg_resources.get_distribution("pifunc").version
-    except pkg_resources.DistributionNotFound:
+        return version("pifunc")
+    except PackageNotFoundError:
         return "unknown (development version)"
 
 
@@ -117,6 +129,9 @@ def call_http_function(args, function_name, function_args):
     logger.info(f"Calling {function_name} via HTTP {args.method} {url}")
     logger.info(f"Arguments: {json.dumps(function_args, indent=2)}")
 
+    # requests is imported here to keep CLI startup fast for other commands
+    import requests
+
     try:
         if args.method.upper() == "GET":
             response = requests.get(url, params=function_args, timeout=args.timeout)
@@ -142,23 +157,42 @@ def call_http_function(args, function_name, function_args):
 
 
 def call_grpc_function(args, function_name, function_args):
-    """Call a function using gRPC protocol."""
+    """Call a function using gRPC protocol, discovering it through server reflection."""
     try:
         import grpc
-        # We need to dynamically import the generated gRPC code
-        # This is just a placeholder - the actual implementation would need to discover
-        # and load the correct proto definitions
-        logger.error("gRPC support in CLI requires generated stubs")
-        logger.error("Please generate client code first: pifunc generate client --language python --protocol grpc")
-        return 1
+        from pifunc.grpc_client import GRPCClient
     except ImportError:
-        logger.error("gRPC support requires the 'grpcio' package:")
-        logger.error("pip install grpcio")
+        logger.error("gRPC support requires the 'grpcio' and 'grpcio-reflection' packages:")
+        logger.error("pip install grpcio grpcio-reflection")
+        return 1
+
+    target = f"{args.host}:{args.port or 50051}"
+    logger.info(f"Calling {function_name} via gRPC {target}")
+    logger.info(f"Arguments: {json.dumps(function_args, indent=2)}")
+
+    client = GRPCClient(target)
+    try:
+        result = client.call(function_name, function_args, timeout=args.timeout)
+        if isinstance(result, dict):
+            print(json.dumps(result, indent=2, default=str))
+        else:
+            for item in result:
+                print(json.dumps(item, default=str))
+        return 0
+    except grpc.RpcError as e:
+        logger.error(f"gRPC request error: {e.code().name}: {e.details()}")
         return 1
+    except (LookupError, ValueError) as e:
+        logger.error(f"gRPC request error: {e}")
+        return 1
+    finally:
+        client.close()
 
 
 def generate_client(args):
     """Generate client code for PIfunc services."""
+    if args.type == "proto":
+        return generate_proto(args)
     if args.language == "python":
         return generate_python_client(args)
     elif args.language in ["javascript", "typescript"]:
@@ -168,6 +202,48 @@ def generate_client(args):
         return 1
 
 
+def generate_proto(args):
+    """Write the .proto files of all gRPC services in a module, e.g. for client code generation."""
+    if not args.module:
+        logger.error("--module is required to generate proto files")
+        return 1
+
+    import pifunc
+    from pifunc.adapters.grpc_schema import SchemaBuilder, render_proto
+
+    try:
+        if args.module.endswith(".py") or os.path.exists(args.module):
+            pifunc.load_module_from_file(args.module)
+        else:
+            importlib.import_module(args.module)
+    except Exception as e:
+        logger.error(f"Could not load service definitions from {args.module}: {e}")
+        return 1
+
+    output_dir = args.output or "proto"
+    os.makedirs(output_dir, exist_ok=True)
+
+    # Shared dataclass messages are defined once and imported by the other files
+    builder = SchemaBuilder()
+    for service_name, metadata in pifunc._SERVICE_REGISTRY.items():
+        if "grpc" in metadata.get("protocols", []):
+            grpc_config = metadata.get("grpc", {})
+            builder.build(metadata["function"], service_name, grpc_config.get("streaming", False),
+                          grpc_config.get("service_name"), grpc_config.get("method"))
+    builder.finalize()
+
+    for file_proto in builder.files:
+        with open(os.path.join(output_dir, file_proto.name), "w") as f:
+            f.write(render_proto(file_proto))
+    written = len(builder.files)
+
+    if not written:
+        logger.warning(f"No gRPC services found in {args.module}")
+    else:
+        logger.info(f"Wrote {written} .proto files to {output_dir}")
+    return 0
+
+
 def generate_python_client(args):
     """Generate Python client code."""
     if not args.output:
@@ -657,6 +733,9 @@ def main():
             return serve_docs(args)
         else:  # generate
             return generate_docs(args)
+    elif args.command == "bench":
+        from pifunc.bench import main as bench_main
+        return bench_main(args)
     elif args.command == "version":
         print(f"PIfunc version: {get_version()}")
         return 0
@@ -0,0 +1,65 @@
+# pifunc/coalesce.py
+"""
+Łączenie identycznych, równoczesnych wywołań usługi (single-flight).
+
+Włączane przez `@service(coalesce=True)`. Gdy kilku klientów wywołuje
+usługę z tymi samymi argumentami w tym samym czasie, funkcja wykonywana
+jest raz, a pozostałe wywołania czekają na jej wynik lub wyjątek.
+Wywołania mogą pochodzić z różnych adapterów: wątki (gRPC, MQTT, Redis)
+czekają na `concurrent.futures.Future`, a pętle asyncio (HTTP, WebSocket)
+na ten sam obiekt opakowany przez `asyncio.wrap_future`.
+Strumieni (generatorów) nie współdzielimy: gdy wywołanie zwróci strumień,
+oczekujący wykonują funkcję samodzielnie.
+"""
+
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from pifunc.cache import arguments_key, signature_defaults
+
+
+class SingleFlight:
+    """Rejestr trwających wywołań usługi."""
+
+    def __init__(self, func: Callable):
+        self.defaults = signature_defaults(func)
+        self._calls: Dict[Tuple, Future] = {}
+        self._lock = threading.Lock()
+        self.coalesced = 0
+
+    def make_key(self, bound: Dict[str, Any]) -> Optional[Tuple]:
+        """Buduje klucz z argumentów; zwraca None, jeśli nie da się ich haszować."""
+        return arguments_key(self.defaults, bound)
+
+    def join(self, key: Tuple) -> Tuple[Future, bool]:
+        """
+        Dołącza do trwającego wywołania lub rozpoczyna nowe.
+
+        Zwraca przyszły wynik i flagę, czy wywołujący ma wykonać funkcję.
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                self.coalesced += 1
+                return future, False
+            future = Future()
+            future.set_running_or_notify_cancel()
+            self._calls[key] = future
+            return future, True
+
+    def finish(self, key: Tuple, future: Future, result: Any = None,
+               error: Optional[BaseException] = None) -> None:
+        """Kończy wywołanie i przekazuje wynik oczekującym."""
+        with self._lock:
+            if self._calls.get(key) is future:
+                del self._calls[key]
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def in_flight(self) -> int:
+        """Zwraca liczbę trwających wywołań."""
+        with self._lock:
+            return len(self._calls)
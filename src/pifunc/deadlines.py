@@ -0,0 +1,85 @@
+# pifunc/deadlines.py
+"""
+Limity czasu wywołań usług i ich propagacja między usługami.
+
+Budżet czasu wywołania to najmniejsza z wartości:
+
+- `@service(timeout=...)` - limit ustawiony przez autora usługi,
+- limit przesłany przez klienta: nagłówek `X-Pifunc-Timeout` (HTTP),
+  deadline gRPC, pole `timeout` koperty WebSocket lub `_timeout` w ZeroMQ,
+- czas pozostały z deadline'u wywołania, w ramach którego działamy.
+
+Po przekroczeniu budżetu korutyny są anulowane, a funkcje synchroniczne
+porzucane w puli wykonawców, i wywołujący dostaje `DeadlineExceeded`.
+W trakcie wykonania deadline jest dostępny przez `remaining()`, dzięki
+czemu `PiFuncClient` przekazuje pozostały czas dalej w wywołaniach
+wychodzących. Limity przesyłane są jako liczba sekund do końca, a nie
+czas bezwzględny, więc nie zależą od synchronizacji zegarów.
+
+Moduł nie importuje asyncio, aby mógł go używać lekki klient.
+"""
+
+import contextlib
+import contextvars
+import time
+from typing import Any, Iterator, Optional
+
+# Nagłówek HTTP z budżetem czasu w sekundach (np. "2.5")
+DEADLINE_HEADER = "X-Pifunc-Timeout"
+
+# Najdłuższy obsługiwany limit (30 dni); dłuższe wartości, jak "brak deadline'u"
+# w synchronicznym gRPC (~9.2e18 s), traktujemy jak brak limitu
+MAX_TIMEOUT = 30 * 24 * 3600.0
+
+# Bezwzględny deadline bieżącego wywołania według time.monotonic()
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("pifunc_deadline", default=None)
+
+
+class DeadlineExceeded(TimeoutError):
+    """Wywołanie usługi przekroczyło swój budżet czasu."""
+
+    def __init__(self, service: str, timeout: float):
+        super().__init__(f"Service {service} exceeded its deadline of {timeout:g}s")
+        self.service = service
+        self.timeout = timeout
+
+
+def remaining() -> Optional[float]:
+    """Zwraca liczbę sekund do deadline'u bieżącego wywołania lub None, gdy go nie ma."""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return max(0.0, deadline - time.monotonic())
+
+
+def effective_timeout(*timeouts: Optional[float]) -> Optional[float]:
+    """Najmniejszy z podanych limitów i czasu pozostałego z bieżącego deadline'u."""
+    budgets = [timeout for timeout in timeouts + (remaining(),)
+               if timeout is not None and timeout <= MAX_TIMEOUT]
+    return min(budgets) if budgets else None
+
+
+def parse_timeout(value: Any) -> Optional[float]:
+    """Odczytuje limit przesłany przez klienta; brakujące, nieprawidłowe i zbyt duże wartości daje jako None."""
+    if value is None or isinstance(value, bool):
+        return None
+    try:
+        timeout = float(value)
+    except (TypeError, ValueError):
+        return None
+    # NaN, wartości ujemne i dłuższe niż MAX_TIMEOUT traktujemy jak brak limitu
+    return timeout if 0 <= timeout <= MAX_TIMEOUT else None
+
+
+@contextlib.contextmanager
+def deadline(timeout: Optional[float]) -> Iterator[Optional[float]]:
+    """Ustawia deadline dla kodu w bloku (nie dłuższy niż już obowiązujący) i zwraca jego budżet."""
+    budget = effective_timeout(timeout)
+    if budget is None:
+        yield None
+        return
+    token = _deadline.set(time.monotonic() + budget)
+    try:
+        yield budget
+    finally:
+        _deadline.reset(token)
@@ -0,0 +1,314 @@
+# grpc_client.py
+"""
+gRPC transport for PiFuncClient.
+
+Methods are discovered through server reflection (enabled by default in
+`GRPCAdapter`), so no generated stubs are needed on the client side:
+
+    client = GRPCClient("localhost:50051")
+    client.call("add", {"a": 1, "b": 2})               # {"result": 3}
+    for item in client.call("count_from", {"start": 1}):
+        ...
+
+Each target keeps a small pool of long-lived channels, and the reflected
+descriptors, message classes and multi-callables are cached per method.
+"""
+
+import collections.abc
+import dataclasses
+import itertools
+import json
+import threading
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import grpc
+from google.protobuf import descriptor_pool, message_factory
+from grpc_reflection.v1alpha.proto_reflection_descriptor_database import ProtoReflectionDescriptorDatabase
+
+_REFLECTION_PREFIX = "grpc.reflection."
+
+# json_name suffix of fields that carry JSON text (see pifunc.adapters.grpc_schema)
+_JSON_TEXT_SUFFIX = "__json"
+
+
+def _message_class(descriptor):
+    """Create a message class for a descriptor (protobuf>=4.21 or the older API)."""
+    if hasattr(message_factory, "GetMessageClass"):
+        return message_factory.GetMessageClass(descriptor)
+    return message_factory.MessageFactory(descriptor.file.pool).GetPrototype(descriptor)
+
+
+def _is_repeated(field) -> bool:
+    if hasattr(field, "is_repeated"):
+        return field.is_repeated
+    return field.label == field.LABEL_REPEATED
+
+
+def _is_map(field) -> bool:
+    return field.message_type is not None and field.message_type.GetOptions().map_entry
+
+
+def _as_dict(value: Any) -> Dict[str, Any]:
+    if isinstance(value, dict):
+        return value
+    if dataclasses.is_dataclass(value):
+        return {f.name: getattr(value, f.name) for f in dataclasses.fields(value)}
+    return vars(value)
+
+
+def _is_json_text(field) -> bool:
+    return field.type == field.TYPE_STRING and field.json_name.endswith(_JSON_TEXT_SUFFIX)
+
+
+def _scalar(field, value: Any) -> Any:
+    # Values without a protobuf type travel as JSON text, as in GRPCAdapter
+    if _is_json_text(field) or (field.type == field.TYPE_STRING and not isinstance(value, str)):
+        return json.dumps(value, default=str)
+    return value
+
+
+def _python_value(field, value: Any) -> Any:
+    if _is_json_text(field):
+        try:
+            return json.loads(value)
+        except ValueError:
+            return value
+    return value
+
+
+def fill_message(message, values: Dict[str, Any]):
+    """Fill a protobuf message from a dict of Python values (dataclasses, lists, dicts)."""
+    fields = message.DESCRIPTOR.fields_by_name
+    for name, value in _as_dict(values).items():
+        field = fields.get(name)
+        if field is None:
+            raise ValueError(f"Unknown argument for {message.DESCRIPTOR.name}: {name}")
+        if value is None:
+            continue
+
+        if _is_map(field):
+            value_field = field.message_type.fields_by_name["value"]
+            target = getattr(message, name)
+            for key, item in dict(value).items():
+                if value_field.message_type is not None:
+                    fill_message(target[key], item)
+                else:
+                    target[key] = _scalar(value_field, item)
+        elif _is_repeated(field):
+            target = getattr(message, name)
+            for item in value:
+                if field.message_type is not None:
+                    fill_message(target.add(), item)
+                else:
+                    target.append(_scalar(field, item))
+        elif field.message_type is not None:
+            fill_message(getattr(message, name), value)
+        else:
+            setattr(message, name, _scalar(field, value))
+    return message
+
+
+def message_to_dict(message) -> Dict[str, Any]:
+    """Convert a protobuf message to a dict, keeping int64 as int and skipping unset optional fields."""
+    result = {}
+    for field in message.DESCRIPTOR.fields:
+        if field.has_presence and not message.HasField(field.name):
+            continue
+        value = getattr(message, field.name)
+        if _is_map(field):
+            value_field = field.message_type.fields_by_name["value"]
+            nested = value_field.message_type is not None
+            result[field.name] = {key: message_to_dict(item) if nested else _python_value(value_field, item)
+                                  for key, item in value.items()}
+        elif _is_repeated(field):
+            result[field.name] = [message_to_dict(item) if field.message_type is not None
+                                  else _python_value(field, item) for item in value]
+        elif field.message_type is not None:
+            result[field.name] = message_to_dict(value)
+        else:
+            result[field.name] = _python_value(field, value)
+    return result
+
+
+class ChannelPool:
+    """Round-robin pool of long-lived channels per target."""
+
+    def __init__(self, size: int = 1, options: Optional[List[Tuple[str, Any]]] = None):
+        self.size = max(1, size)
+        self.options = list(options or [])
+        self._channels: Dict[str, List[grpc.Channel]] = {}
+        self._counters: Dict[str, Iterator[int]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, target: str) -> Tuple[int, grpc.Channel]:
+        """Return (index, channel) of the next channel for the target."""
+        channels = self._channels.get(target)
+        if channels is None:
+            with self._lock:
+                channels = self._channels.get(target)
+                if channels is None:
+                    # A local subchannel pool gives every channel its own connection
+                    options = self.options + [("grpc.use_local_subchannel_pool", 1)] if self.size > 1 else self.options
+                    channels = [grpc.insecure_channel(target, options=options) for _ in range(self.size)]
+                    self._counters[target] = itertools.cycle(range(self.size))
+                    self._channels[target] = channels
+        index = next(self._counters[target])
+        return index, channels[index]
+
+    def close(self) -> None:
+        with self._lock:
+            channels, self._channels = self._channels, {}
+            self._counters = {}
+        for target_channels in channels.values():
+            for channel in target_channels:
+                channel.close()
+
+
+class _Method:
+    """Reflected method: path, message classes, call kind and cached multi-callables."""
+
+    __slots__ = ("path", "request_class", "response_class", "client_streaming", "server_streaming", "callables")
+
+    def __init__(self, service_name: str, method):
+        self.path = f"/{service_name}/{method.name}"
+        self.request_class = _message_class(method.input_type)
+        self.response_class = _message_class(method.output_type)
+        self.client_streaming = method.client_streaming
+        self.server_streaming = method.server_streaming
+        self.callables: Dict[int, Any] = {}
+
+    def callable_for(self, index: int, channel: grpc.Channel):
+        stub = self.callables.get(index)
+        if stub is None:
+            if self.client_streaming and self.server_streaming:
+                create = channel.stream_stream
+            elif self.client_streaming:
+                create = channel.stream_unary
+            elif self.server_streaming:
+                create = channel.unary_stream
+            else:
+                create = channel.unary_unary
+            stub = create(self.path, request_serializer=self.request_class.SerializeToString,
+                          response_deserializer=self.response_class.FromString)
+            self.callables[index] = stub
+        return stub
+
+
+class GRPCClient:
+    """Calls pifunc gRPC services by function name, using server reflection."""
+
+    def __init__(self, target: str = "localhost:50051", pool_size: int = 1,
+                 options: Optional[List[Tuple[str, Any]]] = None):
+        self.target = target
+        self.channels = ChannelPool(pool_size, options)
+        # target -> {method name or "Service/Method": [(service name, method descriptor)]}
+        self._indexes: Dict[str, Dict[str, List[Tuple[str, Any]]]] = {}
+        self._methods: Dict[Tuple[str, str, Optional[str]], _Method] = {}
+        self._lock = threading.Lock()
+
+    def _discover(self, target: str) -> Dict[str, List[Tuple[str, Any]]]:
+        """Read the service descriptors of a target through reflection."""
+        _, channel = self.channels.get(target)
+        database = ProtoReflectionDescriptorDatabase(channel)
+        pool = descriptor_pool.DescriptorPool(database)
+
+        index: Dict[str, List[Tuple[str, Any]]] = {}
+        for service_name in database.get_services():
+            if service_name.startswith(_REFLECTION_PREFIX):
+                continue
+            service = pool.FindServiceByName(service_name)
+            for method in service.methods:
+                index.setdefault(method.name, []).append((service_name, method))
+                index[f"{service_name}/{method.name}"] = [(service_name, method)]
+        return index
+
+    def method(self, name: str, target: Optional[str] = None, service: Optional[str] = None) -> _Method:
+        """
+        Find a method by pifunc service name (e.g. "add"), gRPC method name
+        ("Add") or full name ("pifunc.MathService/Add").
+        """
+        target = target or self.target
+        key = (target, name, service)
+        method = self._methods.get(key)
+        if method is not None:
+            return method
+
+        with self._lock:
+            method = self._methods.get(key)
+            if method is None:
+                method = self._methods[key] = self._lookup(target, name, service)
+        return method
+
+    def _lookup(self, target: str, name: str, service: Optional[str]) -> _Method:
+        candidates = None
+        for refresh in (False, True):
+            # Services registered after the first lookup appear after a refresh
+            if refresh or target not in self._indexes:
+                self._indexes[target] = self._discover(target)
+            index = self._indexes[target]
+            candidates = index.get(name) or index.get(name.capitalize())
+            if candidates and service:
+                candidates = [c for c in candidates if c[0] in (service, f"pifunc.{service}")]
+            if candidates:
+                break
+
+        if not candidates:
+            raise LookupError(f"gRPC method {name} not found on {target}")
+        if len(candidates) > 1:
+            services = ", ".join(service_name for service_name, _ in candidates)
+            raise LookupError(f"gRPC method {name} is ambiguous on {target} ({services}); pass grpc_service")
+        return _Method(*candidates[0])
+
+    def call(self, name: str, args: Any = None, target: Optional[str] = None, service: Optional[str] = None,
+             timeout: Optional[float] = None, metadata: Optional[Iterable[Tuple[str, str]]] = None):
+        """
+        Call a method and return {"result": ...}, or an iterator of such dicts
+        for server-streaming methods.
+
+        For client-streaming methods, pass an iterator of argument dicts, or a
+        dict where the streamed parameter is an iterator of its elements.
+        """
+        method = self.method(name, target, service)
+        index, channel = self.channels.get(target or self.target)
+        stub = method.callable_for(index, channel)
+
+        if method.client_streaming:
+            request = (fill_message(method.request_class(), values) for values in _stream_arguments(args))
+        else:
+            request = fill_message(method.request_class(), args or {})
+
+        response = stub(request, timeout=timeout, metadata=metadata)
+        if method.server_streaming:
+            return (message_to_dict(item) for item in response)
+        return message_to_dict(response)
+
+    def close(self) -> None:
+        self.channels.close()
+
+
+def _stream_arguments(args: Any) -> Iterator[Dict[str, Any]]:
+    """Turn call arguments into the argument dicts of consecutive stream messages."""
+    if args is None:
+        return iter(())
+    if not isinstance(args, dict):
+        return iter(args)
+
+    stream_names = [name for name, value in args.items() if isinstance(value, collections.abc.Iterator)]
+    if not stream_names:
+        return iter((args,))
+    if len(stream_names) > 1:
+        raise ValueError(f"Only one streamed argument is supported, got {stream_names}")
+
+    # The other arguments travel in the first message, as GRPCAdapter expects
+    name = stream_names[0]
+    others = {key: value for key, value in args.items() if key != name}
+
+    def messages():
+        first = True
+        for item in args[name]:
+            yield {**others, name: item} if first else {name: item}
+            first = False
+        if first:
+            yield others
+
+    return messages()
@@ -0,0 +1,430 @@
+# pifunc/invoker.py
+"""
+Wspólna ścieżka wywołania usług dla wszystkich adapterów protokołów.
+
+`ServiceInvoker` jest budowany raz, przy rejestracji usługi w `service()`,
+i przechowuje wszystko, czego adapter potrzebuje do wywołania funkcji:
+listę parametrów, przygotowane wcześniej funkcje konwersji typów oraz
+flagi takie jak "czy funkcja jest korutyną". Dzięki temu adaptery nie
+analizują sygnatury funkcji przy każdym żądaniu.
+"""
+
+import asyncio
+import collections.abc
+import concurrent.futures
+import contextvars
+import dataclasses
+import functools
+import inspect
+import threading
+import time
+import typing
+import weakref
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from pifunc.cache import MISSING, ResultCache
+from pifunc.coalesce import SingleFlight
+from pifunc.deadlines import DeadlineExceeded, deadline, effective_timeout
+from pifunc.limits import ConcurrencyLimiter, ServiceOverloaded
+from pifunc.runtime import ServiceExecutors, get_background_loop
+
+
+# Pula dla funkcji synchronicznych z limitem czasu wywoływanych przez adaptery bez własnej
+# puli (gRPC, MQTT, Redis, ZeroMQ, WebSocket, CRON). Porzucona funkcja zajmuje wątek aż do swojego
+# końca, więc pula ma stały rozmiar, a gdy wszystkie wątki są zajęte, nowe wywołania
+# są odrzucane wyjątkiem ServiceOverloaded zamiast czekać w kolejce puli
+DEADLINE_WORKERS = 32
+_DEADLINE_EXECUTORS = ServiceExecutors(max_workers=DEADLINE_WORKERS, name="pifunc-deadline")
+_deadline_slots = threading.BoundedSemaphore(DEADLINE_WORKERS)
+
+
+class ArgumentError(ValueError):
+    """Błąd konwersji argumentów przekazanych do usługi."""
+
+    def __init__(self, param: Optional[str], message: str):
+        super().__init__(message)
+        self.param = param
+
+
+def _make_converter(annotation: Any) -> Optional[Callable[[Any], Any]]:
+    """Zwraca funkcję konwertującą wartość na typ parametru lub None."""
+    if annotation is inspect.Parameter.empty or annotation is Any:
+        return None
+
+    # Słowniki i obiekty przekazujemy bez zmian
+    if annotation in (dict, object):
+        return None
+
+    # Typy generyczne (List[int], Optional[str], ...) nie są wywoływalne
+    if typing.get_origin(annotation) is not None:
+        return None
+
+    if dataclasses.is_dataclass(annotation):
+        def convert_dataclass(value, _cls=annotation):
+            if isinstance(value, dict):
+                return _cls(**value)
+            return value
+
+        return convert_dataclass
+
+    if isinstance(annotation, type):
+        def convert(value, _type=annotation):
+            if type(value) is _type:
+                return value
+            return _type(value)
+
+        return convert
+
+    return None
+
+
+# Wynik połączonego wywołania, po którym każdy oczekujący wykonuje funkcję sam:
+# strumień może odczytać tylko jeden wywołujący
+_RUN_AGAIN = object()
+
+
+def _is_stream(result: Any) -> bool:
+    return isinstance(result, collections.abc.Iterator) or hasattr(result, "__aiter__")
+
+
+def _release_after(iterator, release: Callable[[], None]):
+    try:
+        yield from iterator
+    finally:
+        release()
+
+
+async def _arelease_after(iterator, release: Callable[[], None]):
+    try:
+        async for item in iterator:
+            yield item
+    finally:
+        try:
+            if hasattr(iterator, "aclose"):
+                await iterator.aclose()
+        finally:
+            release()
+
+
+def _hold_slot(stream: Any, limiter: ConcurrencyLimiter) -> Any:
+    """
+    Zwraca strumień, który zwalnia miejsce w limicie współbieżności po swoim zakończeniu.
+
+    Miejsce wraca do limitu po wyczerpaniu strumienia, błędzie, zamknięciu
+    (np. po rozłączeniu klienta) albo usunięciu nieuruchomionego strumienia.
+    """
+    if hasattr(stream, "__aiter__"):
+        wrapper = _arelease_after(stream.__aiter__(), lambda: release())
+    else:
+        wrapper = _release_after(stream, lambda: release())
+    # Obiekt finalize wywołuje release najwyżej raz
+    release = weakref.finalize(wrapper, limiter.release)
+    return wrapper
+
+
+class ServiceInvoker:
+    """Prekompilowany wywoływacz funkcji usługi."""
+
+    __slots__ = ("func", "name", "parameters", "accepts_kwargs", "is_coroutine", "executor", "cache",
+                 "flights", "limiter", "timeout")
+
+    def __init__(self, func: Callable, metadata: Optional[Dict[str, Any]] = None):
+        metadata = metadata or {}
+        self.func = func
+        self.name = metadata.get("name", getattr(func, "__name__", "service"))
+        self.executor = metadata.get("executor")
+        self.is_coroutine = inspect.iscoroutinefunction(inspect.unwrap(func))
+        self.cache = ResultCache.from_config(func, metadata.get("cache"))
+        self.flights = SingleFlight(func) if metadata.get("coalesce") else None
+        self.limiter = ConcurrencyLimiter.from_metadata(self.name, metadata)
+        self.timeout = metadata.get("timeout")
+
+        signature = inspect.signature(func)
+        try:
+            type_hints = typing.get_type_hints(func)
+        except Exception:
+            type_hints = {}
+
+        parameters = []
+        accepts_kwargs = False
+        for param_name, param in signature.parameters.items():
+            if param.kind == inspect.Parameter.VAR_KEYWORD:
+                accepts_kwargs = True
+                continue
+            if param.kind == inspect.Parameter.VAR_POSITIONAL:
+                continue
+            annotation = type_hints.get(param_name, param.annotation)
+            parameters.append((param_name, _make_converter(annotation)))
+
+        self.parameters: Tuple[Tuple[str, Optional[Callable]], ...] = tuple(parameters)
+        self.accepts_kwargs = accepts_kwargs
+
+    def bind(self, kwargs: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """Filtruje i konwertuje argumenty zgodnie z sygnaturą funkcji."""
+        if not kwargs:
+            return {}
+        if not isinstance(kwargs, dict):
+            raise ArgumentError(None, f"Expected an object with arguments, got {type(kwargs).__name__}")
+
+        converted = {}
+        for param_name, converter in self.parameters:
+            if param_name not in kwargs:
+                continue
+            value = kwargs[param_name]
+            if converter is not None and value is not None:
+                try:
+                    value = converter(value)
+                except (ValueError, TypeError) as e:
+                    raise ArgumentError(param_name, f"Invalid type for parameter {param_name}: {e}") from e
+            converted[param_name] = value
+
+        # Funkcje z **kwargs dostają również pozostałe argumenty
+        if self.accepts_kwargs:
+            for key, value in kwargs.items():
+                if key not in converted:
+                    converted[key] = value
+
+        return converted
+
+    def call(self, kwargs: Optional[Dict[str, Any]]) -> Any:
+        """
+        Wywołuje funkcję; dla korutyn zwraca nieuruchomioną korutynę.
+
+        Wywołanie czeka synchronicznie na miejsce w limicie współbieżności
+        i na wynik połączonego wywołania, więc adaptery działające w pętli
+        asyncio muszą korzystać z `call_async`.
+        """
+        if self.is_coroutine and (self.cache is not None or self.flights is not None
+                                  or self.limiter is not None):
+            # Pamięć podręczna, łączenie wywołań i limit działają dopiero po uruchomieniu
+            # korutyny, więc korutyna porzucona bez wykonania niczego nie zajmuje
+            return self.call_async(kwargs)
+
+        bound = self.bind(kwargs)
+        if self.cache is None and self.flights is None and self.limiter is None:
+            return self.func(**bound)
+
+        cache_key = self.cache.make_key(bound) if self.cache is not None else None
+        if cache_key is not None:
+            result = self.cache.get(cache_key)
+            if result is not MISSING:
+                return result
+
+        flight_key = self.flights.make_key(bound) if self.flights is not None else None
+        future = None
+        if flight_key is not None:
+            future, leader = self.flights.join(flight_key)
+            if not leader:
+                result = future.result()
+                if result is not _RUN_AGAIN:
+                    return result
+                # Wywołujący dostaje własny strumień, poza łączeniem wywołań
+                future = None
+
+        limiter = self.limiter
+        try:
+            # Limit współbieżności dotyczy tylko faktycznych wykonań funkcji
+            if limiter is not None:
+                limiter.acquire()
+            try:
+                result = self.func(**bound)
+            except BaseException:
+                if limiter is not None:
+                    limiter.release()
+                raise
+        except BaseException as e:
+            if future is not None:
+                self.flights.finish(flight_key, future, error=e)
+            raise
+
+        if inspect.iscoroutine(result):
+            # Miejsce zwalniane jest dopiero po zakończeniu korutyny
+            return self._finish_coroutine(result, cache_key, flight_key, future, limiter)
+        if limiter is not None:
+            if _is_stream(result):
+                # Strumień zajmuje miejsce, dopóki nie zostanie wyczerpany lub zamknięty
+                result = _hold_slot(result, limiter)
+            else:
+                limiter.release()
+        self._finish(result, cache_key, flight_key, future)
+        return result
+
+    def _finish(self, result: Any, cache_key, flight_key, future) -> None:
+        """Zapamiętuje wynik i przekazuje go połączonym wywołaniom."""
+        # Strumienia można użyć tylko raz, więc nie trafia do pamięci podręcznej
+        if cache_key is not None and not _is_stream(result):
+            self.cache.set(cache_key, result)
+        if future is not None:
+            self.flights.finish(flight_key, future, _RUN_AGAIN if _is_stream(result) else result)
+
+    async def _finish_coroutine(self, coro, cache_key, flight_key, future,
+                                limiter: Optional[ConcurrencyLimiter] = None) -> Any:
+        """Czeka na korutynę i kończy wywołanie jak `_finish`."""
+        try:
+            result = await coro
+        except BaseException as e:
+            if future is not None:
+                self.flights.finish(flight_key, future, error=e)
+            raise
+        finally:
+            if limiter is not None:
+                limiter.release()
+        self._finish(result, cache_key, flight_key, future)
+        return result
+
+    def call_sync(self, kwargs: Optional[Dict[str, Any]], timeout: Optional[float] = None) -> Any:
+        """
+        Wywołuje funkcję z wątku adaptera i zwraca gotowy wynik.
+
+        Korutyny są wykonywane we współdzielonej pętli działającej w tle.
+        `timeout` to limit czasu przesłany przez klienta (w sekundach).
+        """
+        budget = effective_timeout(self.timeout, timeout)
+        if budget is not None:
+            # Wywołanie z limitem czasu nadzoruje pętla w tle, więc wątek adaptera
+            # wraca po upływie limitu nawet wtedy, gdy funkcja synchroniczna wciąż działa
+            return get_background_loop().run(self.call_async(kwargs, timeout=budget))
+
+        result = self.call(kwargs)
+        if inspect.iscoroutine(result):
+            result = get_background_loop().run(result)
+        return result
+
+    async def call_async(self, kwargs: Optional[Dict[str, Any]],
+                         executors: Optional[ServiceExecutors] = None,
+                         timeout: Optional[float] = None) -> Any:
+        """
+        Wywołuje funkcję z pętli asyncio adaptera.
+
+        Funkcje synchroniczne trafiają do puli wykonawców adaptera (jeśli
+        została podana), zgodnie z trybem `executor` usługi. Po przekroczeniu
+        limitu czasu (`@service(timeout=...)` lub `timeout` klienta) korutyna
+        jest anulowana, a funkcja synchroniczna porzucana w puli.
+        """
+        bound = self.bind(kwargs)
+        budget = effective_timeout(self.timeout, timeout)
+
+        cache_key = self.cache.make_key(bound) if self.cache is not None else None
+        if cache_key is not None:
+            result = self.cache.get(cache_key)
+            if result is not MISSING:
+                return result
+
+        flight_key = self.flights.make_key(bound) if self.flights is not None else None
+        future = None
+        if flight_key is not None:
+            future, leader = self.flights.join(flight_key)
+            if not leader:
+                if budget is None:
+                    result = await asyncio.wrap_future(future)
+                else:
+                    # Rezygnacja z czekania nie może anulować wywołania współdzielonego z innymi
+                    result = await self._within(asyncio.shield(asyncio.wrap_future(future)), budget)
+                if result is not _RUN_AGAIN:
+                    return result
+                # Wywołujący dostaje własny strumień, poza łączeniem wywołań
+                future = None
+
+        try:
+            if budget is None:
+                result = await self._execute(bound, executors)
+            else:
+                with deadline(budget):
+                    result = await self._within(self._execute(bound, executors, offload=True), budget)
+        except BaseException as e:
+            if future is not None:
+                self.flights.finish(flight_key, future, error=e)
+            raise
+
+        self._finish(result, cache_key, flight_key, future)
+        return result
+
+    async def _within(self, awaitable, budget: float) -> Any:
+        """Czeka na wynik najwyżej `budget` sekund; po tym czasie anuluje oczekiwanie."""
+        if budget <= 0:
+            if inspect.iscoroutine(awaitable):
+                awaitable.close()
+            else:
+                asyncio.ensure_future(awaitable).cancel()
+            raise DeadlineExceeded(self.name, budget)
+
+        expires = time.monotonic() + budget
+        try:
+            return await asyncio.wait_for(awaitable, budget)
+        except asyncio.TimeoutError:
+            if time.monotonic() < expires:
+                # Limit czasu samej usługi (np. jej własnego połączenia), nie nasz
+                raise
+            raise DeadlineExceeded(self.name, budget) from None
+
+    async def _execute(self, bound: Dict[str, Any], executors: Optional[ServiceExecutors],
+                       offload: bool = False) -> Any:
+        """
+        Wykonuje funkcję w ramach limitu współbieżności.
+
+        Przy `offload` funkcje synchroniczne wywoływane bez puli adaptera trafiają
+        do osobnej puli, aby można je było porzucić po upływie limitu czasu.
+        """
+        acquired = False
+        try:
+            if self.limiter is not None:
+                await self.limiter.acquire_async()
+                acquired = True
+
+            if self.is_coroutine:
+                result = await self.func(**bound)
+            else:
+                shared = executors is None and offload
+                if executors is not None:
+                    executor = executors.get(self.executor)
+                else:
+                    executor = _DEADLINE_EXECUTORS.get("thread") if offload else None
+
+                if executor is None:
+                    result = self.func(**bound)
+                else:
+                    call = functools.partial(self.func, **bound)
+                    if offload and not isinstance(executor, concurrent.futures.ProcessPoolExecutor):
+                        # Wątek puli widzi deadline wywołania (np. w wywołaniach PiFuncClient)
+                        call = functools.partial(contextvars.copy_context().run, call)
+                    if shared:
+                        # Wspólna pula jest pełna porzuconych lub trwających wywołań
+                        if not _deadline_slots.acquire(blocking=False):
+                            raise ServiceOverloaded(self.name)
+                        try:
+                            pending = executor.submit(call)
+                        except BaseException:
+                            _deadline_slots.release()
+                            raise
+                        pending.add_done_callback(lambda _: _deadline_slots.release())
+                    else:
+                        pending = executor.submit(call)
+                    try:
+                        result = await asyncio.wrap_future(pending)
+                    except asyncio.CancelledError:
+                        if acquired and not pending.done():
+                            # Porzucona funkcja wciąż działa w puli; miejsce zwalniamy dopiero po jej końcu
+                            pending.add_done_callback(lambda _: self.limiter.release())
+                            acquired = False
+                        raise
+
+                if inspect.iscoroutine(result):
+                    result = await result
+            if acquired and _is_stream(result):
+                # Strumień zajmuje miejsce, dopóki nie zostanie wyczerpany lub zamknięty
+                result = _hold_slot(result, self.limiter)
+                acquired = False
+            return result
+        finally:
+            if acquired:
+                self.limiter.release()
+
+
+def get_invoker(func: Callable, metadata: Optional[Dict[str, Any]] = None) -> ServiceInvoker:
+    """Zwraca wywoływacz zapisany w metadanych usługi lub tworzy nowy."""
+    invoker = metadata.get("invoker") if metadata else None
+    if invoker is None or invoker.func is not func:
+        invoker = ServiceInvoker(func, metadata)
+        if metadata is not None:
+            metadata["invoker"] = invoker
+    return invoker
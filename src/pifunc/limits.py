@@ -0,0 +1,144 @@
+# pifunc/limits.py
+"""
+Limity współbieżności usług i odrzucanie nadmiarowych wywołań.
+
+Włączane przez `@service(max_concurrency=N, max_queue=M)`. Funkcja
+wykonywana jest jednocześnie najwyżej N razy, kolejne wywołania czekają
+w kolejce FIFO o długości najwyżej M, a pozostałe są od razu odrzucane
+wyjątkiem `ServiceOverloaded`. Adaptery zamieniają go na błąd właściwy
+dla protokołu (HTTP 503 z Retry-After, gRPC RESOURCE_EXHAUSTED, komunikat
+błędu w MQTT/WebSocket/ZeroMQ), dzięki czemu przy skokach ruchu opóźnienie
+pozostaje ograniczone, a nadmiar nie gromadzi się w pętli ani w pulach wątków.
+
+Limit jest wspólny dla wszystkich protokołów. Wątki (gRPC, MQTT, Redis)
+czekają na `threading.Event`, a pętle asyncio (HTTP, WebSocket) na
+`asyncio.Future` budzoną przez `call_soon_threadsafe`. Trafienia pamięci
+podręcznej i wywołania dołączone do trwającego (coalesce) nie zajmują miejsca.
+Strumienie (generatory) zajmują miejsce do czasu ich wyczerpania lub zamknięcia.
+"""
+
+import asyncio
+import threading
+from collections import deque
+from typing import Any, Dict, Optional
+
+
+class ServiceOverloaded(RuntimeError):
+    """Usługa osiągnęła limit współbieżności i pełną kolejkę."""
+
+    def __init__(self, service: str, retry_after: int = 1):
+        super().__init__(f"Service {service} is overloaded, retry after {retry_after}s")
+        self.service = service
+        self.retry_after = retry_after
+
+
+class _ThreadWaiter:
+    __slots__ = ("event",)
+
+    def __init__(self):
+        self.event = threading.Event()
+
+    def grant(self, limiter: "ConcurrencyLimiter") -> None:
+        self.event.set()
+
+
+class _AsyncWaiter:
+    __slots__ = ("loop", "future")
+
+    def __init__(self):
+        self.loop = asyncio.get_running_loop()
+        self.future = self.loop.create_future()
+
+    def grant(self, limiter: "ConcurrencyLimiter") -> None:
+        def wake():
+            if self.future.done():
+                # Oczekujący zrezygnował (np. klient się rozłączył); oddajemy miejsce następnemu
+                limiter.release()
+            else:
+                self.future.set_result(None)
+
+        try:
+            self.loop.call_soon_threadsafe(wake)
+        except RuntimeError:
+            # Pętla oczekującego została już zamknięta
+            limiter.release()
+
+
+class ConcurrencyLimiter:
+    """Semafor usługi z ograniczoną kolejką, wspólny dla wątków i pętli asyncio."""
+
+    def __init__(self, name: str, max_concurrency: int, max_queue: int = 0, retry_after: int = 1):
+        if max_concurrency < 1:
+            raise ValueError(f"max_concurrency must be at least 1, got {max_concurrency}")
+        if max_queue < 0:
+            raise ValueError(f"max_queue must not be negative, got {max_queue}")
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.retry_after = retry_after
+
+        self._waiters: deque = deque()
+        self._lock = threading.Lock()
+        self.active = 0
+        self.rejected = 0
+
+    @classmethod
+    def from_metadata(cls, name: str, metadata: Dict[str, Any]) -> Optional["ConcurrencyLimiter"]:
+        """Tworzy limit z opcji `max_concurrency`/`max_queue` dekoratora @service."""
+        max_concurrency = metadata.get("max_concurrency")
+        if max_concurrency is None:
+            if metadata.get("max_queue"):
+                raise ValueError("max_queue requires max_concurrency")
+            return None
+        return cls(name, int(max_concurrency), int(metadata.get("max_queue") or 0))
+
+    def _enter(self, waiter_class) -> Optional[Any]:
+        """Zajmuje miejsce albo dopisuje oczekującego do kolejki; przy pełnej kolejce odrzuca."""
+        with self._lock:
+            if self.active < self.max_concurrency and not self._waiters:
+                self.active += 1
+                return None
+            if len(self._waiters) >= self.max_queue:
+                self.rejected += 1
+                raise ServiceOverloaded(self.name, self.retry_after)
+            waiter = waiter_class()
+            self._waiters.append(waiter)
+            return waiter
+
+    def acquire(self) -> None:
+        """Zajmuje miejsce, blokując wątek do czasu zwolnienia miejsca w kolejce."""
+        waiter = self._enter(_ThreadWaiter)
+        if waiter is not None:
+            waiter.event.wait()
+
+    async def acquire_async(self) -> None:
+        """Zajmuje miejsce, czekając w pętli asyncio."""
+        waiter = self._enter(_AsyncWaiter)
+        if waiter is None:
+            return
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            with self._lock:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                    raise
+            # Miejsce zostało już przekazane; jeśli dotarło przed anulowaniem, zwalniamy je tutaj,
+            # w przeciwnym razie zwolni je `grant` po zauważeniu anulowania
+            if waiter.future.done() and not waiter.future.cancelled():
+                self.release()
+            raise
+
+    def release(self) -> None:
+        """Zwalnia miejsce; pierwszy oczekujący z kolejki przejmuje je bezpośrednio."""
+        with self._lock:
+            if not self._waiters:
+                self.active -= 1
+                return
+            waiter = self._waiters.popleft()
+        waiter.grant(self)
+
+    def stats(self) -> Dict[str, int]:
+        """Zwraca liczbę wykonywanych i oczekujących wywołań oraz odrzuceń."""
+        with self._lock:
+            return {"active": self.active, "queued": len(self._waiters), "rejected": self.rejected}
@@ -0,0 +1,254 @@
+# pifunc/metrics.py
+"""
+Metryki usług raportowane przez wszystkie adaptery protokołów.
+
+Każdy adapter zgłasza żądanie przez `track(service, protocol)`:
+
+    with track(invoker.name, "mqtt") as request:
+        payload = codec.decode(msg.payload)
+        request.mark("decode")
+        result = invoker.call_sync(payload)
+        request.mark("execute")
+        response = codec.encode({"result": result})
+        request.mark("encode")
+
+Rejestr zbiera liczniki żądań i błędów, liczbę trwających żądań oraz
+histogramy czasów faz (decode/execute/encode) z etykietami `service`
+i `protocol`. `render_prometheus()` zwraca je w formacie tekstowym
+Prometheusa; adapter HTTP udostępnia go pod ścieżką `/metrics`.
+"""
+
+import bisect
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# Domyślne przedziały histogramu (w sekundach), jak w klientach Prometheusa
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class _Histogram:
+    """Histogram z ustalonymi przedziałami."""
+
+    __slots__ = ("counts", "total", "count")
+
+    def __init__(self, size: int):
+        self.counts = [0] * size
+        self.total = 0.0
+        self.count = 0
+
+
+class RequestTimer:
+    """Pomiar pojedynczego żądania; używany jako menedżer kontekstu."""
+
+    __slots__ = ("registry", "labels", "last", "failed")
+
+    def __init__(self, registry: "MetricsRegistry", labels: Tuple[str, str],
+                 started: Optional[float] = None):
+        self.registry = registry
+        self.labels = labels
+        self.last = started
+        self.failed = False
+
+    def start(self) -> "RequestTimer":
+        """Rozpoczyna pomiar (zwiększa licznik żądań i trwających żądań)."""
+        self.registry._begin(self.labels)
+        if self.last is None:
+            self.last = time.perf_counter()
+        return self
+
+    def finish(self, failed: bool = False) -> None:
+        """Kończy pomiar."""
+        self.registry._end(self.labels, self.failed or failed)
+
+    __enter__ = start
+
+    def mark(self, phase: str) -> None:
+        """Zapisuje czas fazy, która właśnie się zakończyła."""
+        now = time.perf_counter()
+        self.registry.observe(self.labels, phase, now - self.last)
+        self.last = now
+
+    def fail(self) -> None:
+        """Oznacza żądanie jako zakończone błędem."""
+        self.failed = True
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        self.finish(exc_type is not None)
+        return False
+
+
+class MetricsRegistry:
+    """Rejestr metryk usług."""
+
+    def __init__(self, buckets: Iterable[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._requests: Dict[Tuple[str, str], int] = {}
+        self._errors: Dict[Tuple[str, str], int] = {}
+        self._in_flight: Dict[Tuple[str, str], int] = {}
+        self._durations: Dict[Tuple[str, str, str], _Histogram] = {}
+        self._collectors: List[Callable[[], Iterable[str]]] = []
+
+    def track(self, service: str, protocol: str, started: Optional[float] = None) -> RequestTimer:
+        """
+        Zwraca pomiar żądania usługi `service` przez protokół `protocol`.
+
+        `started` (wynik `time.perf_counter()`) pozwala liczyć pierwszą fazę
+        od chwili sprzed rozpoczęcia pomiaru, np. gdy usługa jest znana
+        dopiero po zdekodowaniu wiadomości.
+        """
+        return RequestTimer(self, (service, protocol), started)
+
+    def _begin(self, labels: Tuple[str, str]) -> None:
+        with self._lock:
+            self._requests[labels] = self._requests.get(labels, 0) + 1
+            self._in_flight[labels] = self._in_flight.get(labels, 0) + 1
+
+    def _end(self, labels: Tuple[str, str], failed: bool) -> None:
+        with self._lock:
+            self._in_flight[labels] = max(self._in_flight.get(labels, 0) - 1, 0)
+            if failed:
+                self._errors[labels] = self._errors.get(labels, 0) + 1
+
+    def observe(self, labels: Tuple[str, str], phase: str, seconds: float) -> None:
+        """Dodaje czas fazy do histogramu."""
+        key = labels + (phase,)
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            histogram = self._durations.get(key)
+            if histogram is None:
+                histogram = self._durations[key] = _Histogram(len(self.buckets) + 1)
+            histogram.counts[index] += 1
+            histogram.total += seconds
+            histogram.count += 1
+
+    def add_collector(self, collector: Callable[[], Iterable[str]]) -> None:
+        """Dodaje funkcję zwracającą dodatkowe linie w formacie Prometheusa."""
+        self._collectors.append(collector)
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """Zwraca kopię liczników (np. do testów lub logowania)."""
+        with self._lock:
+            return {
+                "requests": dict(self._requests),
+                "errors": dict(self._errors),
+                "in_flight": dict(self._in_flight),
+                "durations": {key: (h.count, h.total) for key, h in self._durations.items()},
+            }
+
+    def reset(self) -> None:
+        """Zeruje wszystkie metryki."""
+        with self._lock:
+            self._requests.clear()
+            self._errors.clear()
+            self._in_flight.clear()
+            self._durations.clear()
+
+    def render_prometheus(self) -> str:
+        """Zwraca metryki w formacie tekstowym Prometheusa."""
+        with self._lock:
+            requests = sorted(self._requests.items())
+            errors = sorted(self._errors.items())
+            in_flight = sorted(self._in_flight.items())
+            durations = sorted(
+                (key, list(h.counts), h.total, h.count) for key, h in self._durations.items()
+            )
+
+        lines = [
+            "# HELP pifunc_requests_total Requests handled per service and protocol.",
+            "# TYPE pifunc_requests_total counter",
+        ]
+        lines += [f"pifunc_requests_total{_labels(s, p)} {v}" for (s, p), v in requests]
+        lines += [
+            "# HELP pifunc_errors_total Requests that ended with an error.",
+            "# TYPE pifunc_errors_total counter",
+        ]
+        lines += [f"pifunc_errors_total{_labels(s, p)} {v}" for (s, p), v in errors]
+        lines += [
+            "# HELP pifunc_requests_in_flight Requests currently being handled.",
+            "# TYPE pifunc_requests_in_flight gauge",
+        ]
+        lines += [f"pifunc_requests_in_flight{_labels(s, p)} {v}" for (s, p), v in in_flight]
+        lines += [
+            "# HELP pifunc_request_duration_seconds Time spent in each request phase.",
+            "# TYPE pifunc_request_duration_seconds histogram",
+        ]
+        for (service, protocol, phase), counts, total, count in durations:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append("pifunc_request_duration_seconds_bucket"
+                             f"{_labels(service, protocol, phase=phase, le=le)} {cumulative}")
+            labels = _labels(service, protocol, phase=phase)
+            lines.append(f"pifunc_request_duration_seconds_sum{labels} {total}")
+            lines.append(f"pifunc_request_duration_seconds_count{labels} {count}")
+
+        for collector in self._collectors:
+            lines.extend(collector())
+
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(service: str, protocol: Optional[str] = None, **extra: str) -> str:
+    """Formatuje etykiety metryki."""
+    pairs = [("service", service)]
+    if protocol is not None:
+        pairs.append(("protocol", protocol))
+    pairs.extend(extra.items())
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def invoker_collector(get_invokers: Callable[[], Iterable]) -> Callable[[], List[str]]:
+    """Tworzy kolektor liczników pamięci podręcznej, łączenia wywołań i limitów współbieżności usług."""
+    def collect() -> List[str]:
+        invokers = [invoker for invoker in get_invokers() if invoker is not None]
+        cached = [(invoker.name, invoker.cache.stats()) for invoker in invokers if invoker.cache is not None]
+        coalesced = [(invoker.name, invoker.flights.coalesced) for invoker in invokers
+                     if invoker.flights is not None]
+        limited = [(invoker.name, invoker.limiter.stats()) for invoker in invokers if invoker.limiter is not None]
+
+        lines = []
+        for counter, help_text in (("hits", "Result cache hits."),
+                                   ("misses", "Result cache misses."),
+                                   ("evictions", "Result cache evictions.")):
+            lines.append(f"# HELP pifunc_cache_{counter}_total {help_text}")
+            lines.append(f"# TYPE pifunc_cache_{counter}_total counter")
+            lines += [f"pifunc_cache_{counter}_total{_labels(name)} {stats[counter]}" for name, stats in cached]
+        lines.append("# HELP pifunc_cache_entries Entries in the result cache.")
+        lines.append("# TYPE pifunc_cache_entries gauge")
+        lines += [f"pifunc_cache_entries{_labels(name)} {stats['entries']}" for name, stats in cached]
+        lines.append("# HELP pifunc_coalesced_calls_total Calls that joined an identical in-flight call.")
+        lines.append("# TYPE pifunc_coalesced_calls_total counter")
+        lines += [f"pifunc_coalesced_calls_total{_labels(name)} {count}" for name, count in coalesced]
+        for metric, key, kind, help_text in (
+                ("pifunc_concurrency_active", "active", "gauge", "Calls currently executing under max_concurrency."),
+                ("pifunc_queue_depth", "queued", "gauge", "Calls waiting for a free concurrency slot."),
+                ("pifunc_rejected_total", "rejected", "counter", "Calls rejected because the queue was full.")):
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} {kind}")
+            lines += [f"{metric}{_labels(name)} {stats[key]}" for name, stats in limited]
+        return lines
+
+    return collect
+
+
+# Globalny rejestr procesu
+REGISTRY = MetricsRegistry()
+
+
+def track(service: str, protocol: str, started: Optional[float] = None) -> RequestTimer:
+    """Zwraca pomiar żądania w globalnym rejestrze."""
+    return REGISTRY.track(service, protocol, started)
+
+
+def render_prometheus() -> str:
+    """Zwraca metryki globalnego rejestru w formacie Prometheusa."""
+    return REGISTRY.render_prometheus()
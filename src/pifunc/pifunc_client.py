@@ -2,30 +2,39 @@
 import json
 import requests
 
+from pifunc.deadlines import DEADLINE_HEADER, effective_timeout
+
 
 class PiFuncClient:
     """Simple client for pifunc services."""
 
-    def __init__(self, base_url="http://localhost:8080", protocol="http"):
+    def __init__(self, base_url="http://localhost:8080", protocol="http", grpc_channels=1):
         """
         Initialize the pifunc client.
 
         Args:
-            base_url: Base URL for the HTTP protocol
+            base_url: Base URL for the HTTP protocol, or host:port for gRPC
             protocol: Default protocol to use ('http', 'grpc', etc.)
+            grpc_channels: Number of long-lived gRPC channels per target
         """
         self.base_url = base_url
         self.protocol = protocol.lower()
+        self.grpc_channels = grpc_channels
         self._session = requests.Session()
+        self._grpc = None
 
     def call(self, service_name, args=None, **kwargs):
         """
         Call a remote service.
 
+        Inside a pifunc service, the time left before the current call's
+        deadline is sent along (and caps ``timeout``), so downstream services
+        stop working on requests nobody is waiting for anymore.
+
         Args:
             service_name: Name of the service to call
             args: Arguments to pass to the service
-            **kwargs: Additional protocol-specific configuration
+            **kwargs: Additional protocol-specific configuration, e.g. timeout in seconds
 
         Returns:
             Result of the service call
@@ -36,19 +45,23 @@ class PiFuncClient:
         # Determine which protocol to use
         protocol = kwargs.get('protocol', self.protocol)
 
+        timeout = effective_timeout(kwargs.get("timeout"))
+        if timeout is not None and timeout <= 0:
+            return {"error": f"Deadline exceeded before calling {service_name}"}
+
         # Call service based on protocol
         if protocol == "http":
             path = kwargs.get("path", f"/api/{service_name}")
             method = kwargs.get("method", "POST")
 
             url = f"{self.base_url}{path}"
-
-            if method.upper() == "GET":
-                response = self._session.get(url, params=args)
-            else:
-                response = self._session.post(url, json=args)
+            headers = {DEADLINE_HEADER: f"{timeout:.3f}"} if timeout is not None else None
 
             try:
+                if method.upper() == "GET":
+                    response = self._session.get(url, params=args, headers=headers, timeout=timeout)
+                else:
+                    response = self._session.post(url, json=args, headers=headers, timeout=timeout)
                 response.raise_for_status()
                 return response.json()
             except requests.RequestException as e:
@@ -56,10 +69,41 @@ class PiFuncClient:
                 return {"error": str(e)}
             except ValueError:
                 return {"result": response.text}
+        elif protocol == "grpc":
+            return self._call_grpc(service_name, args, **dict(kwargs, timeout=timeout))
         else:
             print(f"Protocol {protocol} is not implemented yet")
             return {"error": f"Protocol {protocol} not implemented"}
 
+    def _call_grpc(self, service_name, args, **kwargs):
+        """
+        Call a service via gRPC, discovering the method through server reflection.
+
+        Server-streaming methods return an iterator of results. Extra options:
+        target (host:port), grpc_service, timeout and metadata.
+        """
+        import grpc
+        from pifunc.grpc_client import GRPCClient
+
+        if self._grpc is None:
+            target = self.base_url.split("://", 1)[-1]
+            self._grpc = GRPCClient(target, pool_size=self.grpc_channels)
+
+        try:
+            return self._grpc.call(service_name, args,
+                                   target=kwargs.get("target"),
+                                   service=kwargs.get("grpc_service"),
+                                   timeout=kwargs.get("timeout"),
+                                   metadata=kwargs.get("metadata"))
+        except grpc.RpcError as e:
+            print(f"gRPC request error: {e.code().name}: {e.details()}")
+            return {"error": e.details() or e.code().name}
+        except (LookupError, ValueError) as e:
+            print(f"gRPC request error: {e}")
+            return {"error": str(e)}
+
     def close(self):
         """Close all connections."""
-        self._session.close()
\ No newline at end of file
+        self._session.close()
+        if self._grpc is not None:
+            self._grpc.close()
\ No newline at end of file
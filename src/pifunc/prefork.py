@@ -0,0 +1,228 @@
+# pifunc/prefork.py
+"""
+Tryb prefork dla `run_services(workers=N)`.
+
+Nadzorca tworzy gniazda nasłuchujące dla protokołów opartych na TCP
+(HTTP, WebSocket, GraphQL), a następnie uruchamia N procesów roboczych
+przez `os.fork()`. Procesy dziedziczą gniazda, więc jądro rozdziela między
+nie połączenia. Serwer gRPC w każdym procesie wiąże ten sam port dzięki
+SO_REUSEPORT. Adaptery brokerów (MQTT, AMQP) działają jako osobny konsument
+w każdym procesie.
+
+Nadzorca restartuje procesy, które zakończyły się nieoczekiwanie, i przy
+SIGINT/SIGTERM przekazuje sygnał procesom roboczym, które zatrzymują się
+przez swoją standardową ścieżkę `handle_signal`.
+"""
+
+import logging
+import os
+import signal
+import socket
+import sys
+import time
+from typing import Any, Callable, Dict, Iterable
+
+logger = logging.getLogger("pifunc")
+
+# Protokoły, których gniazda nasłuchujące tworzy nadzorca
+_SHARED_SOCKET_PROTOCOLS = {
+    "http": ("0.0.0.0", 8080),
+    "websocket": ("0.0.0.0", 8081),
+    "graphql": ("0.0.0.0", 8082),
+}
+
+# Protokoły uruchamiane tylko w pierwszym procesie roboczym: Redis Pub/Sub
+# dostarcza każdą wiadomość wszystkim subskrybentom, CRON uruchamiałby zadania
+# N razy, a gniazda ZeroMQ nie mogą współdzielić portu.
+_SINGLETON_PROTOCOLS = {"redis", "cron", "zeromq"}
+
+# Czas na łagodne zatrzymanie procesów roboczych przed SIGKILL
+_SHUTDOWN_TIMEOUT = 10.0
+
+# Minimalny czas życia procesu, poniżej którego restart jest opóźniany
+_MIN_WORKER_UPTIME = 1.0
+
+
+def _create_listener(host: str, port: int, backlog: int = 2048) -> socket.socket:
+    """Tworzy gniazdo nasłuchujące dziedziczone przez procesy robocze."""
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _create_listeners(config: Dict[str, Any], protocols: Iterable[str]) -> Dict[str, socket.socket]:
+    """Tworzy gniazda dla protokołów TCP obsługiwanych przez wiele procesów."""
+    listeners = {}
+    for protocol in protocols:
+        if protocol not in _SHARED_SOCKET_PROTOCOLS:
+            continue
+        default_host, default_port = _SHARED_SOCKET_PROTOCOLS[protocol]
+        protocol_config = config.get(protocol, {})
+        host = protocol_config.get("host", default_host)
+        port = protocol_config.get("port", default_port)
+        listeners[protocol] = _create_listener(host, port)
+        logger.info(f"Prefork: listening for {protocol} on {host}:{port}")
+    return listeners
+
+
+def _worker_config(config: Dict[str, Any], listeners: Dict[str, socket.socket],
+                   protocols: Iterable[str]) -> Dict[str, Any]:
+    """Przygotowuje konfigurację adapterów dla procesu roboczego."""
+    worker_config = dict(config)
+    worker_config["workers"] = 1
+    worker_config["watch"] = False
+
+    for protocol, sock in listeners.items():
+        worker_config[protocol] = {**config.get(protocol, {}), "socket": sock}
+
+    # Współdzielone subskrypcje MQTT, aby wiadomość trafiała do jednego procesu
+    if "mqtt" in protocols:
+        worker_config["mqtt"] = {"shared_group": "pifunc", **config.get("mqtt", {})}
+
+    return worker_config
+
+
+class _Supervisor:
+    """Uruchamia i nadzoruje procesy robocze."""
+
+    def __init__(self, config: Dict[str, Any], protocols: Iterable[str],
+                 run_worker: Callable[[Dict[str, Any], Iterable[str]], None]):
+        self.config = config
+        self.protocols = set(protocols)
+        self.run_worker = run_worker
+        self.workers = int(config.get("workers", 1))
+        self.listeners: Dict[str, socket.socket] = {}
+        self.children: Dict[int, int] = {}
+        self.started_at: Dict[int, float] = {}
+        self.shutting_down = False
+        self.shutdown_deadline = None
+
+    def spawn(self, worker_id: int) -> None:
+        """Uruchamia proces roboczy o podanym numerze."""
+        pid = os.fork()
+        if pid == 0:
+            # Proces roboczy: przywracamy domyślną obsługę sygnałów
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            os.environ["PIFUNC_WORKER_ID"] = str(worker_id)
+
+            protocols = set(self.protocols)
+            if worker_id != 0:
+                protocols -= _SINGLETON_PROTOCOLS
+
+            exit_code = 0
+            try:
+                self.run_worker(_worker_config(self.config, self.listeners, protocols), protocols)
+            except SystemExit as e:
+                exit_code = e.code if isinstance(e.code, int) else 0
+            except BaseException as e:
+                logger.error(f"Worker {worker_id} crashed: {e}")
+                exit_code = 1
+            finally:
+                os._exit(exit_code)
+
+        self.children[pid] = worker_id
+        self.started_at[pid] = time.monotonic()
+        logger.info(f"Prefork: started worker {worker_id} (pid {pid})")
+
+    def handle_signal(self, signum, frame) -> None:
+        """Rozpoczyna skoordynowane zatrzymanie procesów roboczych."""
+        if self.shutting_down:
+            return
+        logger.info("Zatrzymywanie procesów roboczych...")
+        self.shutting_down = True
+        self.shutdown_deadline = time.monotonic() + _SHUTDOWN_TIMEOUT
+        self.signal_children(signal.SIGTERM)
+
+    def signal_children(self, signum: int) -> None:
+        """Wysyła sygnał do wszystkich procesów roboczych."""
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signum)
+            except ProcessLookupError:
+                pass
+
+    def reap(self) -> None:
+        """Odbiera zakończone procesy i restartuje te, które uległy awarii."""
+        while self.children:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                self.children.clear()
+                return
+            if pid == 0:
+                return
+
+            worker_id = self.children.pop(pid, None)
+            started_at = self.started_at.pop(pid, time.monotonic())
+            if worker_id is None or self.shutting_down:
+                continue
+
+            exit_code = os.waitstatus_to_exitcode(status)
+            logger.warning(f"Prefork: worker {worker_id} (pid {pid}) exited with {exit_code}, restarting")
+
+            # Chronimy się przed pętlą szybkich restartów
+            if time.monotonic() - started_at < _MIN_WORKER_UPTIME:
+                time.sleep(_MIN_WORKER_UPTIME)
+            self.spawn(worker_id)
+
+    def stop_children(self) -> None:
+        """Zatrzymuje procesy robocze i czeka na ich zakończenie."""
+        self.handle_signal(signal.SIGTERM, None)
+        while self.children and time.monotonic() < self.shutdown_deadline:
+            self.reap()
+            time.sleep(0.1)
+        self.signal_children(signal.SIGKILL)
+        self.close_listeners()
+
+    def close_listeners(self) -> None:
+        for sock in self.listeners.values():
+            try:
+                sock.close()
+            except OSError:
+                pass
+        self.listeners = {}
+
+    def run(self) -> None:
+        """Główna pętla nadzorcy."""
+        self.listeners = _create_listeners(self.config, self.protocols)
+
+        signal.signal(signal.SIGINT, self.handle_signal)
+        signal.signal(signal.SIGTERM, self.handle_signal)
+
+        for worker_id in range(self.workers):
+            self.spawn(worker_id)
+
+        if self.config.get("watch", False):
+            from pifunc import _start_file_watcher
+            _start_file_watcher({}, on_reload=self.stop_children)
+
+        logger.info(f"Prefork: supervising {self.workers} workers (pid {os.getpid()})")
+
+        try:
+            while self.children:
+                self.reap()
+                if self.shutting_down and time.monotonic() > self.shutdown_deadline:
+                    logger.warning("Prefork: workers did not stop in time, killing them")
+                    self.signal_children(signal.SIGKILL)
+                    self.shutdown_deadline = float("inf")
+                time.sleep(0.1)
+        except KeyboardInterrupt:
+            self.handle_signal(signal.SIGINT, None)
+            self.stop_children()
+        finally:
+            self.close_listeners()
+
+
+def run_prefork(config: Dict[str, Any], protocols: Iterable[str],
+                run_worker: Callable[[Dict[str, Any], Iterable[str]], None]) -> None:
+    """Uruchamia nadzorcę z `config["workers"]` procesami roboczymi."""
+    if not hasattr(os, "fork"):
+        raise RuntimeError("run_services(workers=N) requires os.fork(), which is not available on this platform")
+
+    _Supervisor(config, protocols, run_worker).run()
+    sys.exit(0)
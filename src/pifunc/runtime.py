@@ -0,0 +1,178 @@
+# pifunc/runtime.py
+"""
+Wspólne środowisko uruchomieniowe adapterów.
+
+Adaptery gRPC, ZeroMQ, Redis, AMQP, MQTT i GraphQL obsługują wiadomości
+w zwykłych wątkach. Usługi `async def` są przez nie przekazywane do jednej,
+długo żyjącej pętli asyncio działającej w tle, zamiast tworzyć i zamykać
+nową pętlę przy każdej wiadomości. Dzięki temu pule połączeń i inne zasoby
+związane z pętlą przeżywają pomiędzy wywołaniami.
+
+Adaptery działające na pętli asyncio korzystają z kolei z `ServiceExecutors`,
+aby wykonywać synchroniczne usługi poza pętlą.
+"""
+
+import asyncio
+import concurrent.futures
+import os
+import threading
+from typing import Any, Coroutine, Optional
+
+
+class BackgroundLoop:
+    """Pętla asyncio uruchomiona w osobnym wątku demona."""
+
+    def __init__(self, name: str = "pifunc-loop"):
+        self.name = name
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        """Zwraca pętlę, uruchamiając ją przy pierwszym użyciu."""
+        if self._loop is None:
+            self.start()
+        return self._loop
+
+    def start(self) -> None:
+        """Uruchamia wątek z pętlą asyncio."""
+        with self._lock:
+            if self._loop is not None:
+                return
+
+            loop = asyncio.new_event_loop()
+            ready = threading.Event()
+
+            def run_loop():
+                asyncio.set_event_loop(loop)
+                loop.call_soon(ready.set)
+                loop.run_forever()
+
+            self._thread = threading.Thread(target=run_loop, name=self.name, daemon=True)
+            self._thread.start()
+            ready.wait()
+            self._loop = loop
+
+    def in_loop_thread(self) -> bool:
+        """Sprawdza, czy bieżący wątek jest wątkiem pętli."""
+        return self._thread is not None and self._thread.ident == threading.get_ident()
+
+    def submit(self, coro: Coroutine) -> concurrent.futures.Future:
+        """Przekazuje korutynę do pętli i zwraca obiekt Future."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro: Coroutine, timeout: Optional[float] = None) -> Any:
+        """Wykonuje korutynę w pętli i czeka na wynik w bieżącym wątku."""
+        if self.in_loop_thread():
+            coro.close()
+            raise RuntimeError("Cannot block on the background loop from its own thread")
+        return self.submit(coro).result(timeout)
+
+    def stop(self) -> None:
+        """Zatrzymuje pętlę i czeka na zakończenie wątku."""
+        with self._lock:
+            loop, thread = self._loop, self._thread
+            self._loop = None
+            self._thread = None
+
+        if loop is None:
+            return
+
+        loop.call_soon_threadsafe(loop.stop)
+        if thread is not None and not self.in_loop_thread():
+            thread.join(timeout=5.0)
+        if not loop.is_running():
+            loop.close()
+
+
+_background_loop: Optional[BackgroundLoop] = None
+_background_lock = threading.Lock()
+
+
+def get_background_loop() -> BackgroundLoop:
+    """Zwraca pętlę współdzieloną przez wszystkie adaptery w procesie."""
+    global _background_loop
+    if _background_loop is None:
+        with _background_lock:
+            if _background_loop is None:
+                _background_loop = BackgroundLoop()
+    return _background_loop
+
+
+def shutdown_background_loop() -> None:
+    """Zatrzymuje współdzieloną pętlę, jeśli została uruchomiona."""
+    global _background_loop
+    with _background_lock:
+        background_loop, _background_loop = _background_loop, None
+    if background_loop is not None:
+        background_loop.stop()
+
+
+def _reset_after_fork() -> None:
+    """Wątek pętli nie istnieje w procesie potomnym, więc zapominamy o niej."""
+    global _background_loop, _background_lock
+    _background_loop = None
+    _background_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+# Tryby wykonywania synchronicznych usług w adapterach asynchronicznych
+EXECUTOR_MODES = ("thread", "process", "inline")
+
+
+class ServiceExecutors:
+    """
+    Ograniczone pule wykonawców dla synchronicznych usług.
+
+    Adaptery działające na pętli asyncio (np. HTTP) przekazują do nich
+    funkcje `def`, aby jedna blokująca usługa nie wstrzymywała pozostałych
+    żądań. Pule tworzone są leniwie, przy pierwszym użyciu.
+    """
+
+    def __init__(self, default: str = "thread", max_workers: Optional[int] = None,
+                 process_workers: Optional[int] = None, name: str = "pifunc"):
+        if default not in EXECUTOR_MODES:
+            raise ValueError(f"Invalid executor: {default}. Valid executors are: {EXECUTOR_MODES}")
+        self.default = default
+        self.max_workers = max_workers
+        self.process_workers = process_workers
+        self.name = name
+        self._thread_pool: Optional[concurrent.futures.ThreadPoolExecutor] = None
+        self._process_pool: Optional[concurrent.futures.ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def get(self, mode: Optional[str] = None) -> Optional[concurrent.futures.Executor]:
+        """Zwraca pulę dla danego trybu lub None dla wykonania w pętli."""
+        mode = mode or self.default
+        if mode == "inline":
+            return None
+
+        with self._lock:
+            if mode == "process":
+                if self._process_pool is None:
+                    self._process_pool = concurrent.futures.ProcessPoolExecutor(
+                        max_workers=self.process_workers
+                    )
+                return self._process_pool
+
+            if self._thread_pool is None:
+                self._thread_pool = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix=self.name
+                )
+            return self._thread_pool
+
+    def shutdown(self, wait: bool = False) -> None:
+        """Zamyka utworzone pule."""
+        with self._lock:
+            pools = [self._thread_pool, self._process_pool]
+            self._thread_pool = None
+            self._process_pool = None
+
+        for pool in pools:
+            if pool is not None:
+                pool.shutdown(wait=wait, cancel_futures=True)
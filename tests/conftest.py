@@ -0,0 +1,32 @@
+import socket
+import pytest
+
+
+def get_free_port():
+    """Get a free port number."""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(('', 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture
+def start_adapter():
+    """Set up, register and start adapters on free local ports; stop them after the test.
+
+    Usage: ``adapter = start_adapter(HTTPAdapter(), [(func, metadata), ...], engine="asgi")``.
+    Extra keyword arguments are merged into the adapter config, and the chosen
+    port is available as ``adapter.config["port"]``.
+    """
+    started = []
+
+    def start(adapter, services=(), **config):
+        adapter.setup({"port": get_free_port(), "host": "127.0.0.1", **config})
+        for func, metadata in services:
+            adapter.register_function(func, metadata)
+        adapter.start()
+        started.append(adapter)
+        return adapter
+
+    yield start
+    for adapter in reversed(started):
+        adapter.stop()
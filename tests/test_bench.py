@@ -0,0 +1,43 @@
+import pytest
+from pifunc.bench import bench_adapter, bench_micro, compare, load_cases, summarize
+
+
+def test_summarize_reports_throughput_and_percentiles():
+    """Test latency summary statistics"""
+    stats = summarize([0.001 * i for i in range(1, 101)], elapsed=2.0)
+
+    assert stats["calls"] == 100
+    assert stats["throughput"] == 50.0
+    assert stats["p50_ms"] == pytest.approx(50.5)
+    assert stats["p99_ms"] == pytest.approx(99.0)
+
+
+def test_compare_flags_regressions_over_threshold():
+    """Test that throughput drops and latency rises above the threshold are reported"""
+    baseline = {
+        "adapters": {"http": {"trivial": {"throughput": 1000.0, "p50_ms": 1.0, "p99_ms": 2.0}}},
+        "micro": {"bind.scalars": {"ops_per_sec": 100000.0}},
+    }
+    current = {
+        "adapters": {"http": {"trivial": {"throughput": 950.0, "p50_ms": 1.5, "p99_ms": 2.1}},
+                     "grpc": {"skipped": "not installed"}},
+        "micro": {"bind.scalars": {"ops_per_sec": 80000.0}},
+    }
+
+    regressions = compare(baseline, current, threshold=10)
+
+    assert len(regressions) == 2
+    assert regressions[0].startswith("http.trivial p50_ms")
+    assert regressions[1].startswith("bind.scalars ops_per_sec")
+    assert compare(baseline, baseline, threshold=10) == []
+
+
+def test_micro_and_http_benchmarks_run():
+    """Test that the microbenchmarks and an HTTP adapter run produce results"""
+    micro = bench_micro(min_time=0.001)
+    assert micro["bind.scalars"]["ops_per_sec"] > 0
+    assert "codec.json-stdlib.encode.large" in micro
+
+    results = bench_adapter("http", load_cases(), iterations=5, warmup=1)
+    assert results["trivial"]["calls"] == 5
+    assert results["payload"]["p99_ms"] > 0
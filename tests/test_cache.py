@@ -0,0 +1,104 @@
+import pytest
+import asyncio
+import time
+from pifunc import service, cache_invalidate
+from pifunc.cache import MISSING, ResultCache
+
+def test_cache_hit_skips_function():
+    """Test that identical calls are served from the cache for every call path"""
+    calls = []
+
+    @service(name="cached_product", cache={"ttl": 30})
+    def get_product(product_id: int, currency: str = "PLN") -> dict:
+        calls.append(product_id)
+        return {"id": product_id, "currency": currency}
+
+    invoker = get_product._pifunc_service["invoker"]
+    assert invoker.call_sync({"product_id": "1"}) == {"id": 1, "currency": "PLN"}
+    assert invoker.call_sync({"product_id": 1, "currency": "PLN"}) == {"id": 1, "currency": "PLN"}
+    assert asyncio.run(invoker.call_async({"product_id": 1})) == {"id": 1, "currency": "PLN"}
+    assert calls == [1]
+
+    stats = invoker.cache.stats()
+    assert stats["hits"] == 2
+    assert stats["misses"] == 1
+
+def test_cache_key_fields_and_invalidate():
+    """Test custom key fields and cache_invalidate"""
+    calls = []
+
+    @service(name="cached_list", cache={"key": ["project"]})
+    def list_tasks(project: str, request_id: str = "") -> list:
+        calls.append(project)
+        return [project]
+
+    invoker = list_tasks._pifunc_service["invoker"]
+    invoker.call_sync({"project": "a", "request_id": "1"})
+    invoker.call_sync({"project": "a", "request_id": "2"})
+    invoker.call_sync({"project": "b"})
+    assert calls == ["a", "b"]
+
+    assert cache_invalidate("cached_list", project="a") == 1
+    invoker.call_sync({"project": "a"})
+    invoker.call_sync({"project": "b"})
+    assert calls == ["a", "b", "a"]
+
+    assert cache_invalidate("cached_list") == 2
+    with pytest.raises(KeyError):
+        cache_invalidate("missing_service")
+
+def test_cache_async_service():
+    """Test caching of coroutine services"""
+    calls = []
+
+    @service(cache={"ttl": 30})
+    async def fetch(x: int) -> int:
+        calls.append(x)
+        return x * 2
+
+    invoker = fetch._pifunc_service["invoker"]
+    assert invoker.call_sync({"x": 2}) == 4
+    assert asyncio.run(invoker.call_async({"x": 2})) == 4
+    assert calls == [2]
+
+def test_cache_ttl_and_lru_eviction():
+    """Test expiry and bounded size"""
+    def square(x: int) -> int:
+        return x * x
+
+    cache = ResultCache(square, ttl=0.05, max_entries=2)
+    for x in range(3):
+        cache.set(cache.make_key({"x": x}), x * x)
+    assert cache.stats()["entries"] == 2
+    assert cache.stats()["evictions"] == 1
+
+    time.sleep(0.1)
+    assert cache.get(cache.make_key({"x": 2})) is MISSING
+    assert cache.stats()["evictions"] == 2
+
+def test_cache_invalid_config():
+    """Test that invalid cache options are rejected at registration"""
+    with pytest.raises(ValueError):
+        @service(cache={"ttl": 30, "size": 10})
+        def f(x: int) -> int:
+            return x
+
+    with pytest.raises(ValueError):
+        @service(cache={"key": ["missing"]})
+        def g(x: int) -> int:
+            return x
+
+def test_cache_skips_stream_results():
+    """Test that a cached generator service yields its items on every call"""
+    calls = []
+
+    @service(name="cached_stream", cache={"ttl": 30})
+    def numbers(n: int):
+        calls.append(n)
+        yield from range(n)
+
+    invoker = numbers._pifunc_service["invoker"]
+    assert list(invoker.call_sync({"n": 3})) == [0, 1, 2]
+    assert list(invoker.call_sync({"n": 3})) == [0, 1, 2]
+    assert calls == [3, 3]
+    assert invoker.cache.stats()["entries"] == 0
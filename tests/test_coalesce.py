@@ -0,0 +1,129 @@
+import pytest
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pifunc import service
+
+def test_coalesce_concurrent_sync_calls():
+    """Test that concurrent identical calls from threads share one execution"""
+    calls = []
+    started = threading.Event()
+
+    @service(coalesce=True)
+    def slow_lookup(key: str) -> dict:
+        calls.append(key)
+        started.set()
+        time.sleep(0.2)
+        return {"key": key}
+
+    invoker = slow_lookup._pifunc_service["invoker"]
+    with ThreadPoolExecutor(max_workers=5) as pool:
+        first = pool.submit(invoker.call_sync, {"key": "a"})
+        started.wait(1)
+        others = [pool.submit(invoker.call_sync, {"key": "a"}) for _ in range(4)]
+        other_key = pool.submit(invoker.call_sync, {"key": "b"})
+        results = [first.result()] + [f.result() for f in others]
+
+    assert results == [{"key": "a"}] * 5
+    assert other_key.result() == {"key": "b"}
+    assert sorted(calls) == ["a", "b"]
+    assert invoker.flights.coalesced == 4
+    assert invoker.flights.in_flight() == 0
+
+def test_coalesce_async_and_sync_callers_share_result():
+    """Test that event-loop and thread callers join the same flight"""
+    calls = []
+
+    @service(coalesce=True)
+    async def fetch(x: int) -> int:
+        calls.append(x)
+        await asyncio.sleep(0.2)
+        return x * 2
+
+    invoker = fetch._pifunc_service["invoker"]
+
+    async def main():
+        leader = asyncio.ensure_future(invoker.call_async({"x": 2}))
+        await asyncio.sleep(0.05)
+        thread_result = asyncio.get_running_loop().run_in_executor(None, invoker.call_sync, {"x": "2"})
+        follower = await invoker.call_async({"x": 2})
+        return await leader, follower, await thread_result
+
+    assert asyncio.run(main()) == (4, 4, 4)
+    assert calls == [2]
+
+def test_coalesce_shares_exceptions():
+    """Test that followers receive the leader's exception and later calls run again"""
+    calls = []
+
+    @service(coalesce=True)
+    def failing(x: int) -> int:
+        calls.append(x)
+        time.sleep(0.2)
+        raise RuntimeError("backend down")
+
+    invoker = failing._pifunc_service["invoker"]
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        futures = [pool.submit(invoker.call_sync, {"x": 1})]
+        time.sleep(0.05)
+        futures += [pool.submit(invoker.call_sync, {"x": 1}) for _ in range(2)]
+        for future in futures:
+            with pytest.raises(RuntimeError, match="backend down"):
+                future.result()
+
+    assert calls == [1]
+    with pytest.raises(RuntimeError):
+        invoker.call_sync({"x": 1})
+    assert calls == [1, 1]
+
+def test_coalesce_survives_a_discarded_coroutine_call():
+    """Test that a coroutine call dropped before it runs does not leave followers waiting"""
+    calls = []
+
+    @service(coalesce=True, max_concurrency=1)
+    async def lookup(key: str) -> str:
+        calls.append(key)
+        await asyncio.sleep(0.01)
+        return key
+
+    invoker = lookup._pifunc_service["invoker"]
+    invoker.call({"key": "a"}).close()
+    assert invoker.flights.in_flight() == 0
+    assert invoker.limiter.stats()["active"] == 0
+
+    async def main():
+        leader = asyncio.ensure_future(invoker.call({"key": "a"}))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(invoker.call_async({"key": "a"}))
+        await asyncio.sleep(0)
+        leader.cancel()
+        # Followers see how the shared call ended instead of waiting forever
+        with pytest.raises(asyncio.CancelledError):
+            await follower
+        return await asyncio.wait_for(invoker.call_async({"key": "a"}), 1)
+
+    assert asyncio.run(main()) == "a"
+    assert invoker.flights.in_flight() == 0
+    assert invoker.limiter.stats()["active"] == 0
+
+def test_coalesce_never_shares_stream_results():
+    """Test that concurrent coalesced calls of a streaming service each get their own stream"""
+    calls = []
+
+    @service(coalesce=True)
+    def numbers(n: int):
+        calls.append(n)
+        time.sleep(0.2)
+        return iter(range(n))
+
+    invoker = numbers._pifunc_service["invoker"]
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        futures = [pool.submit(invoker.call_sync, {"n": 3})]
+        time.sleep(0.05)
+        futures += [pool.submit(invoker.call_sync, {"n": 3}) for _ in range(2)]
+        results = [list(future.result()) for future in futures]
+
+    assert results == [[0, 1, 2]] * 3
+    assert len(calls) == 3
+    assert invoker.flights.in_flight() == 0
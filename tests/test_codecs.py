@@ -0,0 +1,125 @@
+import datetime
+import decimal
+import enum
+import pathlib
+import pytest
+import uuid
+import msgpack
+import requests
+from dataclasses import dataclass
+from pifunc import service
+from pifunc.adapters.codecs import Codec, CodecError, codec_for_content_type, get_codec
+from pifunc.adapters.http_adapter import HTTPAdapter
+
+@dataclass
+class Point:
+    x: int
+    y: int
+
+@pytest.mark.parametrize("name", ["json", "json-stdlib", "msgpack"])
+def test_codec_round_trip(name):
+    """Test that every codec decodes what it encodes"""
+    codec = get_codec(name)
+    data = {"result": {"id": 1, "tags": ["a", "b"], "price": 9.5, "name": "zażółć"}}
+
+    encoded = codec.encode(data)
+    assert isinstance(encoded, bytes)
+    assert codec.decode(encoded) == data
+
+@pytest.mark.parametrize("name", ["json", "json-stdlib", "msgpack"])
+def test_codec_serializes_dataclasses(name):
+    """Test that dataclasses and tuples are encoded as plain structures"""
+    codec = get_codec(name)
+    assert codec.decode(codec.encode({"point": Point(1, 2), "pair": (1, 2)})) == {
+        "point": {"x": 1, "y": 2},
+        "pair": [1, 2]
+    }
+
+class Color(enum.Enum):
+    RED = "red"
+
+@pytest.mark.parametrize("name", ["json", "json-stdlib", "orjson", "msgpack"])
+@pytest.mark.parametrize("big", [1, 2 ** 70])
+def test_codec_serializes_standard_library_types(name, big):
+    """Test that datetimes, UUIDs, decimals, enums and paths encode like FastAPI's jsonable_encoder"""
+    codec = get_codec(name)
+    if name == "msgpack" and big > 2 ** 64:
+        pytest.skip("MessagePack has no integers wider than 64 bits")
+    value = {
+        "big": big,
+        "at": datetime.datetime(2024, 1, 2, 3, 4, 5),
+        "day": datetime.date(2024, 1, 2),
+        "clock": datetime.time(3, 4, 5),
+        "id": uuid.UUID("12345678-1234-5678-1234-567812345678"),
+        "price": decimal.Decimal("9.50"),
+        "count": decimal.Decimal("3"),
+        "color": Color.RED,
+        "path": pathlib.PurePosixPath("/tmp/report.csv"),
+    }
+    assert codec.decode(codec.encode(value)) == {
+        "big": big,
+        "at": "2024-01-02T03:04:05",
+        "day": "2024-01-02",
+        "clock": "03:04:05",
+        "id": "12345678-1234-5678-1234-567812345678",
+        "price": 9.5,
+        "count": 3,
+        "color": "red",
+        "path": "/tmp/report.csv",
+    }
+
+def test_codec_invalid_payload():
+    """Test that malformed messages raise CodecError"""
+    with pytest.raises(CodecError):
+        get_codec("json").decode(b"{not json")
+    with pytest.raises(CodecError):
+        get_codec("msgpack").decode(b"\xc1")
+
+def test_codec_subclasses_must_implement_encode_and_decode():
+    """Test that Codec is abstract and incomplete codecs cannot be instantiated"""
+    class EncodeOnly(Codec):
+        def encode(self, obj):
+            return b""
+
+    with pytest.raises(TypeError):
+        Codec()
+    with pytest.raises(TypeError):
+        EncodeOnly()
+
+def test_unknown_codec():
+    """Test that unknown codecs are rejected, also at service registration"""
+    with pytest.raises(ValueError):
+        get_codec("xml")
+    with pytest.raises(ValueError):
+        service(codec="xml")
+
+def test_codec_for_content_type():
+    """Test content type negotiation"""
+    default = get_codec("json")
+    assert codec_for_content_type("application/msgpack") is get_codec("msgpack")
+    assert codec_for_content_type("application/json; charset=utf-8") is default
+    assert codec_for_content_type("text/html, application/x-msgpack;q=0.9") is get_codec("msgpack")
+    assert codec_for_content_type("text/plain", default) is default
+    assert codec_for_content_type(None) is None
+
+def test_http_msgpack_negotiation(start_adapter):
+    """Test that HTTP decodes Content-Type and encodes the response per Accept"""
+    def add(a: int, b: int) -> int:
+        return a + b
+
+    adapter = start_adapter(HTTPAdapter(), [(add, {"http": {"path": "/api/add", "method": "POST"}})])
+    url = f"http://127.0.0.1:{adapter.config['port']}/api/add"
+
+    response = requests.post(url, data=msgpack.packb({"a": 2, "b": 3}),
+                             headers={"Content-Type": "application/msgpack"})
+    assert response.headers["content-type"] == "application/msgpack"
+    assert msgpack.unpackb(response.content) == {"result": 5}
+
+    response = requests.post(url, json={"a": 2, "b": 3}, headers={"Accept": "application/msgpack"})
+    assert msgpack.unpackb(response.content) == {"result": 5}
+
+    response = requests.post(url, json={"a": 2, "b": 3})
+    assert response.json() == {"result": 5}
+
+    response = requests.post(url, data=b"{broken", headers={"Content-Type": "application/json"})
+    assert response.status_code == 400
@@ -0,0 +1,165 @@
+import pytest
+import asyncio
+import threading
+import time
+import requests
+from pifunc import DeadlineExceeded, PiFuncClient, ServiceOverloaded, _import_adapter, service
+from pifunc.deadlines import DEADLINE_HEADER, deadline, parse_timeout, remaining
+
+def test_service_timeout_cancels_coroutines():
+    """Test that an expired async call is cancelled and reported as DeadlineExceeded"""
+    cancelled = []
+
+    @service(timeout=0.1)
+    async def slow() -> str:
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+        return "late"
+
+    invoker = slow._pifunc_service["invoker"]
+    started = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        invoker.call_sync({})
+    assert time.monotonic() - started < 2
+    assert cancelled == [True]
+
+def test_sync_call_is_abandoned_and_keeps_its_slot():
+    """Test that a stuck sync function is abandoned but holds its concurrency slot until it returns"""
+    release = threading.Event()
+    finished = threading.Event()
+
+    @service(max_concurrency=1)
+    def stuck() -> str:
+        release.wait(5)
+        finished.set()
+        return "done"
+
+    invoker = stuck._pifunc_service["invoker"]
+    with pytest.raises(DeadlineExceeded):
+        invoker.call_sync({}, timeout=0.1)
+    assert invoker.limiter.stats()["active"] == 1
+
+    release.set()
+    assert finished.wait(2)
+    deadline_at = time.time() + 2
+    while invoker.limiter.stats()["active"] and time.time() < deadline_at:
+        time.sleep(0.01)
+    assert invoker.limiter.stats()["active"] == 0
+
+def test_shared_deadline_pool_rejects_calls_when_saturated(monkeypatch):
+    """Test that abandoned sync calls cannot queue new calls behind them in the shared pool"""
+    import pifunc.invoker
+    monkeypatch.setattr(pifunc.invoker, "_deadline_slots", threading.BoundedSemaphore(1))
+    release = threading.Event()
+
+    @service(timeout=0.1)
+    def hang() -> str:
+        release.wait(5)
+        return "done"
+
+    invoker = hang._pifunc_service["invoker"]
+    with pytest.raises(DeadlineExceeded):
+        invoker.call_sync({})
+    with pytest.raises(ServiceOverloaded):
+        invoker.call_sync({})
+
+    release.set()
+    deadline_at = time.time() + 2
+    while not pifunc.invoker._deadline_slots.acquire(blocking=False) and time.time() < deadline_at:
+        time.sleep(0.01)
+    pifunc.invoker._deadline_slots.release()
+    assert invoker.call_sync({}) == "done"
+
+def test_client_timeout_is_capped_and_visible_inside_service():
+    """Test that the smallest budget wins and the service sees the time it has left"""
+    @service(timeout=5)
+    def budget() -> float:
+        return remaining()
+
+    invoker = budget._pifunc_service["invoker"]
+    assert 0 < invoker.call_sync({}, timeout=0.5) <= 0.5
+    assert 0.5 < invoker.call_sync({}) <= 5
+
+    async def main():
+        with deadline(0.3):
+            return await invoker.call_async({}, timeout=10)
+
+    assert 0 < asyncio.run(main()) <= 0.3
+
+def test_timeout_options_are_validated():
+    """Test that invalid service timeouts are rejected and bad client values ignored"""
+    with pytest.raises(ValueError):
+        service(timeout=0)
+    assert parse_timeout("2.5") == 2.5
+    assert parse_timeout("soon") is None
+    assert parse_timeout("-1") is None
+    assert parse_timeout("nan") is None
+    assert parse_timeout(9.2e18) is None
+
+@pytest.mark.parametrize("engine", ["fastapi", "aiohttp", "asgi"])
+def test_http_deadline_header_and_propagation(engine, start_adapter):
+    """Test the HTTP timeout header, 504 responses and deadline propagation through PiFuncClient"""
+    @service(name=f"sleepy_{engine}", http={"path": "/api/sleepy", "method": "POST"})
+    def sleepy(seconds: float) -> str:
+        time.sleep(seconds)
+        return "awake"
+
+    @service(name=f"budget_{engine}", http={"path": "/api/budget", "method": "POST"})
+    def budget() -> float:
+        return remaining()
+
+    @service(name=f"caller_{engine}", timeout=1.5, http={"path": "/api/caller", "method": "POST"})
+    def caller() -> dict:
+        client = PiFuncClient(base_url)
+        try:
+            return client.call("budget", path="/api/budget")
+        finally:
+            client.close()
+
+    adapter = start_adapter(_import_adapter("http", engine)(),
+                            [(func, func._pifunc_service) for func in (sleepy, budget, caller)], engine=engine)
+    base_url = f"http://127.0.0.1:{adapter.config['port']}"
+
+    started = time.monotonic()
+    response = requests.post(f"{base_url}/api/sleepy", json={"seconds": 2},
+                             headers={DEADLINE_HEADER: "0.2"})
+    assert response.status_code == 504
+    assert time.monotonic() - started < 1.5
+
+    assert requests.post(f"{base_url}/api/sleepy", json={"seconds": 0}).json() == {"result": "awake"}
+    assert requests.post(f"{base_url}/api/budget", json={}).json() == {"result": None}
+
+    inner = requests.post(f"{base_url}/api/caller", json={}).json()["result"]
+    assert 0 < inner["result"] <= 1.5
+
+def test_grpc_call_without_client_deadline_has_no_budget(start_adapter):
+    """Test that a sync gRPC call without a deadline runs unbounded and can call other services"""
+    grpc = pytest.importorskip("grpc")
+    from pifunc.adapters.grpc_adapter import GRPCAdapter
+
+    @service(name="grpc_budget", http={"path": "/api/grpc_budget", "method": "POST"})
+    def grpc_budget() -> float:
+        return remaining()
+
+    def relay() -> str:
+        client = PiFuncClient(f"http://127.0.0.1:{http_adapter.config['port']}")
+        try:
+            inner = client.call("grpc_budget", path="/api/grpc_budget")
+        finally:
+            client.close()
+        return f"{remaining()}|{inner}"
+
+    http_adapter = start_adapter(_import_adapter("http", "asgi")(),
+                                 [(grpc_budget, grpc_budget._pifunc_service)], engine="asgi")
+    grpc_adapter = start_adapter(GRPCAdapter(), [(relay, {"name": "relay"})])
+
+    channel = grpc.insecure_channel(f"127.0.0.1:{grpc_adapter.config['port']}")
+    try:
+        schema = grpc_adapter.services["relay"]["schema"]
+        call = channel.unary_unary(schema.method_path, *schema.serializers())
+        assert call(schema.request_class()).result == "None|{'result': None}"
+    finally:
+        channel.close()
@@ -0,0 +1,73 @@
+import logging
+import pytest
+import requests
+import time
+from typing import Dict
+
+pytest.importorskip("graphql")
+
+from pifunc.adapters import graphql_adapter
+from pifunc.adapters.graphql_adapter import GraphQLAdapter
+
+
+def profile(user_id: int) -> dict:
+    return {"id": user_id, "roles": ["admin"]}
+
+
+def scores(user_id: int) -> Dict[str, int]:
+    return {"math": 5}
+
+
+def tags(limit: int = 2) -> list:
+    return ["a", "b", "c"][:limit]
+
+
+def query(url, text):
+    """Send a query, retrying until the server thread is listening."""
+    deadline = time.time() + 5
+    while True:
+        try:
+            return requests.post(url, json={"query": text}, timeout=5).json()
+        except requests.ConnectionError:
+            if time.time() > deadline:
+                raise
+            time.sleep(0.05)
+
+
+@pytest.fixture
+def graphql_url(start_adapter):
+    adapter = start_adapter(GraphQLAdapter(), [(func, {"name": func.__name__}) for func in (profile, scores, tags)])
+    return adapter, f"http://127.0.0.1:{adapter.config['port']}/graphql"
+
+
+def test_dict_results_are_returned_as_json_text(graphql_url):
+    """Test that dict and Dict[...] results are String fields holding JSON"""
+    adapter, url = graphql_url
+    assert str(adapter.schema.query_type.fields["profile"].type) == "String"
+
+    response = query(url, "{ profile(user_id: 7) scores(user_id: 7) }")
+    assert response == {"data": {"profile": '{"id": 7, "roles": ["admin"]}', "scores": '{"math": 5}'}}
+
+
+def test_bare_list_maps_to_list_of_strings(graphql_url):
+    """Test that an unparametrised list return type becomes [String]"""
+    adapter, url = graphql_url
+    assert str(adapter.schema.query_type.fields["tags"].type) == "[String]"
+    assert query(url, "{ tags }") == {"data": {"tags": ["a", "b"]}}
+
+
+def test_missing_library_is_logged(monkeypatch, caplog):
+    """Test that a missing graphql package disables the adapter with a logged warning"""
+    monkeypatch.setattr(graphql_adapter, "_graphql_available", False)
+    adapter = GraphQLAdapter()
+    with caplog.at_level(logging.WARNING, logger=graphql_adapter.__name__):
+        adapter.setup({"port": 0})
+        adapter.register_function(tags, {"name": "tags"})
+        adapter.start()
+
+    assert adapter._connected is False
+    assert [record.getMessage() for record in caplog.records] == [
+        "GraphQL library not available. GraphQL adapter will be disabled.",
+        "Not connected to GraphQL, skipping registration of tags",
+        "GraphQL adapter not connected, skipping start",
+    ]
@@ -0,0 +1,298 @@
+import asyncio
+import pytest
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Dict, Iterator, List, Optional
+
+grpc = pytest.importorskip("grpc")
+
+from pifunc.adapters.grpc_adapter import GRPCAdapter
+from pifunc.adapters.grpc_schema import build_file_descriptor, render_proto
+from pifunc.grpc_client import message_to_dict
+
+
+def multiply(a: int, b: int) -> int:
+    return a * b
+
+
+def tags(items: list, labels: dict) -> dict:
+    return {"count": len(items), **labels}
+
+
+def test_descriptor_matches_signature():
+    """Test that the file descriptor mirrors the function signature"""
+    file_proto = build_file_descriptor(tags, "tags")
+    text = render_proto(file_proto)
+
+    assert "rpc Tags(TagsRequest) returns (TagsResponse) {}" in text
+    assert "repeated string items = 1;" in text
+    assert "map<string, string> labels = 2;" in text
+    assert "map<string, string> result = 1;" in text
+
+
+def test_generic_handlers_serve_without_code_generation(start_adapter):
+    """Test unary and streaming calls served from in-process descriptors"""
+    adapter = start_adapter(GRPCAdapter(), [
+        (multiply, {"name": "multiply"}),
+        (tags, {"name": "tags"}),
+        (multiply, {"name": "multiply_stream", "grpc": {"streaming": True}}),
+    ])
+
+    channel = grpc.insecure_channel(f"127.0.0.1:{adapter.config['port']}")
+    try:
+        schema = adapter.services["multiply"]["schema"]
+        call = channel.unary_unary(schema.method_path, *schema.serializers())
+        assert call(schema.request_class(a=6, b=7), timeout=5).result == 42
+
+        schema = adapter.services["tags"]["schema"]
+        call = channel.unary_unary(schema.method_path, *schema.serializers())
+        response = call(schema.request_class(items=["a", "b"], labels={"env": "test"}), timeout=5)
+        assert message_to_dict(response) == {"result": {"count": 2, "env": "test"}}
+
+        schema = adapter.services["multiply_stream"]["schema"]
+        call = channel.stream_stream(schema.method_path, *schema.serializers())
+        requests = (schema.request_class(a=i, b=2) for i in range(3))
+        assert [response.result for response in call(requests, timeout=5)] == [0, 2, 4]
+
+        with pytest.raises(grpc.RpcError) as error:
+            channel.unary_unary("/pifunc.TestGrpcAdapterService/Missing")(b"", timeout=5)
+        assert error.value.code() == grpc.StatusCode.UNIMPLEMENTED
+    finally:
+        channel.close()
+
+
+def test_services_grouped_per_module(start_adapter):
+    """Test that functions of a module share one gRPC service unless a service_name is given"""
+    from grpc_reflection.v1alpha.proto_reflection_descriptor_database import ProtoReflectionDescriptorDatabase
+
+    adapter = start_adapter(GRPCAdapter(), [
+        (multiply, {"name": "multiply"}),
+        (tags, {"name": "tags"}),
+        (multiply, {"name": "product", "grpc": {"service_name": "Arithmetic", "method": "Product"}}),
+    ])
+
+    channel = grpc.insecure_channel(f"127.0.0.1:{adapter.config['port']}")
+    try:
+        assert adapter.services["multiply"]["schema"].method_path == "/pifunc.TestGrpcAdapterService/Multiply"
+        assert adapter.services["tags"]["schema"].method_path == "/pifunc.TestGrpcAdapterService/Tags"
+        schema = adapter.services["product"]["schema"]
+        assert schema.method_path == "/pifunc.Arithmetic/Product"
+
+        call = channel.unary_unary(schema.method_path, *schema.serializers())
+        assert call(schema.request_class(a=3, b=4), timeout=5).result == 12
+
+        services = ProtoReflectionDescriptorDatabase(channel).get_services()
+        assert sorted(services) == ["grpc.reflection.v1alpha.ServerReflection",
+                                    "pifunc.Arithmetic", "pifunc.TestGrpcAdapterService"]
+        methods = [m.name for m in adapter.services["tags"]["schema"].service_descriptor.methods]
+        assert methods == ["Multiply", "Tags"]
+    finally:
+        channel.close()
+
+
+async def slow_double(x: int) -> int:
+    await asyncio.sleep(0.2)
+    return x * 2
+
+
+def test_aio_server_handles_concurrent_async_calls(start_adapter):
+    """Test that aio mode awaits async services concurrently and offloads sync ones"""
+    adapter = start_adapter(GRPCAdapter(), [
+        (slow_double, {"name": "slow_double"}),
+        (multiply, {"name": "multiply"}),
+        (multiply, {"name": "multiply_stream", "grpc": {"streaming": True}}),
+    ], aio=True, max_workers=2)
+
+    channel = grpc.insecure_channel(f"127.0.0.1:{adapter.config['port']}")
+    try:
+        schema = adapter.services["slow_double"]["schema"]
+        call = channel.unary_unary(schema.method_path, *schema.serializers())
+        futures = [call.future(schema.request_class(x=i), timeout=10) for i in range(200)]
+
+        # 200 calls of 0.2 s finish in about the time of one, with only 2 worker threads
+        started = time.perf_counter()
+        assert [future.result().result for future in futures] == [i * 2 for i in range(200)]
+        assert time.perf_counter() - started < 2.0
+
+        schema = adapter.services["multiply"]["schema"]
+        call = channel.unary_unary(schema.method_path, *schema.serializers())
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(lambda i: call(schema.request_class(a=i, b=3), timeout=5).result, range(20)))
+        assert results == [i * 3 for i in range(20)]
+
+        schema = adapter.services["multiply_stream"]["schema"]
+        call = channel.stream_stream(schema.method_path, *schema.serializers())
+        requests = (schema.request_class(a=i, b=2) for i in range(3))
+        assert [response.result for response in call(requests, timeout=5)] == [0, 2, 4]
+    finally:
+        channel.close()
+
+
+def count_from(start: int) -> Iterator[int]:
+    value = start
+    while True:
+        yield value
+        value += 1
+
+
+async def async_words(text: str) -> AsyncIterator[str]:
+    for word in text.split():
+        await asyncio.sleep(0)
+        yield word
+
+
+def total(values: Iterator[int], scale: int = 1) -> int:
+    return sum(values) * scale
+
+
+async def running_max(values: AsyncIterator[float]) -> AsyncIterator[float]:
+    best = None
+    async for value in values:
+        best = value if best is None else max(best, value)
+        yield best
+
+
+def test_stream_kinds_follow_function_types():
+    """Test that generator returns and Iterator parameters select the RPC kind"""
+    text = render_proto(build_file_descriptor(count_from, "count_from"))
+    assert "rpc Count_from(Count_fromRequest) returns (stream Count_fromResponse) {}" in text
+    assert "int64 result = 1;" in text
+
+    text = render_proto(build_file_descriptor(total, "total"))
+    assert "rpc Total(stream TotalRequest) returns (TotalResponse) {}" in text
+    assert "optional int64 values = 1;" in text
+
+    text = render_proto(build_file_descriptor(running_max, "running_max"))
+    assert "returns (stream Running_maxResponse)" in text
+    assert "(stream Running_maxRequest)" in text
+
+
+@pytest.mark.parametrize("aio", [False, True])
+def test_streaming_rpcs(aio, start_adapter):
+    """Test server-, client- and bidi-streaming calls in both server modes"""
+    adapter = start_adapter(GRPCAdapter(), [(func, {"name": func.__name__})
+                                            for func in (count_from, async_words, total, running_max)], aio=aio)
+
+    channel = grpc.insecure_channel(f"127.0.0.1:{adapter.config['port']}")
+    try:
+        # An endless generator is only advanced as the client reads
+        schema = adapter.services["count_from"]["schema"]
+        call = channel.unary_stream(schema.method_path, *schema.serializers())
+        responses = call(schema.request_class(start=5), timeout=5)
+        assert [next(responses).result for _ in range(5)] == [5, 6, 7, 8, 9]
+        responses.cancel()
+
+        schema = adapter.services["async_words"]["schema"]
+        call = channel.unary_stream(schema.method_path, *schema.serializers())
+        assert [r.result for r in call(schema.request_class(text="a b c"), timeout=5)] == ["a", "b", "c"]
+
+        # Other arguments come from the first message of the stream
+        schema = adapter.services["total"]["schema"]
+        call = channel.stream_unary(schema.method_path, *schema.serializers())
+        requests = iter([schema.request_class(values=1, scale=10)] + [schema.request_class(values=i) for i in (2, 3)])
+        assert call(requests, timeout=5).result == 60
+        assert call(iter([]), timeout=5).result == 0
+
+        schema = adapter.services["running_max"]["schema"]
+        call = channel.stream_stream(schema.method_path, *schema.serializers())
+        requests = (schema.request_class(values=v) for v in (1.0, 3.0, 2.0))
+        assert [r.result for r in call(requests, timeout=5)] == [1.0, 3.0, 3.0]
+    finally:
+        channel.close()
+
+
+def test_request_decoding_keeps_zero_values_and_defaults():
+    """Test that zero values are passed and omitted optional arguments use Python defaults"""
+    from pifunc.adapters.grpc_schema import ServiceSchema
+
+    def scale(value: int, factor: int = 2) -> int:
+        return value * factor
+
+    schema = ServiceSchema.from_function(scale, "scale")
+    assert "optional int64 factor = 2;" in render_proto(schema.file_proto)
+    assert schema.request_to_dict(schema.request_class(value=0)) == {"value": 0}
+    assert schema.request_to_dict(schema.request_class(value=3, factor=0)) == {"value": 3, "factor": 0}
+
+
+@dataclass
+class Tag:
+    name: str
+    weight: float = 1.0
+
+
+@dataclass
+class Item:
+    id: int
+    tags: List[Tag] = field(default_factory=list)
+    attributes: Dict[str, int] = field(default_factory=dict)
+    parent: Optional["Item"] = None
+    note: Optional[str] = None
+    blob: bytes = b""
+
+
+def tag_items(items: List[Item], extra: Dict[str, Tag], limit: Optional[int] = None) -> List[Item]:
+    for item in items[:limit]:
+        item.tags.extend(extra.values())
+    return items[:limit]
+
+
+def test_typed_messages_round_trip(start_adapter):
+    """Test lists, maps, optionals, bytes and nested dataclasses as real protobuf messages"""
+    adapter = start_adapter(GRPCAdapter(), [
+        (tag_items, {"name": "tag_items"}),
+        (lambda item: item, {"name": "echo_item"}),
+    ], reflection=False)
+
+    schema = adapter.services["tag_items"]["schema"]
+    text = render_proto(schema.file_proto)
+    assert "repeated Item items = 1;" in text
+    assert "map<string, Tag> extra = 2;" in text
+    assert "optional int64 limit = 3;" in text
+    assert "repeated Item result = 1;" in text
+    message = schema.pool.FindMessageTypeByName("pifunc.Item")
+    assert message.fields_by_name["parent"].message_type.full_name == "pifunc.Item"
+    assert message.fields_by_name["blob"].type == message.fields_by_name["blob"].TYPE_BYTES
+
+    channel = grpc.insecure_channel(f"127.0.0.1:{adapter.config['port']}")
+    try:
+        call = channel.unary_unary(schema.method_path, *schema.serializers())
+        request = schema.request_class(
+            items=[{"id": 1, "attributes": {"size": 3}, "parent": {"id": 0}, "blob": b"\x00\x01"},
+                   {"id": 2, "note": "skip"}],
+            extra={"hot": {"name": "hot", "weight": 2.5}},
+            limit=1,
+        )
+        response = call(request, timeout=5)
+    finally:
+        channel.close()
+
+    assert len(response.result) == 1
+    item = response.result[0]
+    assert item.id == 1 and item.parent.id == 0 and item.blob == b"\x00\x01"
+    assert dict(item.attributes) == {"size": 3}
+    assert [(tag.name, tag.weight) for tag in item.tags] == [("hot", 2.5)]
+    assert not item.HasField("note")
+
+
+def test_shared_dataclass_message_is_defined_once():
+    """Test that services sharing a dataclass import its message instead of redefining it"""
+    from pifunc.adapters.grpc_schema import SchemaBuilder
+
+    def get_tag(name: str) -> Tag:
+        return Tag(name)
+
+    def weigh(tag: Tag) -> float:
+        return tag.weight
+
+    builder = SchemaBuilder()
+    first = builder.build(get_tag, "get_tag")
+    second = builder.build(weigh, "weigh")
+
+    assert [m.name for m in first.file_proto.message_type] == ["Get_tagRequest", "Get_tagResponse", "Tag"]
+    assert list(second.file_proto.dependency) == ["get_tag.proto"]
+    assert 'import "get_tag.proto";' in render_proto(second.file_proto)
+
+    decoded = second.request_to_dict(second.request_class(tag={"name": "x"}))
+    assert decoded == {"tag": Tag(name="x", weight=1.0)}
+    assert first.encode_response(Tag("y", 3.0)).result.weight == 3.0
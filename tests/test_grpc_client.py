@@ -0,0 +1,117 @@
+import argparse
+import pytest
+from dataclasses import dataclass
+from typing import Any, Iterator, List
+
+grpc = pytest.importorskip("grpc")
+
+from pifunc.adapters.grpc_adapter import GRPCAdapter
+from pifunc.cli import call_grpc_function
+from pifunc.pifunc_client import PiFuncClient
+
+
+@dataclass
+class Point:
+    x: int
+    y: int
+
+
+def add(a: int, b: int) -> int:
+    return a + b
+
+
+def shift(points: List[Point], dx: int) -> List[Point]:
+    return [Point(p.x + dx, p.y) for p in points]
+
+
+def countdown(start: int) -> Iterator[int]:
+    while start > 0:
+        yield start
+        start -= 1
+
+
+def total(values: Iterator[int], scale: int = 1) -> int:
+    return sum(values) * scale
+
+
+def flatten(rows: List[List[int]], offset: int = 0) -> List[List[int]]:
+    return [[value + offset for value in row] for row in rows]
+
+
+def echo(value: Any, extra=None) -> Any:
+    return {"value": value, "extra": extra}
+
+
+@pytest.fixture
+def server(start_adapter):
+    services = [(func, {"name": func.__name__}) for func in (add, shift, countdown, total, flatten, echo)]
+    services.append((add, {"name": "other_add", "grpc": {"service_name": "Other", "method": "Add"}}))
+    adapter = start_adapter(GRPCAdapter(), services)
+    return adapter, adapter.config["port"]
+
+
+def test_client_calls_unary_and_streaming_methods(server):
+    """Test unary, server- and client-streaming calls discovered through reflection"""
+    _, port = server
+    client = PiFuncClient(base_url=f"127.0.0.1:{port}", protocol="grpc", grpc_channels=2)
+    try:
+        assert client.call("Add", {"a": 2, "b": 3}, grpc_service="Other") == {"result": 5}
+        assert client.call("pifunc.TestGrpcClientService/Add", {"a": 2, "b": 3}) == {"result": 5}
+        assert client.call("shift", {"points": [Point(1, 2), {"x": 3, "y": 0}], "dx": 1}) == {
+            "result": [{"x": 2, "y": 2}, {"x": 4, "y": 0}]
+        }
+        assert [item["result"] for item in client.call("countdown", {"start": 3})] == [3, 2, 1]
+        assert client.call("total", {"values": iter([1, 2, 3]), "scale": 2}) == {"result": 12}
+        assert client.call("total", {"values": iter([]), "scale": 2}) == {"result": 0}
+        assert client.call("total", iter([{"values": 4}, {"values": 5}])) == {"result": 9}
+    finally:
+        client.close()
+
+
+def test_client_round_trips_json_text_fields(server):
+    """Test that nested lists, Any and unannotated values are decoded on both sides"""
+    _, port = server
+    client = PiFuncClient(base_url=f"127.0.0.1:{port}", protocol="grpc")
+    try:
+        assert client.call("flatten", {"rows": [[1, 2], [3]], "offset": 1}) == {"result": [[2, 3], [4]]}
+        assert client.call("echo", {"value": "123", "extra": [1, {"a": None}]}) == {
+            "result": {"value": "123", "extra": [1, {"a": None}]}
+        }
+        assert client.call("echo", {"value": 5}) == {"result": {"value": 5, "extra": None}}
+    finally:
+        client.close()
+
+
+def test_client_caches_channels_and_stubs(server):
+    """Test that channels are reused round-robin and stubs are cached per method"""
+    _, port = server
+    client = PiFuncClient(base_url=f"127.0.0.1:{port}", protocol="grpc", grpc_channels=2)
+    try:
+        for i in range(4):
+            assert client.call("add", {"a": i, "b": 1}, grpc_service="TestGrpcClientService") == {"result": i + 1}
+
+        grpc_client = client._grpc
+        assert len(grpc_client.channels._channels[f"127.0.0.1:{port}"]) == 2
+        method = grpc_client.method("add", service="TestGrpcClientService")
+        assert sorted(method.callables) == [0, 1]
+    finally:
+        client.close()
+
+
+def test_client_reports_errors(server):
+    """Test ambiguous and unknown methods return an error instead of raising"""
+    _, port = server
+    client = PiFuncClient(base_url=f"127.0.0.1:{port}", protocol="grpc")
+    try:
+        assert "ambiguous" in client.call("add", {"a": 1, "b": 2})["error"]
+        assert "not found" in client.call("missing", {})["error"]
+    finally:
+        client.close()
+
+
+def test_cli_call_grpc(server, capsys):
+    """Test `pifunc call --protocol grpc` prints the result"""
+    _, port = server
+    args = argparse.Namespace(host="127.0.0.1", port=port, timeout=5)
+    assert call_grpc_function(args, "countdown", {"start": 2}) == 0
+    assert capsys.readouterr().out.splitlines() == ['{"result": 2}', '{"result": 1}']
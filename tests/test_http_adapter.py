@@ -1,10 +1,18 @@
 import pytest
+import requests
+import threading
+import time
+import asyncio
+from pifunc import _import_adapter, service
+from pifunc.adapters import codecs
+from pifunc.adapters.codecs import JSONCodec
 from pifunc.adapters.http_adapter import HTTPAdapter
 from fastapi.middleware.cors import CORSMiddleware
 from dataclasses import dataclass
-from typing import Dict, Optional
+from typing import AsyncIterator, Dict, Iterator, List, Optional
 import json
 
+
 @pytest.fixture
 def http_adapter():
     adapter = HTTPAdapter()
@@ -183,3 +191,170 @@ def test_cors_headers(http_adapter):
     assert adapter.config["cors_origins"] == ["*"]
     assert adapter.config["cors_methods"] == ["*"]
     assert adapter.config["cors_headers"] == ["*"]
+
+@dataclass
+class Point:
+    x: int
+    y: int = 0
+
+def test_typed_request_models(start_adapter):
+    """Test that generic and dataclass parameters are validated from the signature"""
+    def move(point: Point, steps: List[int]) -> Point:
+        return Point(point.x + sum(steps), point.y)
+
+    def search(q: str, tags: Optional[List[str]] = None, limit: int = 10) -> Dict[str, object]:
+        return {"q": q, "tags": tags, "limit": limit}
+
+    adapter = start_adapter(HTTPAdapter(), [
+        (move, {"http": {"path": "/api/move", "method": "POST"}}),
+        (search, {"http": {"path": "/api/search", "method": "GET"}}),
+    ])
+
+    url = f"http://127.0.0.1:{adapter.config['port']}"
+    response = requests.post(f"{url}/api/move", json={"point": {"x": 1}, "steps": [1, "2"]})
+    assert response.json() == {"result": {"x": 4, "y": 0}}
+
+    response = requests.post(f"{url}/api/move", json={"point": {"x": 1}, "steps": "x"})
+    assert response.status_code == 400
+    assert response.json()["detail"][0]["loc"] == ["steps"]
+
+    response = requests.get(f"{url}/api/search", params={"q": "a", "tags": ["x", "y"], "limit": "3"})
+    assert response.json() == {"result": {"q": "a", "tags": ["x", "y"], "limit": 3}}
+    assert requests.get(f"{url}/api/search", params={"q": "a", "limit": "z"}).status_code == 400
+
+    openapi = requests.get(f"{url}/openapi.json").json()
+    body = openapi["paths"]["/api/move"]["post"]["requestBody"]["content"]["application/json"]["schema"]
+    assert body == {"$ref": "#/components/schemas/MoveRequest"}
+    assert openapi["components"]["schemas"]["MoveRequest"]["properties"]["steps"]["items"] == {"type": "integer"}
+    assert [p["name"] for p in openapi["paths"]["/api/search"]["get"]["parameters"]] == ["q", "tags", "limit"]
+
+def test_generator_services_stream_ndjson_and_sse(start_adapter):
+    """Test NDJSON and SSE streaming, selected by config or Accept, with cleanup on disconnect"""
+    closed = threading.Event()
+
+    def numbers(start: int = 0) -> Iterator[int]:
+        try:
+            value = start
+            while True:
+                yield value
+                value += 1
+        finally:
+            closed.set()
+
+    async def points(n: int) -> AsyncIterator[Point]:
+        for i in range(n):
+            await asyncio.sleep(0)
+            yield Point(i, i)
+
+    def broken():
+        yield 1
+        raise RuntimeError("boom")
+
+    adapter = start_adapter(HTTPAdapter(), [
+        (numbers, {"http": {"path": "/api/numbers", "method": "GET"}}),
+        (points, {"http": {"path": "/api/points", "method": "POST", "stream": "sse"}}),
+        (broken, {"http": {"path": "/api/broken", "method": "GET"}}),
+    ])
+
+    url = f"http://127.0.0.1:{adapter.config['port']}"
+    with requests.get(f"{url}/api/numbers", params={"start": 5}, stream=True, timeout=5) as response:
+        assert response.headers["content-type"] == "application/x-ndjson"
+        lines = response.iter_lines()
+        assert [json.loads(next(lines)) for _ in range(3)] == [5, 6, 7]
+    # Closing the connection cancels the endless generator
+    assert closed.wait(5)
+
+    response = requests.post(f"{url}/api/points", json={"n": 2}, timeout=5)
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert response.text == 'data: {"x":0,"y":0}\n\ndata: {"x":1,"y":1}\n\n'
+
+    response = requests.post(f"{url}/api/points", json={"n": 1}, headers={"Accept": "application/x-ndjson"})
+    assert response.text == '{"x":0,"y":0}\n'
+
+    response = requests.get(f"{url}/api/broken", timeout=5)
+    assert [json.loads(line) for line in response.text.splitlines()] == [1, {"error": "boom"}]
+
+def test_batch_endpoint(start_adapter):
+    """Test concurrent batch calls with per-call errors, size limit and NDJSON streaming"""
+    def add(a: int, b: int) -> int:
+        return a + b
+
+    async def slow(delay: float, label: str) -> str:
+        await asyncio.sleep(delay)
+        return label
+
+    adapter = start_adapter(HTTPAdapter(), [
+        (add, {"http": {"path": "/api/add", "method": "POST"}}),
+        (slow, {"http": {"path": "/api/slow", "method": "POST"}}),
+    ], batch=True, batch_max_size=5)
+
+    url = f"http://127.0.0.1:{adapter.config['port']}/api/_batch"
+    calls = [
+        {"service": "slow", "args": {"delay": 0.3, "label": "first"}},
+        {"service": "slow", "args": {"delay": 0.3, "label": "second"}},
+        {"service": "add", "args": {"a": 1, "b": 2}},
+        {"service": "add", "args": {"a": "x", "b": 2}},
+        {"service": "missing"},
+    ]
+    started = time.perf_counter()
+    results = requests.post(url, json=calls, timeout=5).json()["results"]
+    assert time.perf_counter() - started < 0.55
+    assert results[:3] == [{"result": "first"}, {"result": "second"}, {"result": 3}]
+    assert results[3]["status"] == 400 and results[3]["error"][0]["loc"] == ["a"]
+    assert results[4] == {"error": "Unknown service: missing", "status": 404}
+
+    assert requests.post(url, json=calls * 2, timeout=5).status_code == 413
+    assert requests.post(url, json={"service": "add"}, timeout=5).status_code == 400
+
+    response = requests.post(url, json=calls[:3], headers={"Accept": "application/x-ndjson"}, timeout=5)
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert lines[0] == {"index": 2, "result": 3}
+    assert sorted(line["index"] for line in lines) == [0, 1, 2]
+
+class TaggedJSONCodec(JSONCodec):
+    """JSON codec that marks every encoded object, to see which codec wrote a response."""
+
+    content_type = "application/vnd.pifunc-test+json"
+
+    def encode(self, obj):
+        return super().encode({"codec": "tagged", **obj} if isinstance(obj, dict) else obj)
+
+@pytest.mark.parametrize("engine", ["fastapi", "asgi"])
+def test_batch_overload_streams_and_codec(engine, start_adapter, monkeypatch):
+    """Test batch 503 items carry retry_after, stream services are closed and NDJSON uses the negotiated codec"""
+    @service(name=f"batch_busy_{engine}", max_concurrency=1)
+    def busy() -> str:
+        time.sleep(0.2)
+        return "done"
+
+    @service(name=f"batch_numbers_{engine}", max_concurrency=1)
+    def numbers(n: int) -> Iterator[int]:
+        yield from range(n)
+
+    def add(a: int, b: int) -> int:
+        return a + b
+
+    adapter = start_adapter(_import_adapter("http", engine)(), [
+        (busy, busy._pifunc_service),
+        (numbers, numbers._pifunc_service),
+        (add, {"name": "add"}),
+    ], engine=engine, batch=True)
+    url = f"http://127.0.0.1:{adapter.config['port']}/api/_batch"
+    results = requests.post(url, json=[{"service": f"batch_busy_{engine}"}] * 2, timeout=5).json()["results"]
+    assert sorted(results, key=len) == [
+        {"result": "done"},
+        {"error": f"Service batch_busy_{engine} is overloaded, retry after 1s", "status": 503, "retry_after": 1},
+    ]
+
+    # The second request gets 400, not 503, because the first stream released its slot
+    for _ in range(2):
+        calls = [{"service": f"batch_numbers_{engine}", "args": {"n": 3}}]
+        assert requests.post(url, json=calls, timeout=5).json()["results"][0]["status"] == 400
+    assert numbers._pifunc_service["invoker"].limiter.stats()["active"] == 0
+
+    monkeypatch.setitem(codecs._CONTENT_TYPES, TaggedJSONCodec.content_type, TaggedJSONCodec())
+    response = requests.post(url, data=json.dumps([{"service": "add", "args": {"a": 1, "b": 2}}]), timeout=5,
+                             headers={"Content-Type": TaggedJSONCodec.content_type,
+                                      "Accept": "application/x-ndjson"})
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    assert [json.loads(line) for line in response.text.splitlines()] == [{"codec": "tagged", "index": 0, "result": 3}]
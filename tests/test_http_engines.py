@@ -0,0 +1,159 @@
+import json
+import pytest
+import requests
+import socket
+from typing import Iterator, List
+
+from pifunc import _import_adapter, cache_invalidate, service
+from pifunc.adapters.routing import RouteTrie
+
+ENGINES = ["fastapi", "aiohttp", "asgi"]
+
+
+def add(a: int, b: int) -> int:
+    return a + b
+
+
+def get_item(item_id: int, tags: List[str] = []) -> dict:
+    return {"id": item_id, "tags": tags}
+
+
+def count(n: int) -> Iterator[int]:
+    for i in range(n):
+        yield i
+
+
+report_calls = []
+
+
+@service(name="engine_report", http={"path": "/api/report", "method": "GET", "etag": True,
+                                     "response_cache": {"ttl": 60}})
+def report(size: int) -> List[str]:
+    report_calls.append(size)
+    return [f"row-{i:04d}" for i in range(size)]
+
+
+SERVICES = [
+    (add, {"path": "/api/add", "method": "POST"}),
+    (get_item, {"path": "/api/items/{item_id:int}", "method": "GET"}),
+    (count, {"path": "/api/count", "method": "POST"}),
+]
+
+
+@pytest.fixture(params=ENGINES)
+def engine_url(request, start_adapter):
+    services = [(func, {"name": func.__name__, "http": http_config}) for func, http_config in SERVICES]
+    services.append((report, report._pifunc_service))
+    adapter = start_adapter(_import_adapter("http", request.param)(), services,
+                            engine=request.param, gzip=True, gzip_min_size=200, metrics=True)
+    return f"http://127.0.0.1:{adapter.config['port']}"
+
+
+def test_engines_share_service_semantics(engine_url):
+    """Test that every HTTP engine handles the same @service(http=...) configuration"""
+    assert requests.post(f"{engine_url}/api/add", json={"a": 2, "b": 3}).json() == {"result": 5}
+    assert requests.post(f"{engine_url}/api/add", json={"a": "x", "b": 3}).status_code == 400
+
+    response = requests.get(f"{engine_url}/api/items/7", params=[("tags", "a"), ("tags", "b")])
+    assert response.json() == {"result": {"id": 7, "tags": ["a", "b"]}}
+    assert requests.get(f"{engine_url}/api/items/abc").status_code in (404, 422, 400)
+
+    response = requests.post(f"{engine_url}/api/count", json={"n": 3}, stream=True)
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    assert [json.loads(line) for line in response.iter_lines() if line] == [0, 1, 2]
+
+    assert requests.get(f"{engine_url}/api/add").status_code == 405
+    assert requests.get(f"{engine_url}/api/missing").status_code == 404
+    assert "pifunc_requests_total" in requests.get(f"{engine_url}/metrics").text
+
+
+def test_engines_share_error_contract(engine_url):
+    """Test that every HTTP engine reports errors as {"detail": ...} and reads POST arguments only from the body"""
+    response = requests.post(f"{engine_url}/api/add?a=1", json={"b": 2})
+    assert response.status_code == 400
+    assert "detail" in response.json()
+
+    response = requests.post(f"{engine_url}/api/add", data="{not json",
+                             headers={"Content-Type": "application/json"})
+    assert response.status_code == 400
+    assert "detail" in response.json()
+
+    response = requests.get(f"{engine_url}/api/missing")
+    assert response.status_code == 404
+    assert response.json() == {"detail": "Not Found"}
+
+    response = requests.get(f"{engine_url}/api/add")
+    assert response.status_code == 405
+    assert response.json() == {"detail": "Method Not Allowed"}
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_engines_default_to_port_8080(engine):
+    """Test that every HTTP engine listens on port 8080 unless configured otherwise"""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        if s.connect_ex(("127.0.0.1", 8080)) == 0:
+            pytest.skip("port 8080 is in use")
+
+    adapter = _import_adapter("http", engine)()
+    adapter.setup({"host": "127.0.0.1", "engine": engine})
+    adapter.register_function(add, {"name": "add", "http": {"path": "/api/add", "method": "POST"}})
+    adapter.start()
+    try:
+        assert requests.post("http://127.0.0.1:8080/api/add", json={"a": 1, "b": 2}).json() == {"result": 3}
+    finally:
+        adapter.stop()
+
+
+def test_engines_compress_and_answer_conditional_requests(engine_url):
+    """Test gzip, strong ETags, 304 responses and the encoded-response cache"""
+    report_calls.clear()
+    url = f"{engine_url}/api/report"
+
+    first = requests.get(url, params={"size": 50}, headers={"Accept-Encoding": "gzip"})
+    assert first.headers["Content-Encoding"] == "gzip"
+    assert first.headers["Vary"] == "Accept-Encoding"
+    assert first.json()["result"][-1] == "row-0049"
+    etag = first.headers["ETag"]
+    assert etag.startswith('"') and etag.endswith('-gzip"')
+
+    # Repeat polls are answered from the cache without calling the function
+    second = requests.get(url, params={"size": 50}, headers={"Accept-Encoding": "gzip", "If-None-Match": etag})
+    assert second.status_code == 304
+    assert second.content == b""
+    plain = requests.get(url, params={"size": 50}, headers={"Accept-Encoding": "identity"})
+    assert "Content-Encoding" not in plain.headers
+    assert plain.headers["ETag"] == etag.replace("-gzip", "")
+    assert report_calls == [50]
+
+    # Small responses stay uncompressed
+    small = requests.get(url, params={"size": 1}, headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in small.headers
+
+    assert cache_invalidate("engine_report", size=50) >= 1
+    headers = {"Accept-Encoding": "identity", "If-None-Match": plain.headers["ETag"]}
+    assert requests.get(url, params={"size": 50}, headers=headers).status_code == 304
+    assert report_calls == [50, 1, 50]
+
+
+def test_route_trie_prefers_static_segments_and_reports_methods():
+    """Test trie matching order, typed converters and 405 detection"""
+    trie = RouteTrie()
+    trie.add("/users/{id:int}", "GET", "by_id")
+    trie.add("/users/{name}", "GET", "by_name")
+    trie.add("/users/me", "POST", "me")
+    trie.add("/files/{rest:path}", "GET", "files")
+
+    assert trie.match("GET", "/users/42") == ("by_id", {"id": 42}, set())
+    assert trie.match("GET", "/users/bob")[:2] == ("by_name", {"name": "bob"})
+    # A static segment without the method falls back to the parameter route
+    assert trie.match("GET", "/users/me")[:2] == ("by_name", {"name": "me"})
+    assert trie.match("POST", "/users/me")[0] == "me"
+    assert trie.match("DELETE", "/users/me") == (None, {}, {"GET", "POST"})
+    assert trie.match("GET", "/files/a/b.txt")[:2] == ("files", {"rest": "a/b.txt"})
+    assert trie.match("GET", "/nothing") == (None, {}, set())
+
+
+def test_import_adapter_rejects_unknown_engine():
+    """Test that an unknown HTTP engine is a configuration error"""
+    with pytest.raises(ValueError, match="Invalid HTTP engine"):
+        _import_adapter("http", "tornado")
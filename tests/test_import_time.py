@@ -0,0 +1,43 @@
+import subprocess
+import sys
+
+# Łączny czas importu pifunc.cli (bez interpretera i site), z dużym zapasem na wolne maszyny CI
+IMPORT_BUDGET_US = 100_000
+
+# Moduły, które nie mogą być ładowane przy starcie CLI
+HEAVY_MODULES = {"requests", "pkg_resources", "asyncio", "grpc", "fastapi", "paho", "zmq", "orjson",
+                 "pifunc.invoker", "pifunc.adapters"}
+
+
+def import_times(module):
+    """Import a module in a fresh interpreter and return (cumulative times, stdout, stderr)."""
+    code = (f"import {module}, logging; "
+            "assert not logging.getLogger('pifunc').handlers, 'pifunc logger has handlers'")
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                            capture_output=True, text=True, check=True)
+    times, other = {}, []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            other.append(line)
+            continue
+        _, self_us, cumulative, name = (part.strip() for part in line.replace("import time:", "|").split("|"))
+        if cumulative.isdigit():
+            times[name] = int(cumulative)
+    return times, result.stdout, "\n".join(other)
+
+
+def test_cli_import_fits_budget_without_heavy_modules():
+    """Test that importing pifunc.cli is fast and skips heavy dependencies"""
+    times, stdout, stderr = import_times("pifunc.cli")
+
+    assert stdout == "" and stderr == ""
+    assert not HEAVY_MODULES & set(times)
+    assert times["pifunc.cli"] < IMPORT_BUDGET_US
+
+
+def test_adapter_modules_import_silently():
+    """Test that adapter modules have no import-time output"""
+    for module in ("pifunc.adapters.graphql_adapter", "pifunc.adapters.zeromq_adapter",
+                   "pifunc.adapters.cron_adapter"):
+        _, stdout, stderr = import_times(module)
+        assert stdout == "" and stderr == ""
@@ -0,0 +1,97 @@
+import pytest
+import asyncio
+from dataclasses import dataclass
+from typing import List
+from pifunc import service
+from pifunc.invoker import ArgumentError, ServiceInvoker, get_invoker
+
+def test_invoker_built_at_registration():
+    """Test that service() builds the invoker once and returns the function itself"""
+    def add(a: int, b: int) -> int:
+        return a + b
+
+    decorated = service(http={"path": "/api/add", "method": "POST"})(add)
+
+    assert decorated is add
+    invoker = add._pifunc_service["invoker"]
+    assert isinstance(invoker, ServiceInvoker)
+    assert get_invoker(add, add._pifunc_service) is invoker
+
+def test_invoker_converts_and_filters_arguments():
+    """Test argument conversion and dropping of unknown keys"""
+    def add(a: int, b: int = 1) -> int:
+        return a + b
+
+    invoker = ServiceInvoker(add)
+    assert invoker.call_sync({"a": "2", "b": "3", "extra": True}) == 5
+    assert invoker.call_sync({"a": 2}) == 3
+
+def test_invoker_argument_error():
+    """Test that conversion errors report the parameter name"""
+    def add(a: int, b: int) -> int:
+        return a + b
+
+    invoker = ServiceInvoker(add)
+    with pytest.raises(ArgumentError) as e:
+        invoker.call_sync({"a": "x", "b": 1})
+    assert e.value.param == "a"
+
+def test_invoker_complex_types():
+    """Test dataclass conversion and pass-through of generic types"""
+    @dataclass
+    class Point:
+        x: int
+        y: int
+
+    def move(point: Point, steps: List[int]) -> int:
+        return point.x + point.y + sum(steps)
+
+    invoker = ServiceInvoker(move)
+    assert invoker.call_sync({"point": {"x": 1, "y": 2}, "steps": [3, 4]}) == 10
+
+def test_invoker_async_function():
+    """Test calling coroutine functions from sync and async callers"""
+    async def double(x: int) -> int:
+        await asyncio.sleep(0)
+        return x * 2
+
+    invoker = ServiceInvoker(double)
+    assert invoker.is_coroutine
+    assert invoker.call_sync({"x": "4"}) == 8
+    assert asyncio.run(invoker.call_async({"x": 5})) == 10
+
+def test_invoker_reuses_background_loop():
+    """Test that coroutine services called from threads share one long-lived loop"""
+    async def current_loop():
+        return asyncio.get_running_loop()
+
+    invoker = ServiceInvoker(current_loop)
+    first = invoker.call_sync({})
+    second = invoker.call_sync({})
+    assert first is second
+    assert first.is_running()
+
+def test_invoker_offloads_sync_function_to_executor():
+    """Test that sync services run in the adapter thread pool when called from a loop"""
+    import threading
+    from pifunc.runtime import ServiceExecutors
+
+    def whoami() -> str:
+        return threading.current_thread().name
+
+    executors = ServiceExecutors(default="thread", max_workers=2, name="bench")
+    try:
+        assert asyncio.run(ServiceInvoker(whoami).call_async({}, executors)).startswith("bench")
+        inline = ServiceInvoker(whoami, {"executor": "inline"})
+        assert asyncio.run(inline.call_async({}, executors)) == threading.current_thread().name
+    finally:
+        executors.shutdown()
+
+def test_invoker_returns_generators_unconsumed():
+    """Test that generator services return their iterator instead of being awaited"""
+    def count(n: int):
+        yield from range(n)
+
+    invoker = ServiceInvoker(count)
+    assert list(invoker.call_sync({"n": 3})) == [0, 1, 2]
+    assert list(asyncio.run(invoker.call_async({"n": 2}))) == [0, 1]
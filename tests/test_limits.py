@@ -0,0 +1,193 @@
+import pytest
+import asyncio
+import threading
+import time
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from pifunc import ServiceOverloaded, _import_adapter, service
+from pifunc.limits import ConcurrencyLimiter
+from pifunc.metrics import render_prometheus
+
+
+def test_limit_queues_then_rejects_sync_calls():
+    """Test that calls beyond max_concurrency wait in the queue and overflow is rejected"""
+    running = []
+    peak = []
+    release = threading.Event()
+
+    @service(max_concurrency=2, max_queue=1)
+    def work(n: int) -> int:
+        running.append(n)
+        peak.append(len(running))
+        release.wait(2)
+        running.remove(n)
+        return n
+
+    invoker = work._pifunc_service["invoker"]
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        futures = [pool.submit(invoker.call_sync, {"n": i}) for i in range(3)]
+        deadline = time.time() + 2
+        while invoker.limiter.stats()["queued"] < 1 and time.time() < deadline:
+            time.sleep(0.01)
+
+        with pytest.raises(ServiceOverloaded) as excinfo:
+            invoker.call_sync({"n": 3})
+        assert excinfo.value.retry_after == 1
+        assert invoker.limiter.stats() == {"active": 2, "queued": 1, "rejected": 1}
+
+        release.set()
+        assert sorted(f.result() for f in futures) == [0, 1, 2]
+
+    assert max(peak) == 2
+    assert invoker.limiter.stats() == {"active": 0, "queued": 0, "rejected": 1}
+    assert 'pifunc_rejected_total{service="work"} 1' in render_prometheus()
+
+def test_limit_covers_async_calls_and_cancellation():
+    """Test that event-loop callers share the limit and cancelled waiters free their place"""
+    @service(max_concurrency=1, max_queue=2)
+    async def fetch(x: int) -> int:
+        await asyncio.sleep(0.1)
+        return x
+
+    invoker = fetch._pifunc_service["invoker"]
+
+    async def main():
+        first = asyncio.ensure_future(invoker.call_async({"x": 1}))
+        await asyncio.sleep(0.01)
+        cancelled = asyncio.ensure_future(invoker.call_async({"x": 2}))
+        queued = asyncio.ensure_future(invoker.call_async({"x": 3}))
+        await asyncio.sleep(0.01)
+        assert invoker.limiter.stats()["queued"] == 2
+        cancelled.cancel()
+        return await first, await queued
+
+    assert asyncio.run(main()) == (1, 3)
+    assert invoker.limiter.stats() == {"active": 0, "queued": 0, "rejected": 0}
+
+def test_limit_releases_slot_after_error():
+    """Test that a failing call gives its slot back"""
+    @service(max_concurrency=1)
+    def broken() -> None:
+        raise RuntimeError("boom")
+
+    invoker = broken._pifunc_service["invoker"]
+    for _ in range(3):
+        with pytest.raises(RuntimeError):
+            invoker.call_sync({})
+    assert invoker.limiter.stats()["active"] == 0
+
+def test_limit_holds_slot_until_stream_ends():
+    """Test that a streaming result keeps its slot until it is consumed, closed or dropped"""
+    @service(max_concurrency=1)
+    def numbers(n: int):
+        yield from range(n)
+
+    @service(max_concurrency=1)
+    async def anumbers(n: int):
+        for i in range(n):
+            yield i
+
+    invoker = numbers._pifunc_service["invoker"]
+    stream = invoker.call_sync({"n": 3})
+    assert invoker.limiter.stats()["active"] == 1
+    with pytest.raises(ServiceOverloaded):
+        invoker.call_sync({"n": 1})
+    assert list(stream) == [0, 1, 2]
+    assert invoker.limiter.stats()["active"] == 0
+
+    stream = invoker.call_sync({"n": 3})
+    assert next(stream) == 0
+    stream.close()
+    assert invoker.limiter.stats()["active"] == 0
+
+    invoker.call_sync({"n": 3})
+    assert invoker.limiter.stats()["active"] == 0
+
+    ainvoker = anumbers._pifunc_service["invoker"]
+
+    async def main():
+        stream = await ainvoker.call_async({"n": 2})
+        assert ainvoker.limiter.stats()["active"] == 1
+        return [item async for item in stream]
+
+    assert asyncio.run(main()) == [0, 1]
+    assert ainvoker.limiter.stats()["active"] == 0
+
+def test_limit_configuration_is_validated():
+    """Test that invalid limit options are rejected at decoration time"""
+    with pytest.raises(ValueError):
+        service(max_concurrency=0)
+    with pytest.raises(ValueError):
+        service(max_queue=5)
+    assert ConcurrencyLimiter.from_metadata("plain", {}) is None
+
+@pytest.mark.parametrize("engine", ["fastapi", "aiohttp", "asgi"])
+def test_http_overload_returns_503_with_retry_after(engine, start_adapter):
+    """Test that every HTTP engine maps rejected calls to 503 with Retry-After"""
+    release = threading.Event()
+
+    @service(name=f"busy_{engine}", max_concurrency=1, http={"path": "/api/busy", "method": "POST"})
+    def busy() -> str:
+        release.wait(2)
+        return "done"
+
+    adapter = start_adapter(_import_adapter("http", engine)(), [(busy, busy._pifunc_service)], engine=engine)
+    url = f"http://127.0.0.1:{adapter.config['port']}/api/busy"
+    try:
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            first = pool.submit(requests.post, url, json={})
+            invoker = busy._pifunc_service["invoker"]
+            deadline = time.time() + 2
+            while invoker.limiter.stats()["active"] < 1 and time.time() < deadline:
+                time.sleep(0.01)
+
+            rejected = requests.post(url, json={})
+            assert rejected.status_code == 503
+            assert rejected.headers["Retry-After"] == "1"
+            release.set()
+            assert first.result().json() == {"result": "done"}
+    finally:
+        release.set()
+
+def test_graphql_resolver_waits_for_a_slot_without_blocking_the_server(start_adapter):
+    """Test that GraphQL queues calls asynchronously so other fields resolve while a slot is busy"""
+    pytest.importorskip("graphql")
+    from pifunc.adapters.graphql_adapter import GraphQLAdapter
+
+    release = threading.Event()
+
+    @service(name="gql_busy", max_concurrency=1, max_queue=1)
+    def gql_busy() -> str:
+        release.wait(2)
+        return "done"
+
+    def gql_ping() -> str:
+        return "pong"
+
+    adapter = start_adapter(GraphQLAdapter(), [
+        (gql_busy, gql_busy._pifunc_service),
+        (gql_ping, {"name": "gql_ping"}),
+    ])
+    url = f"http://127.0.0.1:{adapter.config['port']}/graphql"
+    try:
+        deadline = time.time() + 2
+        while time.time() < deadline:
+            try:
+                requests.get(url, params={"query": "{ gql_ping }"})
+                break
+            except requests.ConnectionError:
+                time.sleep(0.05)
+
+        invoker = gql_busy._pifunc_service["invoker"]
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            busy = [pool.submit(requests.post, url, json={"query": "{ gql_busy }"}) for _ in range(2)]
+            while invoker.limiter.stats()["queued"] < 1 and time.time() < deadline + 2:
+                time.sleep(0.01)
+            assert invoker.limiter.stats() == {"active": 1, "queued": 1, "rejected": 0}
+
+            ping = requests.post(url, json={"query": "{ gql_ping }"}, timeout=1)
+            assert ping.json() == {"data": {"gql_ping": "pong"}}
+            release.set()
+            assert [f.result().json() for f in busy] == [{"data": {"gql_busy": "done"}}] * 2
+    finally:
+        release.set()
@@ -0,0 +1,75 @@
+import pytest
+import requests
+from pifunc import _import_adapter, service
+from pifunc.adapters.http_adapter import HTTPAdapter
+from pifunc.metrics import REGISTRY, MetricsRegistry
+
+
+def test_registry_counts_requests_errors_and_phases():
+    """Test request, error, in-flight and histogram bookkeeping"""
+    registry = MetricsRegistry(buckets=(0.1, 1.0))
+
+    with registry.track("add", "mqtt") as timer:
+        assert registry.snapshot()["in_flight"][("add", "mqtt")] == 1
+        timer.mark("decode")
+        timer.mark("execute")
+
+    with pytest.raises(RuntimeError):
+        with registry.track("add", "mqtt"):
+            raise RuntimeError("boom")
+
+    with registry.track("add", "grpc") as timer:
+        timer.fail()
+
+    snapshot = registry.snapshot()
+    assert snapshot["requests"] == {("add", "mqtt"): 2, ("add", "grpc"): 1}
+    assert snapshot["errors"] == {("add", "mqtt"): 1, ("add", "grpc"): 1}
+    assert snapshot["in_flight"][("add", "mqtt")] == 0
+    assert snapshot["durations"][("add", "mqtt", "execute")][0] == 1
+
+    text = registry.render_prometheus()
+    assert 'pifunc_requests_total{service="add",protocol="mqtt"} 2' in text
+    assert 'pifunc_request_duration_seconds_bucket{service="add",protocol="mqtt",phase="decode",le="+Inf"} 1' in text
+    assert 'pifunc_request_duration_seconds_count{service="add",protocol="mqtt",phase="execute"} 1' in text
+
+def test_http_adapter_reports_and_serves_metrics(start_adapter):
+    """Test that HTTP calls are recorded and exposed on /metrics"""
+    @service(name="metrics_add", cache={"ttl": 30})
+    def add(a: int, b: int) -> int:
+        return a + b
+
+    metadata = {**add._pifunc_service, "http": {"path": "/api/add", "method": "POST"}}
+    adapter = start_adapter(HTTPAdapter(), [(add, metadata)], metrics=True)
+    port = adapter.config["port"]
+
+    for _ in range(2):
+        assert requests.post(f"http://127.0.0.1:{port}/api/add", json={"a": 1, "b": 2}).json() == {"result": 3}
+    assert requests.post(f"http://127.0.0.1:{port}/api/add", json={"a": "x", "b": 2}).status_code == 400
+
+    response = requests.get(f"http://127.0.0.1:{port}/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    text = response.text
+
+    assert 'pifunc_requests_total{service="metrics_add",protocol="http"} 3' in text
+    assert 'pifunc_errors_total{service="metrics_add",protocol="http"} 1' in text
+    assert 'pifunc_request_duration_seconds_count{service="metrics_add",protocol="http",phase="encode"} 2' in text
+    assert 'pifunc_cache_hits_total{service="metrics_add"} 1' in text
+    assert REGISTRY.snapshot()["in_flight"][("metrics_add", "http")] == 0
+
+@pytest.mark.parametrize("engine", ["fastapi", "aiohttp", "asgi"])
+def test_metrics_endpoint_is_opt_in(engine, start_adapter):
+    """Test that /metrics is only served when enabled, on every HTTP engine"""
+    def ping() -> str:
+        return "pong"
+
+    services = [(ping, {"name": "ping", "http": {"path": "/api/ping", "method": "GET"}})]
+    hidden = start_adapter(_import_adapter("http", engine)(), services, engine=engine)
+    shown = start_adapter(_import_adapter("http", engine)(), services, engine=engine,
+                          metrics=True, metrics_path="/internal/metrics")
+
+    assert requests.get(f"http://127.0.0.1:{hidden.config['port']}/metrics").status_code == 404
+    assert requests.get(f"http://127.0.0.1:{shown.config['port']}/metrics").status_code == 404
+    response = requests.get(f"http://127.0.0.1:{shown.config['port']}/internal/metrics")
+    assert response.status_code == 200
+    assert "pifunc_requests_total" in response.text
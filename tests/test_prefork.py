@@ -0,0 +1,60 @@
+import os
+import signal
+import subprocess
+import sys
+import textwrap
+import time
+import pytest
+import requests
+from conftest import get_free_port
+
+pytestmark = pytest.mark.skipif(not hasattr(os, "fork"), reason="prefork requires os.fork")
+
+def wait_for_pid(url, timeout=15.0):
+    """Poll the service until a worker answers."""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            return requests.get(url, timeout=1).json()["result"]
+        except (requests.RequestException, ValueError):
+            time.sleep(0.2)
+    pytest.fail(f"No worker answered on {url}")
+
+@pytest.fixture
+def prefork_service(tmp_path):
+    port = get_free_port()
+    script = tmp_path / "prefork_service.py"
+    script.write_text(textwrap.dedent(f"""
+        import os
+        from pifunc import service, run_services
+
+        @service(http={{"path": "/api/pid", "method": "GET"}})
+        def pid() -> int:
+            return os.getpid()
+
+        if __name__ == "__main__":
+            run_services(http={{"host": "127.0.0.1", "port": {port}}}, workers=2)
+    """))
+    env = dict(os.environ, PIFUNC_PROTOCOLS="http")
+    process = subprocess.Popen([sys.executable, str(script)], env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    yield process, f"http://127.0.0.1:{port}/api/pid"
+    if process.poll() is None:
+        process.kill()
+        process.wait()
+
+def test_prefork_restarts_crashed_worker_and_shuts_down(prefork_service):
+    """Test that workers serve requests, crashed workers are replaced and SIGTERM stops everything"""
+    process, url = prefork_service
+
+    worker_pid = wait_for_pid(url)
+    assert worker_pid != process.pid
+
+    os.kill(worker_pid, signal.SIGKILL)
+    time.sleep(0.5)
+
+    assert wait_for_pid(url) != worker_pid
+    assert process.poll() is None
+
+    process.send_signal(signal.SIGTERM)
+    assert process.wait(timeout=15) == 0
@@ -0,0 +1,57 @@
+import pytest
+import requests
+import time
+
+pytest.importorskip("aiohttp")
+
+from pifunc.adapters.rest_adapter import RESTAdapter
+from pifunc.adapters.routing import RouteTrie, compile_path
+
+
+def wait_for_server(url, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            requests.get(url, timeout=0.5)
+            return
+        except requests.ConnectionError:
+            time.sleep(0.05)
+    raise RuntimeError(f"Server at {url} did not start")
+
+
+def test_compile_path_typed_converters():
+    """Test typed path parameters are compiled to router patterns and converters"""
+    pattern, converters = compile_path("/users/{id:int}/files/{name}/{rest:path}")
+    assert pattern == r"/users/{id:-?\d+}/files/{name}/{rest:.+}"
+    assert converters == {"id": int}
+    # Unknown converters are passed to aiohttp as regular expressions
+    assert compile_path(r"/items/{code:[A-Z]+}") == (r"/items/{code:[A-Z]+}", {})
+
+
+def test_routes_dispatch_by_router_match(start_adapter):
+    """Test typed params, static-before-param precedence and method checks"""
+    def get_user(id: int) -> dict:
+        return {"id": id, "type": type(id).__name__}
+
+    def current_user() -> str:
+        return "me"
+
+    def get_file(user: str, name: str) -> str:
+        return f"{user}:{name}"
+
+    # The parametrised route is registered first on purpose
+    adapter = start_adapter(RESTAdapter(), [
+        (get_user, {"rest": {"path": "/users/{id:int}", "methods": ["GET"]}}),
+        (get_file, {"rest": {"path": "/users/{user}/files/{name}", "methods": ["GET"]}}),
+        (current_user, {"rest": {"path": "/users/me", "methods": ["GET"]}}),
+    ])
+
+    base = f"http://127.0.0.1:{adapter.config['port']}"
+    wait_for_server(f"{base}/health")
+
+    assert requests.get(f"{base}/users/42").json() == {"result": {"id": 42, "type": "int"}}
+    assert requests.get(f"{base}/users/me").json() == {"result": "me"}
+    assert requests.get(f"{base}/users/me/files/a.txt").json() == {"result": "me:a.txt"}
+    # Non-numeric ids do not match the int converter
+    assert requests.get(f"{base}/users/abc").status_code == 404
+    assert requests.post(f"{base}/users/42").status_code == 405
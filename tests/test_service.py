@@ -151,3 +151,10 @@ def test_service_with_middleware():
     config = getattr(secure_function, '_pifunc_service')
     assert len(config['http']['middleware']) == 1
     assert secure_function("test") == "processed: test"
+
+def test_service_with_invalid_executor():
+    """Test service decorator rejects unknown executor modes"""
+    with pytest.raises(ValueError):
+        @service(executor="fiber", http={"path": "/api/add", "method": "POST"})
+        def add(a: int, b: int) -> int:
+            return a + b
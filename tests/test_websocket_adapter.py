@@ -0,0 +1,57 @@
+import json
+import pytest
+import time
+
+websockets = pytest.importorskip("websockets")
+from websockets.sync.client import connect
+
+from pifunc.adapters.websocket_adapter import WebSocketAdapter
+from conftest import get_free_port
+
+
+def add(a: int, b: int) -> int:
+    return a + b
+
+
+def connect_when_ready(url, timeout=5.0):
+    deadline = time.time() + timeout
+    while True:
+        try:
+            return connect(url, open_timeout=1)
+        except OSError:
+            if time.time() > deadline:
+                raise
+            time.sleep(0.05)
+
+
+def test_namespace_comes_from_the_connection_path(start_adapter):
+    """Test that handlers without a path argument still route by the request path"""
+    adapter = start_adapter(WebSocketAdapter(), [
+        (add, {"name": "add", "websocket": {"event": "math.add", "namespace": "/math"}}),
+    ])
+    with connect_when_ready(f"ws://127.0.0.1:{adapter.config['port']}/math") as ws:
+        hello = json.loads(ws.recv(timeout=5))
+        assert hello["namespace"] == "/math"
+        assert hello["available_events"] == ["math.add"]
+
+        ws.send(json.dumps({"event": "math.add", "data": {"a": 2, "b": 3}}))
+        assert json.loads(ws.recv(timeout=5)) == {"event": "math.add_response", "result": 5}
+
+
+def test_stop_closes_clients_and_server():
+    """Test that stop() closes open connections and the listening socket from the server loop"""
+    port = get_free_port()
+    adapter = WebSocketAdapter()
+    adapter.setup({"port": port, "host": "127.0.0.1"})
+    adapter.register_function(add, {"name": "add", "websocket": {"event": "math.add"}})
+    adapter.start()
+
+    with connect_when_ready(f"ws://127.0.0.1:{port}/") as ws:
+        json.loads(ws.recv(timeout=5))
+        adapter.stop()
+        with pytest.raises(websockets.exceptions.ConnectionClosed):
+            ws.recv(timeout=5)
+    adapter.server.join(timeout=5)
+    assert not adapter.server.is_alive()
+    with pytest.raises(OSError):
+        connect(f"ws://127.0.0.1:{port}/", open_timeout=1)